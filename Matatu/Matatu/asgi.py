@@ -3,6 +3,10 @@ ASGI config for Matatu project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve the async views and the live dashboard stream (/live/revenues/) from
+here. Each worker process runs one live feed producer (``sacco.live``) shared
+by every dashboard connected to it.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
 """
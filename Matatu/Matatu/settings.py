@@ -51,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'sacco.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'Matatu.urls'
@@ -84,6 +85,44 @@ DATABASES = {
     }
 }
 
+# Set SACCO_SQLITE_REPLICA=1 to try replica routing locally: a second SQLite
+# file stands in for the replica and is refreshed from the primary with
+# `manage.py refresh_sqlite_replica`.
+if os.environ.get('SACCO_SQLITE_REPLICA'):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db-replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['sacco.routers.PrimaryReplicaRouter']
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+# The 'responses' cache holds sacco view responses and evicts the least
+# recently used entries once MAX_ENTRIES is reached. Local memory is per
+# process; set SACCO_RESPONSE_CACHE_DIR to share a file-based cache between
+# the workers on a host.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'sacco-responses',
+        'OPTIONS': {'MAX_ENTRIES': 5000, 'CULL_FREQUENCY': 10},
+    },
+}
+
+if os.environ.get('SACCO_RESPONSE_CACHE_DIR'):
+    CACHES['responses'] = {
+        'BACKEND': 'sacco.cache_backends.LRUFileBasedCache',
+        'LOCATION': os.environ['SACCO_RESPONSE_CACHE_DIR'],
+        'OPTIONS': {'MAX_ENTRIES': 5000, 'CULL_FREQUENCY': 10},
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -104,6 +143,15 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Django REST Framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'sacco.pagination.KeysetPagination',
+    'DEFAULT_FILTER_BACKENDS': ['sacco.filters.FleetFilterBackend', 'sacco.filters.ListFilterBackend'],
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -125,3 +173,78 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+AUTH_USER_MODEL = 'sacco.User'
+
+
+# Sacco
+# Bulk revenue ingest: what to do when a matatu already has revenue for the
+# day ('replace' or 'accumulate'), and the largest batch accepted.
+SACCO_REVENUE_UPSERT_POLICY = 'replace'
+SACCO_REVENUE_BULK_MAX_RECORDS = 5000
+
+# Delta sync: how far each sync reaches back past the client's token to
+# catch rows from transactions still open at the previous sync, how long
+# deletions are remembered before clients are forced into a full resync, and
+# how many changed rows one response carries before the rest is paged.
+SACCO_SYNC_OVERLAP_SECONDS = 5
+SACCO_SYNC_TOMBSTONE_DAYS = 90
+SACCO_SYNC_PAGE_SIZE = 500
+
+# Read replicas: the database aliases that views with replica_reads = True
+# read from, and how long a client keeps reading from the primary after it
+# writes (longer than the worst expected replication lag).
+SACCO_READ_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+SACCO_REPLICA_PIN_SECONDS = 10
+
+# Response cache: the cache alias the sacco views store responses in and how
+# long an entry may live. Entries are also retired as soon as a table they
+# were built from changes.
+SACCO_RESPONSE_CACHE_ALIAS = 'responses'
+SACCO_RESPONSE_CACHE_TIMEOUT = 300
+
+# Access control cache: the cache alias users' role sets and managers' fleets
+# are kept in between requests. It must be shared by every process serving
+# the site (Redis, Memcached or the database cache, never LocMemCache), or a
+# revoked role or assignment keeps working in the other processes until it
+# times out. None loads them once per request.
+SACCO_AUTH_CACHE_ALIAS = None
+
+# Archival: Revenue and Expense rows dated more than this many days ago are
+# moved to the archive tables by `manage.py archive_revenue_expenses`.
+SACCO_ARCHIVE_HORIZON_DAYS = 365
+
+# Live dashboard: how often the per-process producer behind /live/revenues/
+# polls for changed revenues and expenses.
+SACCO_LIVE_POLL_SECONDS = 2
+
+# Payroll: how `manage.py run_payroll` pays drivers and conductors for a pay
+# period. 'commission' pays `rate` percent of the assigned matatu's revenue;
+# 'daily' pays `rate` shillings for every day the matatu logged revenue.
+SACCO_PAYROLL_RULES = {
+    'driver': {'basis': 'commission', 'rate': '12.5'},
+    'conductor': {'basis': 'daily', 'rate': '700.00'},
+}
+
+# Owner statements: where `manage.py generate_owner_statements` writes the
+# monthly statements, one subdirectory per month.
+SACCO_STATEMENTS_DIR = BASE_DIR / 'statements'
+
+# Idempotency keys: how long the response to a POST sent with an
+# Idempotency-Key header is kept for retries before
+# `manage.py prune_idempotency_keys` deletes it, and how long a reserved key
+# may go without a response before a retry takes it over. Keep the lease
+# above the longest request the web servers let run.
+SACCO_IDEMPOTENCY_KEY_HOURS = 24
+SACCO_IDEMPOTENCY_LEASE_SECONDS = 60
+
+# Background jobs: how often an idle `manage.py run_jobs` worker polls the
+# queue, how many times a failing job is tried, the wait before the first
+# retry (doubled for each one after), how long a running job may go without
+# reporting progress before its worker is presumed dead, and where export
+# jobs write their files.
+SACCO_JOB_POLL_SECONDS = 1
+SACCO_JOB_MAX_ATTEMPTS = 3
+SACCO_JOB_RETRY_SECONDS = 30
+SACCO_JOB_TIMEOUT_SECONDS = 600
+SACCO_JOB_OUTPUT_DIR = BASE_DIR / 'job-output'
@@ -1,5 +1,58 @@
 from django.contrib import admin
-from .models import User, Matatu, Driver, Conductor, Revenue, Expense, Payment, Manager, MatatuOwner, Route
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+from .models import (
+    User, Matatu, Driver, Conductor, Revenue, Expense, ExpenseCategory, Payment, PayrollRun, Manager, MatatuOwner,
+    Route, Job,
+)
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Use the planner's row estimate instead of COUNT(*) for unfiltered
+    changelists of large tables. Only PostgreSQL keeps such an estimate; other
+    backends, small tables and filtered changelists get the exact count.
+    """
+    exact_count_threshold = 100000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > self.exact_count_threshold:
+                return row[0]
+        return super().count
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Changelist settings for tables that grow without bound: estimated
+    totals, and no second COUNT(*) over the whole table when filtering.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class LicenceStatusAdminMixin:
+    """
+    Annotate licence expiry in SQL so the changelist column costs nothing per
+    row and can be sorted.
+    """
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_licence_status()
+
+    @admin.display(boolean=True, ordering='licence_expired', description='Licence expired')
+    def licence_expired(self, obj):
+        return obj.licence_expired
 
 # Custom User Admin
 @admin.register(User)
@@ -10,25 +63,30 @@ class UserAdmin(admin.ModelAdmin):
 
 # Matatu Admin
 @admin.register(Matatu)
-class MatatuAdmin(admin.ModelAdmin):
-    list_display = ('registration_number', 'route', 'capacity', 'licence_expiry_date', 'owner', 'is_licence_expired')
-    search_fields = ('registration_number', 'route', 'owner__user__username')
-    list_filter = ('route', 'owner', 'licence_expiry_date')
-    list_editable = ('route',)
+class MatatuAdmin(LicenceStatusAdminMixin, admin.ModelAdmin):
+    list_display = ('registration_number', 'route', 'capacity', 'licence_expiry_date', 'owner', 'licence_expired')
+    search_fields = ('registration_number', 'route__name', 'owner__user__username')
+    list_filter = ('route', 'licence_expiry_date')
+    list_select_related = ('route', 'owner__user')
+    autocomplete_fields = ('route', 'owner')
 
 # Driver Admin
 @admin.register(Driver)
-class DriverAdmin(admin.ModelAdmin):
-    list_display = ('user', 'phone_number', 'assigned_matatu', 'licence_expiry_date', 'is_licence_expired')
+class DriverAdmin(LicenceStatusAdminMixin, admin.ModelAdmin):
+    list_display = ('user', 'phone_number', 'assigned_matatu', 'licence_expiry_date', 'licence_expired')
     search_fields = ('user__username', 'phone_number', 'assigned_matatu__registration_number')
     list_filter = ('licence_expiry_date',)
+    list_select_related = ('user', 'assigned_matatu')
+    autocomplete_fields = ('user', 'assigned_matatu')
 
 # Conductor Admin
 @admin.register(Conductor)
-class ConductorAdmin(admin.ModelAdmin):
-    list_display = ('user', 'phone_number', 'assigned_driver', 'licence_expiry_date', 'is_licence_expired')
+class ConductorAdmin(LicenceStatusAdminMixin, admin.ModelAdmin):
+    list_display = ('user', 'phone_number', 'assigned_driver', 'licence_expiry_date', 'licence_expired')
     search_fields = ('user__username', 'phone_number', 'assigned_driver__user__username')
     list_filter = ('licence_expiry_date',)
+    list_select_related = ('user', 'assigned_driver__user')
+    autocomplete_fields = ('user', 'assigned_driver')
 
 # Matatu Owner Admin
 @admin.register(MatatuOwner)
@@ -36,34 +94,66 @@ class MatatuOwnerAdmin(admin.ModelAdmin):
     list_display = ('user', 'phone_number', 'created_at')
     search_fields = ('user__username', 'phone_number')
     list_filter = ('created_at',)
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
 
 # Manager Admin
 @admin.register(Manager)
 class ManagerAdmin(admin.ModelAdmin):
-    list_display = ('user', 'phone_number', 'created_at')
+    list_display = ('user', 'phone_number', 'sacco_wide', 'created_at')
     search_fields = ('user__username', 'phone_number')
-    list_filter = ('created_at',)
+    list_filter = ('sacco_wide', 'created_at')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user', 'assigned_matatus')
 
 # Revenue Admin
 @admin.register(Revenue)
-class RevenueAdmin(admin.ModelAdmin):
+class RevenueAdmin(LargeTableAdmin):
     list_display = ('matatu', 'amount_collected', 'date')  # Use 'amount_collected'
     search_fields = ('matatu__registration_number',)
-    list_filter = ('date',)
+    date_hierarchy = 'date'
+    list_select_related = ('matatu',)
+    autocomplete_fields = ('matatu', 'logged_by')
 
 # Expense Admin
 @admin.register(Expense)
-class ExpenseAdmin(admin.ModelAdmin):
-    list_display = ('matatu', 'description', 'amount', 'date')
+class ExpenseAdmin(LargeTableAdmin):
+    list_display = ('matatu', 'category', 'description', 'amount', 'date')
     search_fields = ('matatu__registration_number', 'description')
-    list_filter = ('date',)
+    list_filter = ('category',)
+    date_hierarchy = 'date'
+    list_select_related = ('matatu', 'category')
+    autocomplete_fields = ('matatu', 'category', 'logged_by')
+
+# Expense Category Admin
+@admin.register(ExpenseCategory)
+class ExpenseCategoryAdmin(admin.ModelAdmin):
+    list_display = ('name', 'key')
+    search_fields = ('name', 'key')
+    readonly_fields = ('key',)
 
 # Payment Admin
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(LargeTableAdmin):
     list_display = ('receiver', 'amount', 'date', 'payment_type')
-    search_fields = ('receiver__user__username', 'payment_type')
-    list_filter = ('date', 'payment_type')
+    search_fields = ('receiver__username', 'payment_type')
+    date_hierarchy = 'date'
+    list_select_related = ('receiver',)
+    autocomplete_fields = ('receiver',)
+
+# Payroll Run Admin
+@admin.register(PayrollRun)
+class PayrollRunAdmin(admin.ModelAdmin):
+    list_display = ('period_start', 'period_end', 'created_at')
+    date_hierarchy = 'period_end'
+
+# Job Admin
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'status', 'progress', 'attempts', 'run_at', 'created_by', 'finished_at')
+    list_filter = ('status', 'task')
+    list_select_related = ('created_by',)
+    readonly_fields = ('worker', 'heartbeat_at', 'result', 'error', 'created_at', 'finished_at')
 
 @admin.register(Route)
 class RouteAdmin(admin.ModelAdmin):
@@ -0,0 +1,168 @@
+"""
+Per-matatu profit-and-loss and expense breakdowns computed in the database.
+
+Revenue and Expense are each grouped by ``(matatu, truncated date)`` and the
+grouped results are combined with ``UNION ALL``, together with the daily
+summaries that ``sacco.archive`` leaves for archived days, so the whole
+report is a single query returning at most three rows per matatu and period.
+Reports are not cached here: the views that serve them cache whole responses
+(see ``sacco.response_cache``), which any Revenue, Expense or Matatu write
+retires.
+"""
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.db.models import Count, DateField, DecimalField, Sum, Value
+from django.db.models.functions import Trunc
+
+from sacco import archive
+from sacco.models import ArchivedExpense, Expense, ExpenseCategory, Revenue
+
+PERIODS = ('day', 'week', 'month')
+
+ZERO = Decimal('0.00')
+
+
+def _scope(queryset, start, end, owner=None, route=None, manager=None, matatus=None):
+    queryset = queryset.filter(date__gte=start, date__lte=end)
+    if matatus is not None:
+        queryset = queryset.filter(matatu_id__in=matatus)
+    if owner is not None:
+        queryset = queryset.filter(matatu__owner_id=owner)
+    if route is not None:
+        queryset = queryset.filter(matatu__route_id=route)
+    if manager is not None:
+        queryset = queryset.filter(matatu__managers=manager)
+    return queryset
+
+
+def profit_and_loss_query(period, start, end, **filters):
+    """
+    Return the UNION ALL queryset of per-(matatu, period) revenue and expense totals.
+    """
+    amount = DecimalField(max_digits=15, decimal_places=2)
+    truncated = Trunc('date', period, output_field=DateField())
+
+    revenues = (
+        _scope(Revenue.objects.all(), start, end, **filters)
+        .order_by()
+        .annotate(period=truncated)
+        .values('matatu_id', 'period')
+        .annotate(
+            revenue=Sum('amount_collected', output_field=amount),
+            expenses=Value(ZERO, output_field=amount),
+        )
+    )
+    expenses = (
+        _scope(Expense.objects.all(), start, end, **filters)
+        .order_by()
+        .annotate(period=truncated)
+        .values('matatu_id', 'period')
+        .annotate(
+            revenue=Value(ZERO, output_field=amount),
+            expenses=Sum('amount', output_field=amount),
+        )
+    )
+    summaries = archive.summaries_for(start, end)
+    if summaries is None:
+        return revenues.union(expenses, all=True)
+
+    # Archived days are read from their daily per-matatu summaries.
+    summaries = (
+        _scope(summaries, start, end, **filters)
+        .order_by()
+        .annotate(period=truncated)
+        .values('matatu_id', 'period')
+        .annotate(
+            revenue=Sum('revenue_collected', output_field=amount),
+            expenses=Sum('expense_total', output_field=amount),
+        )
+    )
+    return revenues.union(expenses, summaries, all=True)
+
+
+def profit_and_loss(period, start, end, **filters):
+    """
+    Return per-matatu revenue, expenses and net profit for every period in
+    ``[start, end]``, ordered by period then matatu.
+
+    ``filters`` may contain ``owner``, ``route`` and ``manager`` primary keys,
+    and ``matatus``, a tuple of matatu ids to restrict the report to.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Unknown period '{period}'.")
+    filters = {name: value for name, value in filters.items() if value is not None}
+
+    totals = OrderedDict()
+    for row in profit_and_loss_query(period, start, end, **filters):
+        entry = totals.setdefault((row['period'], row['matatu_id']), [ZERO, ZERO])
+        entry[0] += row['revenue'] or ZERO
+        entry[1] += row['expenses'] or ZERO
+
+    return [
+        {
+            'matatu': matatu_id,
+            'period': period_start.isoformat(),
+            'revenue': str(revenue),
+            'expenses': str(expenses),
+            'net': str(revenue - expenses),
+        }
+        for (period_start, matatu_id), (revenue, expenses) in sorted(totals.items())
+    ]
+
+
+# breakdown grouping -> column grouped by
+BREAKDOWN_GROUPS = {
+    'matatu': 'matatu_id',
+    'owner': 'matatu__owner_id',
+    'route': 'matatu__route_id',
+}
+
+
+def expense_breakdown(by, start, end, matatu=None, **filters):
+    """
+    Return expense totals per category for every matatu, owner or route
+    (``by``) in ``[start, end]``, ordered by group then category name.
+
+    Rows are grouped on the integer ``(group, category)`` columns; category
+    names are looked up once afterwards. Archived expenses are included:
+    the daily summaries carry no categories, so they are grouped the same
+    way from the archive table.
+    """
+    if by not in BREAKDOWN_GROUPS:
+        raise ValueError(f"Unknown breakdown '{by}'.")
+    column = BREAKDOWN_GROUPS[by]
+    filters = {name: value for name, value in filters.items() if value is not None}
+
+    querysets = [Expense.objects.all()]
+    if archive.summaries_for(start, end) is not None:
+        querysets.append(ArchivedExpense.objects.all())
+
+    totals = {}
+    for queryset in querysets:
+        queryset = _scope(queryset, start, end, **filters)
+        if matatu is not None:
+            queryset = queryset.filter(matatu_id=matatu)
+        for row in (
+            queryset.order_by().values(column, 'category_id')
+            .annotate(total=Sum('amount'), count=Count('id'))
+        ):
+            entry = totals.setdefault((row[column], row['category_id']), [ZERO, 0])
+            entry[0] += row['total']
+            entry[1] += row['count']
+
+    names = dict(
+        ExpenseCategory.objects.filter(pk__in={category for _, category in totals}).values_list('pk', 'name')
+    )
+    return [
+        {
+            by: group,
+            'category': category,
+            'name': names[category],
+            'total': str(total),
+            'count': count,
+        }
+        for (group, category), (total, count) in sorted(
+            totals.items(), key=lambda item: (item[0][0] is None, item[0][0] or 0, names[item[0][1]])
+        )
+    ]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SaccoConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'sacco'
+
+    def ready(self):
+        from sacco import signals  # noqa: F401
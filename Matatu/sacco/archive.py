@@ -0,0 +1,150 @@
+"""
+Time-partitioned archival of Revenue and Expense.
+
+``archive()`` moves every row dated before the horizon
+(``SACCO_ARCHIVE_HORIZON_DAYS`` ago) out of the hot tables into
+ArchivedRevenue and ArchivedExpense, a few days at a time, each batch in its
+own transaction. For every archived day it leaves one DailyMatatuSummary row
+per matatu with the day's revenue and expense totals. The hot tables and
+their indexes therefore only ever hold the recent rows that nearly all reads
+ask for.
+
+Reads stay transparent:
+
+* list endpoints page over the hot and archived rows together
+  (``KeysetPagination.paginate_querysets``),
+* revenue and expense detail endpoints fall back to the archive,
+* profit-and-loss reads archived days from the summaries, and
+* exports merge the archived rows into the stream in date order.
+
+All of them skip the archive entirely until something has been archived.
+Whether anything is archived is asked of the archive table on every read, an
+``EXISTS`` that stops at the first row, so no process keeps a stale answer.
+
+Archived rows are moved with raw deletes that send no signals: they are not
+deleted from the sacco's point of view, so they must not be subtracted from
+the route rollups nor tombstoned for sync.
+"""
+import datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Min, Sum
+
+from sacco import response_cache
+from sacco.models import ArchivedExpense, ArchivedRevenue, DailyMatatuSummary, Expense, Revenue, today
+
+# hot model -> archive model
+ARCHIVES = {
+    Revenue: ArchivedRevenue,
+    Expense: ArchivedExpense,
+}
+
+BATCH_DAYS = 7
+
+
+def horizon():
+    return datetime.timedelta(days=getattr(settings, 'SACCO_ARCHIVE_HORIZON_DAYS', 365))
+
+
+def cutoff():
+    """
+    Rows dated before this day are archived.
+    """
+    return today() - horizon()
+
+
+def has_archived(model):
+    """
+    Return whether any rows of ``model`` have been archived.
+    """
+    return ARCHIVES[model].objects.exists()
+
+
+def archived_queryset(model):
+    """
+    Return all archived rows of ``model``, or None while nothing is archived.
+    """
+    if model not in ARCHIVES or not has_archived(model):
+        return None
+    return ARCHIVES[model].objects.all()
+
+
+def _copy_rows(model, start, end):
+    archive_model = ARCHIVES[model]
+    rows = model.objects.filter(date__gte=start, date__lt=end)
+    columns = [field.attname for field in model._meta.concrete_fields]
+    archived = archive_model.objects.bulk_create(
+        (archive_model(**row) for row in rows.values(*columns).iterator()),
+        batch_size=1000,
+    )
+    # Raw delete: no rollup, tombstone or cache receivers for archived rows.
+    rows._raw_delete(rows.db)
+    return len(archived)
+
+
+def _summarise(start, end):
+    totals = {}
+    for row in (
+        ArchivedRevenue.objects.filter(date__gte=start, date__lt=end)
+        .values('matatu_id', 'date').annotate(total=Sum('amount_collected'))
+    ):
+        totals[(row['matatu_id'], row['date'])] = [row['total'], Decimal('0'), 0]
+    for row in (
+        ArchivedExpense.objects.filter(date__gte=start, date__lt=end)
+        .values('matatu_id', 'date').annotate(total=Sum('amount'), count=Count('id'))
+    ):
+        entry = totals.setdefault((row['matatu_id'], row['date']), [Decimal('0'), Decimal('0'), 0])
+        entry[1], entry[2] = row['total'], row['count']
+
+    DailyMatatuSummary.objects.bulk_create(
+        [
+            DailyMatatuSummary(matatu_id=matatu_id, date=date, revenue_collected=revenue,
+                               expense_total=expenses, expense_count=count)
+            for (matatu_id, date), (revenue, expenses, count) in totals.items()
+        ],
+        update_conflicts=True,
+        unique_fields=['matatu', 'date'],
+        update_fields=['revenue_collected', 'expense_total', 'expense_count'],
+    )
+    return len(totals)
+
+
+def archive(before=None, batch_days=BATCH_DAYS):
+    """
+    Archive every Revenue and Expense row dated before ``before`` (default:
+    the horizon). Returns ``{'revenues': n, 'expenses': n, 'summaries': n}``.
+
+    Safe to re-run: summaries are recomputed from the archive for every day
+    touched, so rows that arrive late for an archived day are folded in.
+    """
+    before = before or cutoff()
+    counts = {'revenues': 0, 'expenses': 0, 'summaries': 0}
+
+    oldest = [model.objects.filter(date__lt=before).aggregate(oldest=Min('date'))['oldest'] for model in ARCHIVES]
+    oldest = [date for date in oldest if date is not None]
+    if not oldest:
+        return counts
+
+    start = min(oldest)
+    while start < before:
+        end = min(start + datetime.timedelta(days=batch_days), before)
+        with transaction.atomic():
+            counts['revenues'] += _copy_rows(Revenue, start, end)
+            counts['expenses'] += _copy_rows(Expense, start, end)
+            counts['summaries'] += _summarise(start, end)
+        start = end
+
+    response_cache.invalidate(*ARCHIVES)
+    return counts
+
+
+def summaries_for(start, end):
+    """
+    Return the DailyMatatuSummary rows in ``[start, end]``, or None while
+    nothing is archived.
+    """
+    if not any(has_archived(model) for model in ARCHIVES):
+        return None
+    return DailyMatatuSummary.objects.filter(date__gte=start, date__lte=end)
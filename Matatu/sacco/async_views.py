@@ -0,0 +1,249 @@
+"""
+Native async read endpoints for routes, matatus, revenues and expenses.
+
+These are plain Django class-based views with ``async def`` handlers, so under
+ASGI a request waiting on the database or on a slow client is a suspended
+coroutine on the worker's event loop instead of a thread. They use the async
+ORM (``aget()``, ``async for``), ``request.auser()`` for the session user and
+``ahas_role()`` for permissions, and render through the same precompiled
+values() representation as the synchronous list views, so the JSON bodies are
+identical to those of the DRF endpoints they mirror, archived rows included.
+
+Managers scoped to a fleet see only its rows, as on the synchronous views.
+
+Only session authentication is supported; clients using HTTP Basic should
+stay on the synchronous endpoints.
+"""
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from sacco import archive, fastpath, filters, fleets, live, versions
+from sacco.models import Expense, Matatu, Revenue, Route
+from sacco.pagination import DateKeysetPagination, KeysetPagination
+from sacco.roles import CONDUCTOR, DRIVER, MANAGER, ahas_role
+from sacco.serializers import ExpenseSerializer, MatatuSerializer, RevenueSerializer, RouteSerializer
+
+
+def render(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), status=status, content_type='application/json')
+
+
+class AsyncReadView(View):
+    """
+    Base class for the async read views.
+
+    ``roles`` lists the roles allowed in (empty: any authenticated user) and
+    ``versioned_models`` enables ETag / Last-Modified validation exactly as
+    ``ConditionalGetMixin`` does for the synchronous views. ``fleet_field``
+    is the lookup from a row to its matatu, as on ``FleetScopedMixin``; None
+    leaves the view unscoped. Subclasses implement ``get_data()``, returning
+    what to render, or override ``respond()``.
+    """
+    http_method_names = ['get', 'head', 'options']
+    model = None
+    serializer_class = None
+    roles = ()
+    versioned_models = ()
+    fleet_field = None
+    fleet = None
+
+    def get_queryset(self):
+        return self.scoped(self.model.objects.all())
+
+    def scoped(self, queryset):
+        if self.fleet_field is None:
+            return queryset
+        return fleets.scope(queryset, self.fleet, self.fleet_field)
+
+    async def check_permissions(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        if self.roles and not await ahas_role(user, *self.roles):
+            raise exceptions.PermissionDenied()
+        self.fleet = await fleets.aget_fleet(user)
+
+    async def get(self, request, *args, **kwargs):
+        try:
+            await self.check_permissions(request)
+
+            if self.versioned_models:
+                etag, last_modified = await versions.avalidators(*self.versioned_models)
+                if self.fleet_field is not None:
+                    etag = versions.scoped_etag(etag, fleets.fleet_scope(self.fleet))
+                last_modified = int(last_modified.timestamp()) if last_modified else None
+                response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+                if response is not None:
+                    return response
+
+            response = await self.respond(request, *args, **kwargs)
+        except Http404 as exc:
+            return render({'detail': str(exc)}, status=404)
+        except exceptions.NotAuthenticated as exc:
+            # Session auth sends no WWW-Authenticate challenge, so DRF answers 403.
+            return render({'detail': exc.detail}, status=403)
+        except exceptions.APIException as exc:
+            return render({'detail': exc.detail}, status=exc.status_code)
+
+        if self.versioned_models:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    async def respond(self, request, *args, **kwargs):
+        return render(await self.get_data(request, *args, **kwargs))
+
+
+class AsyncListView(AsyncReadView):
+    pagination_class = KeysetPagination
+    filter_fields = {}
+    replica_reads = True
+
+    async def get_data(self, request):
+        representation = fastpath.representation_for(self.serializer_class)
+        paginator = self.pagination_class()
+        request = Request(request)
+
+        def filtered(queryset):
+            return filters.filter_queryset(queryset, request.query_params, self.filter_fields)
+
+        querysets = [representation.values(filtered(self.get_queryset()))]
+        archived = await sync_to_async(archive.archived_queryset)(self.model)
+        if archived is not None:
+            querysets.append(representation.values(filtered(self.scoped(archived))))
+        matatu_ids = await sync_to_async(filters.merged_matatus)(request.query_params, self.filter_fields)
+        page = await paginator.apaginate_querysets(filters.partition(querysets, matatu_ids), request)
+        return {
+            'next': paginator.get_next_link(),
+            'first': paginator.get_first_link(),
+            'results': representation.represent(page),
+        }
+
+
+class AsyncDetailView(AsyncReadView):
+    async def get_data(self, request, pk):
+        representation = fastpath.representation_for(self.serializer_class)
+        try:
+            row = await representation.values(self.get_queryset()).aget(pk=pk)
+        except self.model.DoesNotExist:
+            row = None
+            archived = await sync_to_async(archive.archived_queryset)(self.model)
+            if archived is not None:
+                row = await representation.values(self.scoped(archived)).filter(pk=pk).afirst()
+            if row is None:
+                raise Http404(f'No {self.model._meta.object_name} matches the given query.')
+        return representation.represent([row])[0]
+
+
+# Routes
+class RouteListView(AsyncListView):
+    """
+    List all routes (Manager only).
+    """
+    model = Route
+    serializer_class = RouteSerializer
+    roles = (MANAGER,)
+    versioned_models = (Route,)
+
+
+class RouteDetailView(AsyncDetailView):
+    """
+    Retrieve a route (Manager only).
+    """
+    model = Route
+    serializer_class = RouteSerializer
+    roles = (MANAGER,)
+    versioned_models = (Route,)
+
+
+# Matatus
+class MatatuListView(AsyncListView):
+    """
+    List all Matatus (Manager only).
+    """
+    model = Matatu
+    serializer_class = MatatuSerializer
+    roles = (MANAGER,)
+    filter_fields = {'route': 'route_id', 'owner': 'owner_id'}
+    versioned_models = (Matatu,)
+    fleet_field = 'id'
+
+
+class MatatuDetailView(AsyncDetailView):
+    """
+    Retrieve a Matatu (any authenticated user).
+    """
+    model = Matatu
+    serializer_class = MatatuSerializer
+    versioned_models = (Matatu,)
+    fleet_field = 'id'
+
+
+# Revenue
+class RevenueListView(AsyncListView):
+    """
+    List all revenues (Driver, Conductor or Manager only).
+    """
+    model = Revenue
+    serializer_class = RevenueSerializer
+    roles = (DRIVER, CONDUCTOR, MANAGER)
+    pagination_class = DateKeysetPagination
+    filter_fields = filters.MATATU_FILTERS
+    fleet_field = 'matatu_id'
+
+
+class RevenueDetailView(AsyncDetailView):
+    """
+    Retrieve a revenue record (Driver, Conductor or Manager only).
+    """
+    model = Revenue
+    serializer_class = RevenueSerializer
+    roles = (DRIVER, CONDUCTOR, MANAGER)
+    fleet_field = 'matatu_id'
+
+
+# Expenses
+class ExpenseListView(AsyncListView):
+    """
+    List all expenses (Driver, Conductor or Manager only).
+    """
+    model = Expense
+    serializer_class = ExpenseSerializer
+    roles = (DRIVER, CONDUCTOR, MANAGER)
+    pagination_class = DateKeysetPagination
+    filter_fields = filters.EXPENSE_FILTERS
+    fleet_field = 'matatu_id'
+
+
+class ExpenseDetailView(AsyncDetailView):
+    """
+    Retrieve an expense record (Driver, Conductor or Manager only).
+    """
+    model = Expense
+    serializer_class = ExpenseSerializer
+    roles = (DRIVER, CONDUCTOR, MANAGER)
+    fleet_field = 'matatu_id'
+
+
+# Live dashboard
+class LiveRevenueView(AsyncReadView):
+    """
+    Stream new and updated revenues and expenses, and today's per-route
+    revenue totals, as server-sent events (Manager only). Managers scoped to
+    a fleet only receive the events of their own matatus.
+    """
+    roles = (MANAGER,)
+
+    async def respond(self, request):
+        response = StreamingHttpResponse(live.feed.stream(self.fleet), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        # Stop nginx from buffering the stream.
+        response['X-Accel-Buffering'] = 'no'
+        return response
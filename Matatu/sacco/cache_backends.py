@@ -0,0 +1,43 @@
+import os
+
+from django.core.cache.backends.filebased import FileBasedCache
+
+_missing = object()
+
+
+class LRUFileBasedCache(FileBasedCache):
+    """
+    File-based cache that evicts least recently used entries.
+
+    Django's file backend culls a random sample of entries once MAX_ENTRIES
+    is reached. Here every hit touches the entry's file, and culling removes
+    the files with the oldest modification times instead, so the cache keeps
+    a bounded size with LRU eviction like the local-memory backend while
+    still being shared by every worker process on the host.
+    """
+    def get(self, key, default=None, version=None):
+        value = super().get(key, _missing, version)
+        if value is _missing:
+            return default
+        try:
+            os.utime(self._key_to_file(key, version))
+        except FileNotFoundError:
+            pass
+        return value
+
+    def _cull(self):
+        filelist = self._list_cache_files()
+        num_entries = len(filelist)
+        if num_entries < self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            return self.clear()
+
+        def last_used(fname):
+            try:
+                return os.stat(fname).st_mtime_ns
+            except FileNotFoundError:
+                return 0
+
+        for fname in sorted(filelist, key=last_used)[:int(num_entries / self._cull_frequency)]:
+            self._delete(fname)
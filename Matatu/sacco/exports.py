@@ -0,0 +1,130 @@
+"""
+Streaming CSV and NDJSON exports of the Revenue, Expense and Payment tables.
+
+Rows are read with ``values_list()`` through a chunked ``iterator()`` and
+written out a chunk at a time, so memory stays flat regardless of the export
+size and the first bytes leave before the whole result set has been read.
+"""
+import csv
+import heapq
+import io
+import itertools
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from sacco import archive, fleets
+from sacco.models import Expense, Payment, Revenue
+
+CHUNK_SIZE = 2000
+
+CSV = 'csv'
+NDJSON = 'ndjson'
+CONTENT_TYPES = {
+    CSV: 'text/csv',
+    NDJSON: 'application/x-ndjson',
+}
+
+# resource name -> (model, [(column header, values_list lookup), ...])
+EXPORTS = {
+    'revenues': (Revenue, [
+        ('id', 'id'),
+        ('matatu', 'matatu_id'),
+        ('amount_collected', 'amount_collected'),
+        ('date', 'date'),
+        ('logged_by', 'logged_by_id'),
+    ]),
+    'expenses': (Expense, [
+        ('id', 'id'),
+        ('matatu', 'matatu_id'),
+        ('expense_type', 'category__name'),
+        ('amount', 'amount'),
+        ('description', 'description'),
+        ('date', 'date'),
+        ('logged_by', 'logged_by_id'),
+    ]),
+    'payments': (Payment, [
+        ('id', 'id'),
+        ('receiver', 'receiver_id'),
+        ('amount', 'amount'),
+        ('payment_type', 'payment_type'),
+        ('date', 'date'),
+    ]),
+}
+
+
+# resource name -> lookup from the row to its matatu, for fleet scoping
+FLEET_FIELDS = {
+    'revenues': 'matatu_id',
+    'expenses': 'matatu_id',
+    'payments': fleets.PAYMENT_FIELDS,
+}
+
+
+def _rows(queryset, start, end, lookups):
+    queryset = queryset.filter(date__gte=start, date__lte=end)
+    return (
+        # Pick the database now: the rows are only read while the response
+        # streams, after the request's replica routing has ended.
+        queryset.using(queryset.db)
+        .order_by('date', 'id')
+        .values_list(*lookups)
+        .iterator(chunk_size=CHUNK_SIZE)
+    )
+
+
+def export_rows(resource, start, end, fleet=None):
+    """
+    Return the column headers and a lazy iterator of row tuples for the range,
+    limited to the matatus in ``fleet`` unless it is None.
+
+    Archived rows are merged into the stream in ``(date, id)`` order.
+    """
+    model, columns = EXPORTS[resource]
+    lookups = [lookup for _, lookup in columns]
+    rows = _rows(fleets.scope(model.objects.all(), fleet, FLEET_FIELDS[resource]), start, end, lookups)
+
+    archived = archive.archived_queryset(model)
+    if archived is not None:
+        date, pk = lookups.index('date'), lookups.index('id')
+        archived = fleets.scope(archived, fleet, FLEET_FIELDS[resource])
+        rows = heapq.merge(
+            rows, _rows(archived, start, end, lookups), key=lambda row: (row[date], row[pk]),
+        )
+    return [header for header, _ in columns], rows
+
+
+def _chunked(lines, size=CHUNK_SIZE):
+    buffer = []
+    for line in lines:
+        buffer.append(line)
+        if len(buffer) >= size:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def stream_csv(headers, rows):
+    output = io.StringIO()
+    writer = csv.writer(output)
+
+    def lines():
+        for row in itertools.chain([headers], rows):
+            writer.writerow(row)
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+
+    return _chunked(lines())
+
+
+def stream_ndjson(headers, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    return _chunked(encoder.encode(dict(zip(headers, row))) + '\n' for row in rows)
+
+
+def stream_export(resource, file_format, start, end, fleet=None):
+    headers, rows = export_rows(resource, start, end, fleet)
+    if file_format == CSV:
+        return stream_csv(headers, rows)
+    return stream_ndjson(headers, rows)
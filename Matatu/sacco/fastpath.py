@@ -0,0 +1,73 @@
+"""
+Read-only fast path for high-volume list endpoints.
+
+A ``ValuesRepresentation`` is compiled once per serializer class: it records
+which database column feeds each output field and which fields need a
+conversion at all. Rows are then fetched with ``values()`` and turned into
+plain dicts without instantiating models, related-field objects or
+validators. Conversions reuse the serializer's own field
+``to_representation()``, so the rendered output is byte-identical to the
+serializer's.
+
+Only flat serializers qualify: model fields and primary-key relations.
+"""
+from functools import lru_cache
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import serializers
+
+# Field types whose to_representation() is the identity for values already
+# of the right Python type coming out of the database.
+IDENTITY_FIELDS = (
+    serializers.IntegerField,
+    serializers.CharField,
+    serializers.BooleanField,
+)
+
+
+class ValuesRepresentation:
+    def __init__(self, serializer_class):
+        model = serializer_class.Meta.model
+        self.serializer_class = serializer_class
+        self.columns = []
+        self.mapping = []
+
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                column, converter = model._meta.get_field(field.source).attname, None
+            elif isinstance(field, serializers.RelatedField) or isinstance(field, serializers.BaseSerializer) \
+                    or field.source == '*' or '.' in field.source:
+                raise ImproperlyConfigured(
+                    f"{serializer_class.__name__}.{name} cannot be served from values()."
+                )
+            else:
+                column = field.source
+                converter = None if isinstance(field, IDENTITY_FIELDS) else field.to_representation
+            self.columns.append(column)
+            self.mapping.append((name, column, converter))
+
+    def values(self, queryset):
+        """
+        Restrict ``queryset`` to the columns the representation needs.
+        """
+        return queryset.values(*self.columns)
+
+    def represent(self, rows):
+        """
+        Turn ``values()`` dicts into the serializer's output dicts.
+        """
+        mapping = self.mapping
+        return [
+            {
+                name: row[column] if converter is None or row[column] is None else converter(row[column])
+                for name, column, converter in mapping
+            }
+            for row in rows
+        ]
+
+
+@lru_cache(maxsize=None)
+def representation_for(serializer_class):
+    return ValuesRepresentation(serializer_class)
@@ -0,0 +1,120 @@
+"""
+Server-side filtering for the list endpoints.
+
+A view declares the query parameters it accepts in ``filter_fields``, a
+mapping of parameter name to ORM lookup, and ``ListFilterBackend`` narrows
+its queryset by whichever of them the request sends. Parameters are
+validated by ``ListFilterSerializer``, so a bad value answers 400 instead of
+being ignored, and unknown parameters (``cursor``, ``page_size``) are left
+to the paginator.
+
+The lookups are what the composite indexes on the date-ordered tables lead
+with (``(matatu, -date, -id)``, ``(receiver, -date, -id)``,
+``(category, -date, -id)`` ...), so a filtered page is still one index
+range scan in keyset order rather than a scan and sort of the table.
+
+``route`` and ``owner`` on the Revenue and Expense lists are columns of
+Matatu, which no index on those tables leads with. They are ``MatatuSet``
+filters: the list views resolve them to the matching matatus' ids with one
+query on Matatu, read each matatu's page from its ``(matatu, -date, -id)``
+range and merge the pages (see ``partition()``). That costs one small query
+per matatu, so beyond ``MAX_MERGED_MATATUS`` matatus the views fall back to
+a single ``matatu_id IN (...)`` query, which the database has to sort.
+
+``FleetFilterBackend`` restricts views with a ``fleet_field`` to the
+requesting manager's fleet (see ``sacco.fleets``).
+"""
+from rest_framework.filters import BaseFilterBackend
+
+from sacco import fleets
+from sacco.models import Matatu
+from sacco.serializers import ListFilterSerializer
+
+MAX_MERGED_MATATUS = 20
+
+
+class MatatuSet:
+    """
+    A filter on a Matatu column, for tables whose rows belong to a matatu.
+    """
+    def __init__(self, field):
+        self.field = field
+
+    def lookup(self, value):
+        return {'matatu_id__in': Matatu.objects.filter(**{self.field: value}).values('id')}
+
+
+# Lookups shared by the Revenue and Expense lists and their archives.
+MATATU_FILTERS = {
+    'matatu': 'matatu_id',
+    'route': MatatuSet('route_id'),
+    'owner': MatatuSet('owner_id'),
+    'start': 'date__gte',
+    'end': 'date__lte',
+}
+EXPENSE_FILTERS = {**MATATU_FILTERS, 'category': 'category_id'}
+
+
+def _validated(query_params, filter_fields):
+    data = {name: query_params[name] for name in filter_fields if name in query_params}
+    if not data:
+        return {}
+    query = ListFilterSerializer(data=data)
+    query.is_valid(raise_exception=True)
+    return query.validated_data
+
+
+def filter_queryset(queryset, query_params, filter_fields):
+    """
+    Filter ``queryset`` by the parameters in ``query_params`` that appear in
+    ``filter_fields``. Raises ValidationError for an invalid value.
+    """
+    for name, value in _validated(query_params, filter_fields).items():
+        field = filter_fields[name]
+        queryset = queryset.filter(**(field.lookup(value) if isinstance(field, MatatuSet) else {field: value}))
+    return queryset
+
+
+def merged_matatus(query_params, filter_fields):
+    """
+    Return the ids of the matatus the request's ``MatatuSet`` filters select,
+    or None when it sends none or they select more than MAX_MERGED_MATATUS.
+    """
+    lookups = {
+        filter_fields[name].field: value
+        for name, value in _validated(query_params, filter_fields).items()
+        if isinstance(filter_fields[name], MatatuSet)
+    }
+    if not lookups:
+        return None
+    ids = list(Matatu.objects.filter(**lookups).order_by().values_list('id', flat=True)[:MAX_MERGED_MATATUS + 1])
+    return ids if len(ids) <= MAX_MERGED_MATATUS else None
+
+
+def partition(querysets, matatu_ids):
+    """
+    Split filtered querysets into one per matatu in ``matatu_ids`` (from
+    ``merged_matatus()``), for a paginator to merge. None leaves them whole.
+    """
+    if matatu_ids is None:
+        return querysets
+    return [queryset.filter(matatu_id=matatu_id) for queryset in querysets for matatu_id in matatu_ids]
+
+
+class ListFilterBackend(BaseFilterBackend):
+    """
+    Filter by the view's ``filter_fields``; views without any are unchanged.
+    """
+    def filter_queryset(self, request, queryset, view):
+        return filter_queryset(queryset, request.query_params, getattr(view, 'filter_fields', {}))
+
+
+class FleetFilterBackend(BaseFilterBackend):
+    """
+    Scope views with a ``fleet_field`` to the manager's fleet; others are unchanged.
+    """
+    def filter_queryset(self, request, queryset, view):
+        field = getattr(view, 'fleet_field', None)
+        if field is None:
+            return queryset
+        return fleets.scope(queryset, view.get_fleet(), field)
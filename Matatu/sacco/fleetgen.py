@@ -0,0 +1,218 @@
+"""
+Synthetic sacco generator for reproducing production scale locally.
+
+``generate()`` builds a complete fleet: routes, owners, matatus with a driver
+and a conductor each, managers with the matatus they look after, and a daily
+Revenue, Expense and Payment history for every matatu. Every row is written
+with ``bulk_create`` in batches, so no save signals fire; once the rows are
+in, the derived state those receivers would have kept up (route rollups,
+table versions, cached responses) is brought up to date in one pass.
+
+The output depends only on the arguments, so two runs with the same seed
+produce the same fleet. Names are built from ``prefix``, so several fleets
+can live in one database.
+"""
+import datetime
+import random
+import time
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group
+from django.db import connections, router, transaction
+from django.utils.timezone import now
+
+from sacco import response_cache, rollups
+from sacco.models import (
+    Conductor,
+    Driver,
+    Expense,
+    ExpenseCategory,
+    Manager,
+    Matatu,
+    MatatuOwner,
+    Payment,
+    Revenue,
+    Route,
+    User,
+    today,
+)
+from sacco.roles import CONDUCTOR, DRIVER, MANAGER, OWNER
+
+BATCH_SIZE = 5000
+PASSWORD = 'sacco-load-test'
+MATATUS_PER_ROUTE = 25
+MATATUS_PER_MANAGER = 50
+
+# (expense category, chance of occurring on a given day, low, high) in shillings
+EXPENSES = [
+    ('Fuel', 1.0, 1500, 3500),
+    ('Parking', 0.6, 50, 200),
+    ('Maintenance', 0.05, 2000, 15000),
+    ('Insurance', 1 / 30, 4000, 6000),
+]
+# model -> columns written by _history(), in order
+HISTORY_FIELDS = {
+    Revenue: ['matatu', 'amount_collected', 'date', 'logged_by', 'updated_at'],
+    Expense: ['matatu', 'category', 'amount', 'description', 'date', 'logged_by', 'updated_at'],
+    Payment: ['receiver', 'amount', 'payment_type', 'date'],
+}
+DRIVER_WAGE = Decimal('1000.00')
+CONDUCTOR_WAGE = Decimal('700.00')
+
+
+def _shillings(rng, low, high, percent=100):
+    cents = rng.randrange(low * 100, high * 100) * percent // 100
+    return Decimal(cents).scaleb(-2)
+
+
+def _users(prefix, role, count, password):
+    return User.objects.bulk_create(
+        User(username=f'{prefix}-{role}{n}', role=role, password=password) for n in range(count)
+    )
+
+
+def _join(group, users):
+    User.groups.through.objects.bulk_create(
+        User.groups.through(user_id=user.pk, group_id=group.pk) for user in users
+    )
+
+
+def _insert(model, fields, rows):
+    """
+    ``bulk_create`` without building a model instance per row: insert ``rows``
+    (tuples of database-ready values for ``fields``) with one prepared
+    statement.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(model._meta.db_table),
+        ', '.join(quote(model._meta.get_field(name).column) for name in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def _history(rng, matatus, crews, categories, start, days, connection):
+    """
+    Yield ``(model, row)`` for every Revenue, Expense and Payment row, day by
+    day, as tuples in the order of ``HISTORY_FIELDS``.
+    """
+    ops = connection.ops
+    decimal = ops.adapt_decimalfield_value
+    updated_at = ops.adapt_datetimefield_value(now())
+    driver_wage, conductor_wage = decimal(DRIVER_WAGE), decimal(CONDUCTOR_WAGE)
+    for day in range(days):
+        date = start + datetime.timedelta(days=day)
+        db_date = ops.adapt_datefield_value(date)
+        # Weekends carry fewer commuters.
+        busy = 70 if date.weekday() >= 5 else 100
+        for matatu, (driver, conductor) in zip(matatus, crews):
+            takings = _shillings(rng, 2500, 9000, busy)
+            yield Revenue, (matatu, decimal(takings), db_date, conductor, updated_at)
+            for category, chance, low, high in EXPENSES:
+                if rng.random() < chance:
+                    yield Expense, (matatu, categories[category], decimal(_shillings(rng, low, high)), '', db_date,
+                                    conductor, updated_at)
+            yield Payment, (driver, driver_wage, 'Daily', db_date)
+            yield Payment, (conductor, conductor_wage, 'Daily', db_date)
+
+
+def generate(owners=20, matatus=100, days=365, end=None, routes=None, managers=None,
+             prefix='gen', seed=0, password=PASSWORD, batch_size=BATCH_SIZE):
+    """
+    Generate a fleet of ``matatus`` spread over ``owners`` with ``days`` of
+    history ending on ``end`` (default today).
+
+    Returns the row counts per model, the seconds spent writing the daily
+    history and the resulting rows per second.
+    """
+    rng = random.Random(seed)
+    end = end or today()
+    start = end - datetime.timedelta(days=days - 1)
+    routes = routes or max(matatus // MATATUS_PER_ROUTE, 1)
+    managers = managers or max(matatus // MATATUS_PER_MANAGER, 1)
+    # Hashing is deliberately slow; every generated user shares one hash.
+    password = make_password(password)
+    groups = {name: Group.objects.get_or_create(name=name)[0] for name in (MANAGER, DRIVER, CONDUCTOR, OWNER)}
+
+    with transaction.atomic():
+        route_rows = Route.objects.bulk_create(Route(name=f'{prefix} route {n}') for n in range(routes))
+
+        owner_users = _users(prefix, 'owner', owners, password)
+        driver_users = _users(prefix, 'driver', matatus, password)
+        conductor_users = _users(prefix, 'conductor', matatus, password)
+        manager_users = _users(prefix, 'manager', managers, password)
+        for group, users in ((OWNER, owner_users), (DRIVER, driver_users),
+                             (CONDUCTOR, conductor_users), (MANAGER, manager_users)):
+            _join(groups[group], users)
+
+        owner_rows = MatatuOwner.objects.bulk_create(
+            MatatuOwner(user=user, phone_number=f'07{rng.randrange(10 ** 8):08d}') for user in owner_users
+        )
+        matatu_rows = Matatu.objects.bulk_create(
+            Matatu(
+                registration_number=f'{prefix.upper()}{n:06d}', route=route_rows[n % routes],
+                capacity=rng.choice([14, 14, 14, 33, 51]), owner=owner_rows[rng.randrange(owners)],
+                licence_expiry_date=end + datetime.timedelta(days=rng.randrange(-30, 400)),
+            )
+            for n in range(matatus)
+        )
+        driver_rows = Driver.objects.bulk_create(
+            Driver(user=user, phone_number=f'07{rng.randrange(10 ** 8):08d}', assigned_matatu=matatu,
+                   licence_expiry_date=end + datetime.timedelta(days=rng.randrange(-30, 400)))
+            for user, matatu in zip(driver_users, matatu_rows)
+        )
+        Conductor.objects.bulk_create(
+            Conductor(user=user, phone_number=f'07{rng.randrange(10 ** 8):08d}', assigned_driver=driver,
+                      licence_expiry_date=end + datetime.timedelta(days=rng.randrange(-30, 400)))
+            for user, driver in zip(conductor_users, driver_rows)
+        )
+        manager_rows = Manager.objects.bulk_create(
+            Manager(user=user, phone_number=f'07{rng.randrange(10 ** 8):08d}') for user in manager_users
+        )
+        Manager.assigned_matatus.through.objects.bulk_create(
+            Manager.assigned_matatus.through(manager_id=manager_rows[n % managers].pk, matatu_id=matatu.pk)
+            for n, matatu in enumerate(matatu_rows)
+        )
+
+    counts = {
+        'routes': routes, 'owners': owners, 'matatus': matatus, 'drivers': matatus,
+        'conductors': matatus, 'managers': managers, 'revenues': 0, 'expenses': 0, 'payments': 0,
+    }
+    names = {Revenue: 'revenues', Expense: 'expenses', Payment: 'payments'}
+    buffers = {model: [] for model in names}
+    matatu_ids = [matatu.pk for matatu in matatu_rows]
+    crews = [(driver.pk, conductor.pk) for driver, conductor in zip(driver_users, conductor_users)]
+    categories = {name: ExpenseCategory.resolve(name).pk for name, *_ in EXPENSES}
+
+    def flush(model):
+        _insert(model, HISTORY_FIELDS[model], buffers[model])
+        counts[names[model]] += len(buffers[model])
+        buffers[model].clear()
+
+    connection = connections[router.db_for_write(Revenue)]
+    started = time.perf_counter()
+    with transaction.atomic(using=connection.alias):
+        for model, row in _history(rng, matatu_ids, crews, categories, start, days, connection):
+            buffers[model].append(row)
+            if len(buffers[model]) >= batch_size:
+                flush(model)
+        for model in names:
+            flush(model)
+    elapsed = time.perf_counter() - started
+
+    # What the save receivers would have done row by row.
+    rollups.rebuild()
+    response_cache.invalidate(Route, Matatu, Revenue, Expense)
+
+    history = counts['revenues'] + counts['expenses'] + counts['payments']
+    return {
+        **counts,
+        'start': start,
+        'end': end,
+        'seconds': round(elapsed, 3),
+        'rows_per_second': round(history / elapsed) if elapsed else None,
+    }
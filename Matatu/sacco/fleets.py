@@ -0,0 +1,128 @@
+"""
+Fleet scoping for managers.
+
+A manager only sees the matatus assigned to its Manager profile
+(``Manager.assigned_matatus``) and the crew, revenue and expenses of those
+matatus. Only superusers and managers whose profile is marked
+``sacco_wide`` see the whole sacco. A user in the Manager group with no
+profile, whether it was never created or has been deleted, sees nothing.
+
+A manager's fleet, the set of its matatu ids, is loaded with one query and
+memoised on the user instance for the rest of the request. Between requests
+it is kept only in the shared cache that role sets use (see ``sacco.roles``).
+The receivers in ``sacco.signals`` clear it whenever assignments change or
+the profile is created or deleted.
+
+Scoping is a single ``matatu_id IN (...)`` filter on those ids, which the
+``(matatu, -date, -id)`` indexes serve, so a manager's reads cost in
+proportion to the fleet rather than to the whole sacco.
+"""
+import hashlib
+from functools import partial
+
+from django.db import transaction
+from django.db.models import Q
+
+from sacco.models import Manager
+from sacco.roles import MANAGER, ahas_role, auth_cache, has_role
+
+FLEET_CACHE_TIMEOUT = 60 * 15
+
+# Payments reach a matatu through the driver or the conductor they paid.
+PAYMENT_FIELDS = (
+    'receiver__driver_profile__assigned_matatu_id',
+    'receiver__conductor_profile__assigned_driver__assigned_matatu_id',
+)
+
+_MISSING = object()
+
+
+def fleet_cache_key(user_id):
+    return f'sacco:fleet:{user_id}'
+
+
+def _fleet_queryset(user):
+    # No row: no Manager profile. A None id: a profile with no matatus.
+    return Manager.objects.filter(user_id=user.pk).values_list('sacco_wide', 'assigned_matatus')
+
+
+def _fleet(rows):
+    if any(sacco_wide for sacco_wide, _ in rows):
+        return None
+    # No profile gives no rows, and so an empty fleet.
+    return frozenset(matatu_id for _, matatu_id in rows if matatu_id is not None)
+
+
+def get_fleet(user):
+    """
+    Return the frozenset of matatu ids ``user`` is scoped to, or None when
+    the user sees the whole sacco.
+    """
+    if user is None or not user.is_authenticated or user.is_superuser or not has_role(user, MANAGER):
+        return None
+
+    fleet = getattr(user, '_sacco_fleet_cache', _MISSING)
+    if fleet is _MISSING:
+        cache, key = auth_cache(), fleet_cache_key(user.pk)
+        fleet = cache.get(key, _MISSING)
+        if fleet is _MISSING:
+            fleet = _fleet(list(_fleet_queryset(user)))
+            cache.set(key, fleet, FLEET_CACHE_TIMEOUT)
+        user._sacco_fleet_cache = fleet
+    return fleet
+
+
+async def aget_fleet(user):
+    """
+    Async counterpart of ``get_fleet()`` for async views.
+    """
+    if user is None or not user.is_authenticated or user.is_superuser or not await ahas_role(user, MANAGER):
+        return None
+
+    fleet = getattr(user, '_sacco_fleet_cache', _MISSING)
+    if fleet is _MISSING:
+        cache, key = auth_cache(), fleet_cache_key(user.pk)
+        fleet = await cache.aget(key, _MISSING)
+        if fleet is _MISSING:
+            fleet = _fleet([row async for row in _fleet_queryset(user)])
+            await cache.aset(key, fleet, FLEET_CACHE_TIMEOUT)
+        user._sacco_fleet_cache = fleet
+    return fleet
+
+
+def scope(queryset, fleet, field='matatu_id'):
+    """
+    Restrict ``queryset`` to rows whose ``field`` is a matatu in ``fleet``.
+    ``field`` may be a tuple of lookups, any of which may match.
+    """
+    if fleet is None:
+        return queryset
+    if isinstance(field, tuple):
+        condition = Q()
+        for lookup in field:
+            condition |= Q(**{f'{lookup}__in': fleet})
+        # One-to-one joins: no row matches twice.
+        return queryset.filter(condition)
+    return queryset.filter(**{f'{field}__in': fleet})
+
+
+def fleet_scope(fleet):
+    """
+    Return a short string that differs between fleets, for cache keys and
+    ETags; empty for unscoped users.
+    """
+    if fleet is None:
+        return ''
+    ids = ','.join(str(matatu_id) for matatu_id in sorted(fleet))
+    return 'fleet:' + hashlib.md5(ids.encode('ascii')).hexdigest()
+
+
+def invalidate_fleets(*user_ids):
+    """
+    Drop the cached fleets of the given users.
+    """
+    cache, keys = auth_cache(), [fleet_cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    # A request that read the assignments before the change committed may
+    # have cached them again in the meantime.
+    transaction.on_commit(partial(cache.delete_many, keys))
@@ -0,0 +1,131 @@
+"""
+Idempotency keys for POSTs from clients that retry.
+
+A client sends an ``Idempotency-Key`` header, unique per logical write, and
+sends the same key again when it retries after a dropped connection. The
+first request reserves the key by inserting an IdempotencyKey row, then
+stores its response there. A retry finds the row with one lookup on the
+``(user, key)`` unique index and gets the stored response back without the
+request being validated or written again.
+
+Only successful responses are kept. A request that fails releases its key,
+so the client may correct it and send it again with the same key. A key
+sent again with a different body is refused, and so is a retry that arrives
+while the first request is still running. A reservation that has stored no
+response after ``SACCO_IDEMPOTENCY_LEASE_SECONDS`` belonged to a process
+that died mid-request; the next request with the key takes it over.
+
+Keys are per user and are kept for ``SACCO_IDEMPOTENCY_KEY_HOURS``;
+``manage.py prune_idempotency_keys`` deletes older ones.
+"""
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.http import QueryDict
+from django.utils.timezone import now
+
+from sacco.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+class KeyInUse(Exception):
+    """The first request with this key has not finished yet."""
+
+
+class KeyReused(Exception):
+    """The key was first sent with a different request."""
+
+
+def retention():
+    return datetime.timedelta(hours=getattr(settings, 'SACCO_IDEMPOTENCY_KEY_HOURS', 24))
+
+
+def lease():
+    return datetime.timedelta(seconds=getattr(settings, 'SACCO_IDEMPOTENCY_LEASE_SECONDS', 60))
+
+
+def fingerprint(request):
+    """
+    Return a digest of the request's method, path and parsed body.
+    """
+    data = request.data
+    if isinstance(data, QueryDict):
+        data = sorted(data.lists())
+    payload = json.dumps([request.method, request.path, data], cls=DjangoJSONEncoder, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def begin(user, key, request_hash):
+    """
+    Return the finished IdempotencyKey to replay, or reserve ``key`` for
+    ``user`` and return None.
+
+    Raises KeyReused if the key was sent before with another request, and
+    KeyInUse if that request is still running. A reservation older than the
+    lease is taken over.
+    """
+    keys = IdempotencyKey.objects.filter(user=user, key=key)
+    record = keys.first()
+    if record is not None and record.created_at < now() - retention():
+        # Expired but not pruned yet: start afresh.
+        keys.filter(created_at__lt=now() - retention()).delete()
+        record = None
+
+    if record is None:
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(user=user, key=key, request_hash=request_hash)
+            return None
+        except IntegrityError:
+            # Another request with the same key reserved it first.
+            record = keys.first()
+            if record is None:
+                raise KeyInUse()
+
+    if record.status_code is None and record.created_at < now() - lease():
+        # Abandoned: only one of the requests racing for it gets it.
+        taken = keys.filter(pk=record.pk, status_code__isnull=True, created_at=record.created_at).update(
+            created_at=now(), request_hash=request_hash,
+        )
+        if taken:
+            return None
+        raise KeyInUse()
+    if record.request_hash != request_hash:
+        raise KeyReused()
+    if record.status_code is None:
+        raise KeyInUse()
+    return record
+
+
+def finish(user, key, response):
+    """
+    Store the response of the request that reserved ``key``. A response
+    that is not successful releases the key instead.
+    """
+    keys = IdempotencyKey.objects.filter(user=user, key=key, status_code__isnull=True)
+    if response.status_code >= 300:
+        keys.delete()
+        return
+    keys.update(status_code=response.status_code, response_body=response.data)
+
+
+def release(user, key):
+    """
+    Give up a reservation whose request failed.
+    """
+    IdempotencyKey.objects.filter(user=user, key=key, status_code__isnull=True).delete()
+
+
+def prune_keys():
+    """
+    Delete keys older than the retention window. Returns the count.
+    """
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=now() - retention()).delete()
+    return deleted
@@ -0,0 +1,145 @@
+"""
+Batch revenue ingest for the end-of-day close.
+
+A whole batch is validated in one pass, all referenced matatus are resolved
+with a single query and every Revenue row is written by one ``bulk_create``
+that upserts on ``(matatu, date)``. Re-submitting a batch therefore never
+trips the unique constraint; the upsert policy decides whether a resubmitted
+amount replaces or is added to what is already stored.
+"""
+from collections import defaultdict
+from functools import partial
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+from rest_framework import serializers
+
+from sacco import response_cache, rollups
+from sacco.models import Matatu, MatatuRouteRevenue, Revenue
+from sacco.serializers import RevenueRecordSerializer
+
+REPLACE = 'replace'
+ACCUMULATE = 'accumulate'
+POLICIES = (REPLACE, ACCUMULATE)
+
+MAX_AMOUNT = Decimal('99999999.99')
+
+
+def default_policy():
+    return getattr(settings, 'SACCO_REVENUE_UPSERT_POLICY', REPLACE)
+
+
+def max_records():
+    return getattr(settings, 'SACCO_REVENUE_BULK_MAX_RECORDS', 5000)
+
+
+def ingest_revenues(records, policy=None, logged_by=None, fleet=None):
+    """
+    Validate and upsert today's Revenue for a batch of records.
+
+    ``records`` is a list of ``{'matatu': <id>, 'amount_collected': <amount>}``
+    dicts. With a ``fleet`` (see ``sacco.fleets``), records for matatus
+    outside it are refused. Returns one result dict per input record, in
+    input order.
+    """
+    policy = policy or default_policy()
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown upsert policy '{policy}'.")
+
+    results = [None] * len(records)
+    validated = {}
+
+    # One pass of field validation with a single serializer instance.
+    child = RevenueRecordSerializer()
+    for index, record in enumerate(records):
+        try:
+            validated[index] = child.run_validation(record)
+        except serializers.ValidationError as exc:
+            results[index] = {'index': index, 'status': 'error', 'errors': exc.detail}
+
+    routes = dict(
+        Matatu.objects
+        .filter(pk__in={data['matatu'] for data in validated.values()})
+        .values_list('pk', 'route_id')
+    )
+
+    # Merge records for the same matatu according to the policy.
+    amounts = {}
+    rows_by_matatu = defaultdict(list)
+    for index, data in validated.items():
+        matatu_id = data['matatu']
+        if matatu_id not in routes:
+            results[index] = {
+                'index': index, 'status': 'error',
+                'errors': {'matatu': [f'Invalid pk "{matatu_id}" - object does not exist.']},
+            }
+            continue
+        if fleet is not None and matatu_id not in fleet:
+            results[index] = {
+                'index': index, 'status': 'error',
+                'errors': {'matatu': ['This matatu is not in your fleet.']},
+            }
+            continue
+        if policy == ACCUMULATE and matatu_id in amounts:
+            amounts[matatu_id] += data['amount_collected']
+        else:
+            amounts[matatu_id] = data['amount_collected']
+        rows_by_matatu[matatu_id].append(index)
+
+    if not amounts:
+        return results
+
+    today = now().date()
+    with transaction.atomic():
+        previous = dict(
+            Revenue.objects.select_for_update()
+            .filter(matatu_id__in=amounts, date=today)
+            .values_list('matatu_id', 'amount_collected')
+        )
+        rolled_up_routes = dict(
+            MatatuRouteRevenue.objects
+            .filter(matatu_id__in=previous, date=today)
+            .values_list('matatu_id', 'route_id')
+        )
+
+        revenues, deltas = [], defaultdict(Decimal)
+        for matatu_id, amount in amounts.items():
+            if policy == ACCUMULATE and matatu_id in previous:
+                amount += previous[matatu_id]
+            if amount > MAX_AMOUNT:
+                for index in rows_by_matatu[matatu_id]:
+                    results[index] = {
+                        'index': index, 'status': 'error',
+                        'errors': {'amount_collected': [f'Total for the day exceeds {MAX_AMOUNT}.']},
+                    }
+                continue
+
+            revenues.append(Revenue(matatu_id=matatu_id, amount_collected=amount, logged_by=logged_by))
+            if matatu_id in previous:
+                deltas[(matatu_id, rolled_up_routes.get(matatu_id), today)] -= previous[matatu_id]
+            deltas[(matatu_id, routes[matatu_id], today)] += amount
+
+        Revenue.objects.bulk_create(
+            revenues,
+            update_conflicts=True,
+            unique_fields=['matatu', 'date'],
+            update_fields=['amount_collected', 'logged_by', 'updated_at'],
+        )
+        # bulk_create sends no save signals, so fold the batch into the rollups here.
+        rollups.apply_revenue_deltas(deltas)
+        transaction.on_commit(partial(response_cache.invalidate, Revenue))
+
+    for revenue in revenues:
+        status = 'updated' if revenue.matatu_id in previous else 'created'
+        for index in rows_by_matatu[revenue.matatu_id]:
+            results[index] = {
+                'index': index,
+                'status': status,
+                'id': revenue.pk,
+                'matatu': revenue.matatu_id,
+                'amount_collected': str(revenue.amount_collected),
+                'date': today.isoformat(),
+            }
+    return results
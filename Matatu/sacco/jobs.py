@@ -0,0 +1,301 @@
+"""
+Background jobs stored in the database.
+
+Web requests enqueue a Job row and return straight away; ``manage.py
+run_jobs`` workers run the jobs. A worker claims the oldest due job with
+``SELECT ... FOR UPDATE SKIP LOCKED``, so any number of worker processes, on
+any number of hosts, can poll the same table without waiting on each other
+or taking the same job. SQLite has no row locks and ignores the clause;
+there the conditional update that marks the job running decides which
+worker got it.
+
+A job that raises is retried up to ``max_attempts`` times, waiting
+``SACCO_JOB_RETRY_SECONDS`` before the second attempt and twice as long
+before each one after that; then it is marked failed. The job keeps only
+the exception's one-line message; the traceback goes to the log.
+Tasks report their progress as they go, which doubles as the worker's
+heartbeat: a running job whose heartbeat is older than
+``SACCO_JOB_TIMEOUT_SECONDS`` belonged to a worker that died, and is queued
+again.
+
+``TASKS`` maps each task name to its function and the serializer that
+checks its parameters, both when it is enqueued and when it runs. Tasks in
+``SACCO_WIDE_TASKS`` act on every matatu regardless of who queued them, so
+only superusers may queue them; the others are limited to the fleet of the
+user who queued them.
+"""
+import datetime
+import logging
+import os
+import socket
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from sacco import exports, fleets, licences, rollups, statements
+from sacco.models import Job
+from sacco.serializers import (
+    ExportJobSerializer, LicenceExpiryQuerySerializer, RollupJobSerializer, StatementJobSerializer,
+)
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_SECONDS = 60 * 60
+MAX_ERROR_LENGTH = 500
+# Export chunks written between two progress reports.
+EXPORT_REPORT_CHUNKS = 50
+
+
+class InvalidJob(Exception):
+    def __init__(self, errors):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def poll_seconds():
+    return getattr(settings, 'SACCO_JOB_POLL_SECONDS', 1)
+
+
+def timeout():
+    return datetime.timedelta(seconds=getattr(settings, 'SACCO_JOB_TIMEOUT_SECONDS', 600))
+
+
+def retry_delay(attempts):
+    """
+    Return how long to wait before retrying a job that failed ``attempts`` times.
+    """
+    base = getattr(settings, 'SACCO_JOB_RETRY_SECONDS', 30)
+    return datetime.timedelta(seconds=min(base * 2 ** (attempts - 1), MAX_RETRY_SECONDS))
+
+
+def output_dir():
+    return Path(getattr(settings, 'SACCO_JOB_OUTPUT_DIR', settings.BASE_DIR / 'job-output'))
+
+
+def report_progress(job, done, total=100, message=''):
+    """
+    Record that ``done`` of ``total`` units of ``job`` are finished. This is
+    also the job's heartbeat, so long tasks should report at least once
+    every SACCO_JOB_TIMEOUT_SECONDS.
+    """
+    job.progress = min(100, done * 100 // total) if total else 100
+    job.progress_message = message[:255]
+    job.heartbeat_at = now()
+    Job.objects.filter(pk=job.pk, worker=job.worker).update(
+        progress=job.progress, progress_message=job.progress_message, heartbeat_at=job.heartbeat_at,
+    )
+
+
+# Tasks
+def rebuild_rollups(job, start=None, end=None):
+    # Rebuilding is the first half of the job, checking the second.
+    def rebuilt(done, total):
+        report_progress(job, done, 2 * total, f"{done} of {total} date ranges rebuilt.")
+
+    def checked(done, total):
+        report_progress(job, total + done, 2 * total, f"{done} of {total} date ranges checked.")
+
+    report_progress(job, 0, message="Rebuilding rollups.")
+    matatu_rows, route_rows = rollups.rebuild(start, end, progress=rebuilt)
+    mismatches = rollups.verify(start, end, progress=checked)
+    return {'matatu_rows': matatu_rows, 'route_rows': route_rows, 'mismatches': mismatches}
+
+
+def owner_statements(job, month, force=False):
+    def progress(done, total):
+        report_progress(job, done, total, f"{done} of {total} statements written.")
+
+    return statements.generate(month, force=force, progress=progress)
+
+
+def _fleet(job):
+    return fleets.get_fleet(job.created_by) if job.created_by_id else None
+
+
+def licence_expiry_digest(job, days=30, include_expired=False):
+    return licences.expiry_digest(days, include_expired=include_expired, fleet=_fleet(job))
+
+
+def export(job, resource, start, end, file_format=exports.CSV):
+    """
+    Write an export to a file under SACCO_JOB_OUTPUT_DIR, limited to the
+    fleet of the user who asked for it. The result names the file within
+    the job's directory (see ``output_path()``).
+    """
+    fleet = _fleet(job)
+    directory = output_dir() / str(job.pk)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f'{resource}-{start}-{end}.{file_format}'
+
+    written = 0
+    with open(path, 'w', encoding='utf-8', newline='') as output:
+        for chunks, chunk in enumerate(exports.stream_export(resource, file_format, start, end, fleet), 1):
+            output.write(chunk)
+            written += len(chunk)
+            if chunks % EXPORT_REPORT_CHUNKS == 0:
+                # The total is not known up front; report the size so far.
+                report_progress(job, 0, message=f"{written} characters written.")
+    return {'file': path.name, 'size': written}
+
+
+# task name -> (function, parameters serializer)
+TASKS = {
+    'rebuild_rollups': (rebuild_rollups, RollupJobSerializer),
+    'owner_statements': (owner_statements, StatementJobSerializer),
+    'licence_expiry_digest': (licence_expiry_digest, LicenceExpiryQuerySerializer),
+    'export': (export, ExportJobSerializer),
+}
+
+# Tasks that act on the whole sacco; only superusers may queue them.
+SACCO_WIDE_TASKS = frozenset({'rebuild_rollups', 'owner_statements'})
+
+
+def output_path(job):
+    """
+    Return the path of the file an export job wrote.
+    """
+    return output_dir() / str(job.pk) / job.result['file']
+
+
+def may_enqueue(user, task):
+    return user.is_superuser or task not in SACCO_WIDE_TASKS
+
+
+def error_message(exc):
+    """
+    Return the one-line message recorded on a job that raised ``exc``.
+    """
+    return f'{type(exc).__name__}: {exc}'[:MAX_ERROR_LENGTH]
+
+
+def clean_params(task, params):
+    """
+    Return the validated parameters for ``task``, or raise InvalidJob.
+    """
+    if task not in TASKS:
+        raise InvalidJob({'task': [f"Unknown task '{task}'."]})
+    if not isinstance(params, dict):
+        raise InvalidJob({'params': ["Expected an object."]})
+    serializer = TASKS[task][1](data=params)
+    if not serializer.is_valid():
+        raise InvalidJob({'params': serializer.errors})
+    return serializer.validated_data
+
+
+def enqueue(task, params=None, user=None, run_at=None):
+    """
+    Queue ``task`` with ``params`` (JSON-serialisable, as the task's
+    serializer accepts them) and return the Job. Raises InvalidJob.
+    """
+    params = params or {}
+    validated = clean_params(task, params)
+    return Job.objects.create(
+        task=task,
+        params={name: params[name] for name in validated if name in params},
+        created_by=user,
+        run_at=run_at or now(),
+        max_attempts=getattr(settings, 'SACCO_JOB_MAX_ATTEMPTS', 3),
+    )
+
+
+def claim(worker):
+    """
+    Mark the oldest due job as running for ``worker`` and return it, or
+    None when no job is due.
+    """
+    while True:
+        with transaction.atomic():
+            job = (
+                Job.objects.select_for_update(skip_locked=True)
+                .filter(status=Job.QUEUED, run_at__lte=now())
+                .order_by('run_at', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            claimed_at = now()
+            claimed = Job.objects.filter(pk=job.pk, status=Job.QUEUED).update(
+                status=Job.RUNNING, worker=worker, heartbeat_at=claimed_at, attempts=F('attempts') + 1,
+            )
+        if claimed:
+            job.status, job.worker, job.heartbeat_at = Job.RUNNING, worker, claimed_at
+            job.attempts += 1
+            return job
+        # Another worker took it between the read and the update.
+
+
+def requeue_stale():
+    """
+    Queue again the running jobs whose worker stopped sending heartbeats,
+    or fail them if they have no attempts left. Returns the number of jobs.
+    """
+    stale = Job.objects.filter(status=Job.RUNNING, heartbeat_at__lt=now() - timeout())
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, error="The worker running this job stopped.", finished_at=now(),
+    )
+    return failed + stale.update(status=Job.QUEUED, worker='', run_at=now())
+
+
+def _finish(job, **fields):
+    # A worker that lost the job to requeue_stale() must not overwrite it.
+    Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker).update(**fields)
+    for name, value in fields.items():
+        setattr(job, name, value)
+
+
+def run(job):
+    """
+    Run a claimed job and record its result, or schedule its retry.
+    """
+    try:
+        params = clean_params(job.task, job.params)
+    except InvalidJob as exc:
+        # Running it again cannot help.
+        logger.error("Job %s cannot run: %s", job.pk, exc.errors)
+        _finish(job, status=Job.FAILED, error=str(exc.errors), finished_at=now())
+        return job
+
+    try:
+        result = TASKS[job.task][0](job, **params)
+    except Exception as exc:
+        logger.exception("Job %s failed (attempt %s of %s).", job.pk, job.attempts, job.max_attempts)
+        if job.attempts < job.max_attempts:
+            _finish(job, status=Job.QUEUED, worker='', error=error_message(exc),
+                    run_at=now() + retry_delay(job.attempts))
+        else:
+            _finish(job, status=Job.FAILED, error=error_message(exc), finished_at=now())
+    else:
+        _finish(job, status=Job.SUCCEEDED, result=result, progress=100, error='', finished_at=now())
+    return job
+
+
+def work(worker=None, once=False, max_jobs=None):
+    """
+    Claim and run jobs until stopped. With ``once``, stop as soon as no job
+    is due; with ``max_jobs``, after running that many. Returns the number
+    of jobs run.
+    """
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    ran = 0
+    while max_jobs is None or ran < max_jobs:
+        close_old_connections()
+        try:
+            requeue_stale()
+            job = claim(worker)
+        except DatabaseError:
+            # Such as SQLite refusing a second writer; try again next tick.
+            logger.exception("Claiming a job failed.")
+            time.sleep(poll_seconds())
+            continue
+        if job is None:
+            if once:
+                break
+            time.sleep(poll_seconds())
+            continue
+        run(job)
+        ran += 1
+    return ran
@@ -0,0 +1,43 @@
+"""
+Licence expiry digests for matatus, drivers and conductors.
+
+Each section of a digest is a single ``values()`` query against the indexed
+``licence_expiry_date`` column; nothing is evaluated per object in Python.
+"""
+from django.db.models import F
+from django.utils.timezone import now
+
+from sacco import fleets
+from sacco.models import Conductor, Driver, Matatu
+
+SECTIONS = {
+    'matatus': (Matatu, ['id', 'registration_number', 'owner_id', 'licence_expiry_date'], {}),
+    'drivers': (Driver, ['id', 'phone_number', 'assigned_matatu_id', 'licence_expiry_date'],
+                {'username': F('user__username')}),
+    'conductors': (Conductor, ['id', 'phone_number', 'assigned_driver_id', 'licence_expiry_date'],
+                   {'username': F('user__username')}),
+}
+
+# section -> lookup from the section's model to the matatu id
+FLEET_FIELDS = {
+    'matatus': 'id',
+    'drivers': 'assigned_matatu_id',
+    'conductors': 'assigned_driver__assigned_matatu_id',
+}
+
+
+def expiry_digest(days, include_expired=False, fleet=None):
+    """
+    Return every matatu, driver and conductor whose licence expires within
+    ``days`` days, soonest first, keyed by section name. With a ``fleet``,
+    only its matatus and the crews assigned to them are listed.
+    """
+    digest = {'as_of': now().date(), 'days': days}
+    for section, (model, fields, expressions) in SECTIONS.items():
+        digest[section] = list(
+            fleets.scope(model.objects.all(), fleet, FLEET_FIELDS[section])
+            .licence_expiring_within(days, include_expired=include_expired)
+            .order_by('licence_expiry_date', 'id')
+            .values(*fields, **expressions)
+        )
+    return digest
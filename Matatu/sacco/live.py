@@ -0,0 +1,191 @@
+"""
+Live revenue and expense feed for the manager dashboard.
+
+One producer per process polls the database for Revenue and Expense rows
+changed since its last poll (the same indexed ``updated_at`` change feed and
+overlap as delta sync) and for today's per-route totals, then fans the
+events out to every subscriber through an in-process queue. A thousand
+dashboards open on a worker therefore cost one query per table per poll
+instead of a thousand polling clients re-reading the day.
+
+Each event is rendered once, as a server-sent event, and the same bytes are
+queued for every subscriber. A subscriber that falls ``BUFFER`` events
+behind is disconnected; its EventSource reconnects and starts again from a
+fresh snapshot. The producer starts with the first subscriber and stops
+after the last one leaves.
+
+Managers scoped to a fleet (``sacco.fleets``) only receive the revenue and
+expense events of their own matatus; route totals go to everyone.
+
+The feed lives on the event loop of an ASGI worker (``Matatu/asgi.py``), so
+serve it with an ASGI server; under WSGI each stream would hold a thread.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError
+from django.utils.timezone import now
+
+from sacco import fastpath, sync
+from sacco.models import Expense, Revenue, RouteRevenue, today
+from sacco.serializers import ExpenseSerializer, RevenueSerializer
+
+# event name -> (model, serializer)
+FEEDS = {
+    'revenue': (Revenue, RevenueSerializer),
+    'expense': (Expense, ExpenseSerializer),
+}
+
+logger = logging.getLogger(__name__)
+
+BUFFER = 1000
+HEARTBEAT_SECONDS = 15
+
+
+def poll_seconds():
+    return getattr(settings, 'SACCO_LIVE_POLL_SECONDS', 2)
+
+
+def message(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data, cls=DjangoJSONEncoder)}']
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+def route_totals(date):
+    return {
+        row['route_id']: row['total_revenue']
+        for row in RouteRevenue.objects.filter(date=date).values('route_id', 'total_revenue')
+    }
+
+
+def changed_rows(since, seen):
+    """
+    Return ``(events, seen)``: ``(event, row)`` for every Revenue and Expense
+    row changed since ``since`` and not already in ``seen``, and the rows of
+    this poll to pass as ``seen`` next time.
+    """
+    events, window = [], {}
+    for event, (model, serializer_class) in FEEDS.items():
+        representation = fastpath.representation_for(serializer_class)
+        queryset = model.objects.filter(updated_at__gte=since - sync.overlap()).order_by('updated_at', 'id')
+        for row in representation.represent(list(representation.values(queryset))):
+            key = (event, row['id'])
+            window[key] = row
+            # Rows inside the overlap come back on the next poll too.
+            if seen.get(key) != row:
+                events.append((event, row))
+    return events, window
+
+
+class Feed:
+    def __init__(self):
+        # queue -> fleet (frozenset of matatu ids, or None for everything)
+        self.subscribers = {}
+        self.producer = None
+        self.day = None
+        self.totals = {}
+        self.sequence = 0
+
+    def snapshot(self):
+        return message('route-totals', {
+            'date': self.day,
+            'totals': [{'route': route, 'total_revenue': total} for route, total in sorted(self.totals.items())],
+        })
+
+    async def subscribe(self, fleet=None):
+        """
+        Return a queue that receives a snapshot of today's route totals and
+        then every event, or only those of the matatus in ``fleet``.
+        """
+        if self.producer is None or self.producer.done():
+            self.day = today()
+            self.totals = await sync_to_async(route_totals)(self.day)
+            self.producer = asyncio.get_running_loop().create_task(self.produce())
+        queue = asyncio.Queue(maxsize=BUFFER)
+        queue.put_nowait(self.snapshot())
+        self.subscribers[queue] = fleet
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.pop(queue, None)
+
+    def publish(self, data, matatu=None):
+        """
+        Queue ``data`` for every subscriber, or, for an event about
+        ``matatu``, for those whose fleet includes it.
+        """
+        for queue, fleet in list(self.subscribers.items()):
+            if matatu is not None and fleet is not None and matatu not in fleet:
+                continue
+            try:
+                queue.put_nowait(data)
+            except asyncio.QueueFull:
+                # Too slow to keep up: drop its backlog and close its stream.
+                self.unsubscribe(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    async def poll(self, since, seen):
+        events, seen = await sync_to_async(changed_rows)(since, seen)
+        for event, row in events:
+            self.sequence += 1
+            self.publish(message(event, row, self.sequence), row['matatu'])
+
+        day = today()
+        if day != self.day or any(event == 'revenue' for event, _ in events):
+            totals = await sync_to_async(route_totals)(day)
+            changed = {
+                route: total for route, total in totals.items()
+                if day != self.day or self.totals.get(route) != total
+            }
+            self.day, self.totals = day, totals
+            for route, total in changed.items():
+                self.sequence += 1
+                self.publish(message('route-total', {'route': route, 'date': day, 'total_revenue': total},
+                                     self.sequence))
+        return seen
+
+    async def produce(self):
+        since, seen = now(), {}
+        while self.subscribers:
+            await asyncio.sleep(poll_seconds())
+            if not self.subscribers:
+                break
+            polled_at = now()
+            try:
+                seen = await self.poll(since, seen)
+            except DatabaseError:
+                # Try again next tick from the same point; nothing is lost.
+                logger.exception("Live feed poll failed.")
+                continue
+            since = polled_at
+
+    async def stream(self, fleet=None):
+        """
+        Subscribe and yield the server-sent events for the new subscriber.
+        Subscribing waits for the first read, so a response that is never
+        sent never subscribes.
+        """
+        queue = await self.subscribe(fleet)
+        try:
+            while True:
+                try:
+                    data = await asyncio.wait_for(queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle connection.
+                    yield b': keepalive\n\n'
+                    continue
+                if data is None:
+                    return
+                yield data
+        finally:
+            self.unsubscribe(queue)
+
+
+feed = Feed()
@@ -0,0 +1,331 @@
+"""
+Load tests.
+
+``run_mixed()`` replays the traffic of a working sacco against the WSGI
+handler: conductors logging revenues and expenses, managers reading lists,
+reports and exports, and owners checking their matatus and profit-and-loss.
+Every simulated client is a real user of the role (a generated fleet from
+``sacco.fleetgen`` provides plenty), logged in with its own session. The
+report gives throughput and latency percentiles overall and per endpoint.
+
+``compare()`` runs the same read load against two running servers over
+HTTP, typically the synchronous endpoint behind a WSGI server and its async
+counterpart behind an ASGI server started from the same settings::
+
+    gunicorn Matatu.wsgi --threads 8 --bind 127.0.0.1:8000
+    uvicorn Matatu.asgi:application --port 8001
+
+``concurrency`` clients, each a thread with its own keep-alive connection,
+issue requests back to back until ``requests`` have been made. Which server
+comes out ahead depends on the servers, their worker counts, the database
+and the network, so it is measured here rather than assumed; no delay is
+simulated on either side.
+"""
+import datetime
+import http.client
+import io
+import json
+import math
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.handlers.wsgi import WSGIHandler
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+from django.utils.module_loading import import_string
+
+from sacco import roles
+from sacco.models import User, today
+
+HOST = 'localhost'
+PERCENTILES = (50, 90, 99)
+
+
+def session_cookie(user):
+    """
+    Create a logged-in session for ``user`` and return its Cookie header.
+    """
+    store = import_string(settings.SESSION_ENGINE + '.SessionStore')()
+    store[SESSION_KEY] = str(user.pk)
+    store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    store.create()
+    return f'{settings.SESSION_COOKIE_NAME}={store.session_key}'
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def summarise(mode, latencies, errors, elapsed):
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else None,
+        **{f'p{pct}_ms': round(percentile(latencies, pct) * 1000, 1) for pct in PERCENTILES},
+    }
+
+
+def wsgi_environ(method, path, query, cookie, body=b'', headers=None):
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SERVER_NAME': HOST,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'HTTP_HOST': HOST,
+        'HTTP_COOKIE': cookie,
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': io.StringIO(),
+        'wsgi.url_scheme': 'http',
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'wsgi.version': (1, 0),
+    }
+    environ.update(headers or {})
+    return environ
+
+
+def run_http(mode, url, cookie, requests, concurrency):
+    """
+    Send ``requests`` GETs for ``url`` from ``concurrency`` clients and
+    return the report. Latency is measured until the body is fully read.
+    """
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+    target = parts.path + (f'?{parts.query}' if parts.query else '')
+    remaining = iter(range(requests))
+    lock = threading.Lock()
+    latencies, errors = [], [0]
+
+    def client():
+        connection = connection_class(parts.netloc, timeout=60)
+        try:
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                started = time.perf_counter()
+                try:
+                    connection.request('GET', target, headers={'Cookie': cookie})
+                    response = connection.getresponse()
+                    response.read()
+                    ok = response.status == 200
+                except (OSError, http.client.HTTPException):
+                    connection.close()
+                    ok = False
+                with lock:
+                    latencies.append(time.perf_counter() - started)
+                    errors[0] += not ok
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    clients = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return summarise(mode, latencies, errors[0], time.perf_counter() - started)
+
+
+def compare(user, wsgi_url, asgi_url, requests=500, concurrency=50):
+    """
+    Run the same load against the WSGI and ASGI servers at the given URLs
+    and return both reports.
+    """
+    cookie = session_cookie(user)
+    return [
+        run_http('wsgi', wsgi_url, cookie, requests, concurrency),
+        run_http('asgi', asgi_url, cookie, requests, concurrency),
+    ]
+
+
+# Mixed traffic: what each role does, as (weight, url name, method).
+TRAFFIC = {
+    roles.CONDUCTOR: [
+        # Fares are reported trip by trip and added to the day's revenue.
+        (50, 'revenue-bulk', 'POST'),
+        (15, 'expense-list', 'POST'),
+        (25, 'revenue-list', 'GET'),
+        (10, 'expense-list', 'GET'),
+    ],
+    roles.MANAGER: [
+        (20, 'matatu-list', 'GET'),
+        (10, 'route-list', 'GET'),
+        (15, 'route-revenue-list', 'GET'),
+        (15, 'revenue-list', 'GET'),
+        (10, 'expense-list', 'GET'),
+        (15, 'profit-and-loss', 'GET'),
+        (5, 'export', 'GET'),
+        (10, 'licence-expiring', 'GET'),
+    ],
+    roles.OWNER: [
+        (60, 'profit-and-loss', 'GET'),
+        (40, 'matatu-detail', 'GET'),
+    ],
+}
+
+# Share of simulated clients per role.
+DEFAULT_MIX = {roles.CONDUCTOR: 60, roles.MANAGER: 25, roles.OWNER: 15}
+
+
+class Actor:
+    """
+    One simulated client: a user of a role, logged in, with the matatus it works with.
+    """
+    def __init__(self, role, user, matatus):
+        self.role = role
+        self.user = user
+        self.matatus = matatus
+        self.cookie = ''
+        self.csrf_token = ''
+
+    def login(self):
+        self.csrf_token = get_random_string(32)
+        self.cookie = f'{session_cookie(self.user)}; {settings.CSRF_COOKIE_NAME}={self.csrf_token}'
+
+
+def actors(mix, clients, rng, prefix=''):
+    """
+    Pick ``clients`` users with roles drawn according to ``mix`` and log them in.
+    """
+    users = User.objects.filter(username__startswith=prefix, is_active=True)
+    pools = {
+        roles.CONDUCTOR: [
+            (user, [matatu])
+            for user, matatu in users.filter(
+                groups__name=roles.CONDUCTOR,
+                conductor_profile__assigned_driver__assigned_matatu__isnull=False,
+            ).values_list('pk', 'conductor_profile__assigned_driver__assigned_matatu')
+        ],
+        roles.MANAGER: [(user, []) for user in users.filter(groups__name=roles.MANAGER).values_list('pk', flat=True)],
+        roles.OWNER: [],
+    }
+    owned = {}
+    for user, matatu in users.filter(groups__name=roles.OWNER, owner_profile__matatus__isnull=False).values_list(
+            'pk', 'owner_profile__matatus'):
+        owned.setdefault(user, []).append(matatu)
+    pools[roles.OWNER] = list(owned.items())
+
+    weights = {role: share for role, share in mix.items() if share and pools.get(role)}
+    if not weights:
+        raise ValueError("No users hold any of the roles in the traffic mix.")
+    picked = []
+    for role in rng.choices(list(weights), list(weights.values()), k=clients):
+        user, matatus = rng.choice(pools[role])
+        picked.append(Actor(role, User.objects.get(pk=user), matatus))
+    for actor in picked:
+        actor.login()
+    return picked
+
+
+def next_request(actor, rng):
+    """
+    Return ``(url name, method, path, query, body)`` for the actor's next request.
+    """
+    weights, names, methods = zip(*TRAFFIC[actor.role])
+    n = rng.choices(range(len(names)), weights)[0]
+    name, method = names[n], methods[n]
+    end = today()
+    kwargs, query, body = {}, '', None
+
+    if name == 'matatu-detail':
+        kwargs['pk'] = rng.choice(actor.matatus)
+    elif name == 'profit-and-loss':
+        query = f'period=day&start={end - datetime.timedelta(days=30)}&end={end}'
+    elif name == 'export':
+        kwargs['resource'] = 'revenues'
+        query = f'start={end - datetime.timedelta(days=7)}&end={end}'
+    elif name == 'licence-expiring':
+        query = 'days=30'
+
+    if name == 'revenue-bulk':
+        body = {
+            'records': [{'matatu': rng.choice(actor.matatus), 'amount_collected': f'{rng.randrange(100, 1500)}.00'}],
+            'policy': 'accumulate',
+        }
+    elif method == 'POST' and name == 'expense-list':
+        body = {
+            'matatu': rng.choice(actor.matatus), 'expense_type': 'Fuel',
+            'amount': f'{rng.randrange(500, 3000)}.00',
+        }
+    return name, method, reverse(name, kwargs=kwargs), query, body
+
+
+def run_mixed(clients, requests, mix=None, seed=0, prefix=''):
+    """
+    Replay ``requests`` requests of mixed conductor, manager and owner traffic
+    from ``clients`` concurrent clients against the WSGI handler, back to back.
+
+    Returns the overall report and one report per url name and method.
+    """
+    rng = random.Random(seed)
+    cast = actors(mix or DEFAULT_MIX, clients, rng, prefix)
+    handler = WSGIHandler()
+    remaining = iter(range(requests))
+    lock = threading.Lock()
+    results = []
+
+    def client(actor, rng):
+        while True:
+            with lock:
+                if next(remaining, None) is None:
+                    return
+            name, method, path, query, body = next_request(actor, rng)
+            headers = {}
+            data = b''
+            if body is not None:
+                data = json.dumps(body).encode()
+                headers = {'CONTENT_TYPE': 'application/json', 'HTTP_X_CSRFTOKEN': actor.csrf_token}
+            statuses = []
+            started = time.perf_counter()
+            response = handler(
+                wsgi_environ(method, path, query, actor.cookie, data, headers),
+                lambda status, headers, exc_info=None: statuses.append(status),
+            )
+            try:
+                for _ in response:
+                    pass
+            finally:
+                response.close()
+            latency = time.perf_counter() - started
+            with lock:
+                results.append((f'{method} {name}', latency, int(statuses[0].split()[0]) >= 400))
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=client, args=(actor, random.Random(rng.random())))
+        for actor in cast
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    endpoints = {}
+    for name, latency, failed in results:
+        latencies, errors = endpoints.setdefault(name, ([], [0]))
+        latencies.append(latency)
+        errors[0] += failed
+    return {
+        'overall': summarise('mixed', [latency for _, latency, _ in results],
+                             sum(failed for _, _, failed in results), elapsed),
+        'endpoints': [
+            summarise(name, latencies, errors[0], elapsed)
+            for name, (latencies, errors) in sorted(endpoints.items())
+        ],
+    }
@@ -0,0 +1,40 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sacco import archive
+
+
+def parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Move Revenue and Expense rows older than the archive horizon into the archive "
+        "tables, leaving daily per-matatu summaries behind."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before', type=parse_date,
+            help="Archive rows dated before this day (default: SACCO_ARCHIVE_HORIZON_DAYS ago).",
+        )
+        parser.add_argument(
+            '--batch-days', type=int, default=archive.BATCH_DAYS,
+            help=f"Days archived per transaction (default {archive.BATCH_DAYS}).",
+        )
+
+    def handle(self, *args, before=None, batch_days=archive.BATCH_DAYS, **options):
+        if batch_days < 1:
+            raise CommandError("--batch-days must be positive.")
+        before = before or archive.cutoff()
+
+        counts = archive.archive(before, batch_days=batch_days)
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {counts['revenues']} revenues and {counts['expenses']} expenses dated before "
+            f"{before}; wrote {counts['summaries']} daily summaries."
+        ))
@@ -0,0 +1,51 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sacco import loadtest
+from sacco.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Load test a read endpoint on running WSGI and ASGI servers over HTTP "
+        "and compare throughput and latency."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help="User to authenticate the requests as.")
+        parser.add_argument(
+            '--wsgi-url', default='http://127.0.0.1:8000/revenues/',
+            help="Synchronous endpoint on the WSGI server (default http://127.0.0.1:8000/revenues/).",
+        )
+        parser.add_argument(
+            '--asgi-url', default='http://127.0.0.1:8001/async/revenues/',
+            help="Async endpoint on the ASGI server (default http://127.0.0.1:8001/async/revenues/).",
+        )
+        parser.add_argument('--requests', type=int, default=500, help="Requests per mode (default 500).")
+        parser.add_argument('--concurrency', type=int, default=50, help="Concurrent clients (default 50).")
+        parser.add_argument('--json', action='store_true', dest='as_json', help="Write the reports as JSON.")
+
+    def handle(self, *args, username, wsgi_url, asgi_url, requests, concurrency, as_json=False, **options):
+        try:
+            user = User.objects.get(username=username)
+        except User.DoesNotExist:
+            raise CommandError(f"No user named '{username}'.")
+        if min(requests, concurrency) < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+
+        reports = loadtest.compare(user, wsgi_url, asgi_url, requests=requests, concurrency=concurrency)
+
+        if as_json:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+
+        columns = ['mode', 'requests', 'errors', 'seconds', 'requests_per_second'] + [
+            f'p{pct}_ms' for pct in loadtest.PERCENTILES
+        ]
+        self.stdout.write('  '.join(f'{column:>19}' for column in columns))
+        for report in reports:
+            self.stdout.write('  '.join(f'{str(report[column]):>19}' for column in columns))
+        for report in reports:
+            if report['errors']:
+                self.stderr.write(f"{report['mode']}: {report['errors']} requests did not return 200.")
@@ -0,0 +1,69 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sacco import fleetgen
+from sacco.models import User
+
+
+def parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic sacco: owners, matatus, routes, crews and managers, "
+        "with a daily revenue, expense and payment history for every matatu."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owners', type=int, default=20, help="Matatu owners (default 20).")
+        parser.add_argument('--matatus', type=int, default=100, help="Matatus, each with a crew (default 100).")
+        parser.add_argument('--days', type=int, default=365, help="Days of history (default 365).")
+        parser.add_argument('--end', type=parse_date, help="Last day of history (default today).")
+        parser.add_argument(
+            '--routes', type=int,
+            help=f"Routes (default one per {fleetgen.MATATUS_PER_ROUTE} matatus).",
+        )
+        parser.add_argument(
+            '--managers', type=int,
+            help=f"Managers (default one per {fleetgen.MATATUS_PER_MANAGER} matatus).",
+        )
+        parser.add_argument(
+            '--prefix', default='gen',
+            help="Prefix for generated usernames, route names and registration numbers (default 'gen').",
+        )
+        parser.add_argument('--seed', type=int, default=0, help="Random seed (default 0).")
+        parser.add_argument(
+            '--password', default=fleetgen.PASSWORD,
+            help=f"Password of every generated user (default '{fleetgen.PASSWORD}').",
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=fleetgen.BATCH_SIZE,
+            help=f"Rows per insert (default {fleetgen.BATCH_SIZE}).",
+        )
+
+    def handle(self, *args, owners, matatus, days, end, routes, managers, prefix, seed, password, batch_size,
+               **options):
+        if min(owners, matatus, days, batch_size) < 1 or min(routes or 1, managers or 1) < 1:
+            raise CommandError("Counts, --days and --batch-size must be positive.")
+        if len(prefix) > 9:
+            # Registration numbers are the upper-cased prefix plus six digits.
+            raise CommandError("--prefix must be at most 9 characters.")
+        if User.objects.filter(username__startswith=f'{prefix}-').exists():
+            raise CommandError(f"A fleet with prefix '{prefix}' already exists; choose another --prefix.")
+
+        counts = fleetgen.generate(
+            owners=owners, matatus=matatus, days=days, end=end, routes=routes, managers=managers,
+            prefix=prefix, seed=seed, password=password, batch_size=batch_size,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {counts['matatus']} matatus on {counts['routes']} routes for {counts['owners']} owners "
+            f"with {counts['managers']} managers, and {counts['revenues']} revenues, {counts['expenses']} "
+            f"expenses and {counts['payments']} payments from {counts['start']} to {counts['end']} "
+            f"in {counts['seconds']}s ({counts['rows_per_second']} rows/s)."
+        ))
+        self.stdout.write(f"Users are named {prefix}-owner0, {prefix}-manager0, {prefix}-conductor0, ...")
@@ -0,0 +1,41 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sacco import statements
+
+
+def parse_month(value):
+    try:
+        return datetime.datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f"Invalid month '{value}', expected YYYY-MM.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Write a CSV and a printable HTML statement of revenue, expenses and net per matatu "
+        "for every matatu owner for one month. Owners whose statement is unchanged since "
+        "the last run are skipped, so an interrupted run can simply be started again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('month', type=parse_month, help="The month to report on (YYYY-MM).")
+        parser.add_argument(
+            '--output', help="Directory to write to, one subdirectory per month (default: SACCO_STATEMENTS_DIR).",
+        )
+        parser.add_argument(
+            '--workers', type=int,
+            help="Processes rendering statements (default: one per CPU core).",
+        )
+        parser.add_argument('--force', action='store_true', help="Re-render unchanged statements too.")
+
+    def handle(self, *args, month, output=None, workers=None, force=False, **options):
+        if workers is not None and workers < 1:
+            raise CommandError("--workers must be positive.")
+
+        result = statements.generate(month, directory=output, workers=workers, force=force)
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {result['rendered']} of {result['owners']} owner statements for {month:%Y-%m} "
+            f"to {result['directory']} ({result['skipped']} unchanged) in {result['seconds']}s."
+        ))
@@ -0,0 +1,33 @@
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.management.base import BaseCommand
+
+from sacco.licences import SECTIONS, expiry_digest
+
+
+class Command(BaseCommand):
+    help = "Print the matatus, drivers and conductors whose licences expire soon."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=30, help="Look-ahead window in days (default 30).")
+        parser.add_argument(
+            '--include-expired', action='store_true',
+            help="Also list licences that have already expired.",
+        )
+        parser.add_argument('--json', action='store_true', dest='as_json', help="Write the digest as JSON.")
+
+    def handle(self, *args, days=30, include_expired=False, as_json=False, **options):
+        digest = expiry_digest(days, include_expired=include_expired)
+
+        if as_json:
+            self.stdout.write(json.dumps(digest, cls=DjangoJSONEncoder, indent=2))
+            return
+
+        self.stdout.write(f"Licences expiring within {days} days of {digest['as_of']}:")
+        for section in SECTIONS:
+            rows = digest[section]
+            self.stdout.write(f"\n{section.capitalize()} ({len(rows)})")
+            for row in rows:
+                label = row.get('registration_number') or row.get('username')
+                self.stdout.write(f"  {row['licence_expiry_date']}  {label}")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from sacco.idempotency import prune_keys
+
+
+class Command(BaseCommand):
+    help = "Delete idempotency keys older than SACCO_IDEMPOTENCY_KEY_HOURS."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Pruned {prune_keys()} idempotency keys.")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from sacco.sync import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = "Delete delta-sync tombstones older than SACCO_SYNC_TOMBSTONE_DAYS."
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Pruned {prune_tombstones()} tombstones.")
@@ -0,0 +1,41 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sacco import rollups
+
+
+def parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = "Rebuild the RouteRevenue and MatatuRouteRevenue rollups from Revenue and check them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=parse_date, help="First date to rebuild (inclusive).")
+        parser.add_argument('--end', type=parse_date, help="Last date to rebuild (inclusive).")
+        parser.add_argument(
+            '--check-only', action='store_true',
+            help="Only compare the rollups with Revenue; do not rebuild.",
+        )
+
+    def handle(self, *args, start=None, end=None, check_only=False, **options):
+        if start and end and start > end:
+            raise CommandError("--start must not be after --end.")
+
+        if not check_only:
+            matatu_rows, route_rows = rollups.rebuild(start, end)
+            self.stdout.write(
+                f"Rebuilt {matatu_rows} matatu route rollups and {route_rows} route rollups."
+            )
+
+        mismatches = rollups.verify(start, end)
+        for mismatch in mismatches:
+            self.stderr.write(mismatch)
+        if mismatches:
+            raise CommandError(f"{len(mismatches)} rollup mismatches found.")
+        self.stdout.write(self.style.SUCCESS("Rollups match Revenue."))
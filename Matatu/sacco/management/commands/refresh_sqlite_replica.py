@@ -0,0 +1,35 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from sacco.routers import replica_aliases
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy the primary SQLite database over each SQLite read replica, standing in for "
+        "replication when trying replica routing locally."
+    )
+
+    def handle(self, *args, **options):
+        aliases = replica_aliases()
+        if not aliases:
+            raise CommandError("No read replicas configured; set SACCO_SQLITE_REPLICA=1.")
+
+        databases = [settings.DATABASES[alias] for alias in [DEFAULT_DB_ALIAS, *aliases]]
+        if any(database['ENGINE'] != 'django.db.backends.sqlite3' for database in databases):
+            raise CommandError("Only SQLite primaries and replicas can be refreshed this way.")
+
+        source = sqlite3.connect(settings.DATABASES[DEFAULT_DB_ALIAS]['NAME'])
+        try:
+            for alias in aliases:
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f"Refreshed '{alias}' from the primary.")
+        finally:
+            source.close()
@@ -0,0 +1,35 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from sacco import jobs
+
+
+class Command(BaseCommand):
+    help = (
+        "Run queued background jobs. Any number of workers, started by this command "
+        "on one or more hosts, can share the queue."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help="Worker processes to run (default 1).")
+        parser.add_argument('--once', action='store_true', help="Stop when no job is due instead of waiting.")
+        parser.add_argument('--max-jobs', type=int, help="Stop each worker after running this many jobs.")
+
+    def handle(self, *args, processes=1, once=False, max_jobs=None, **options):
+        if processes < 1:
+            raise CommandError("--processes must be positive.")
+        if max_jobs is not None and max_jobs < 1:
+            raise CommandError("--max-jobs must be positive.")
+
+        if processes == 1:
+            ran = jobs.work(once=once, max_jobs=max_jobs)
+        else:
+            # Worker processes open their own connections.
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=processes, initializer=django.setup) as pool:
+                workers = [pool.submit(jobs.work, once=once, max_jobs=max_jobs) for _ in range(processes)]
+                ran = sum(worker.result() for worker in workers)
+        self.stdout.write(self.style.SUCCESS(f"Ran {ran} jobs."))
@@ -0,0 +1,62 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sacco import loadtest, roles
+
+ROLE_NAMES = {'conductor': roles.CONDUCTOR, 'manager': roles.MANAGER, 'owner': roles.OWNER}
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, share = part.partition('=')
+        if name.strip() not in ROLE_NAMES or not share.strip().isdigit():
+            raise CommandError(f"Invalid traffic mix '{value}', expected e.g. conductor=60,manager=25,owner=15.")
+        mix[ROLE_NAMES[name.strip()]] = int(share)
+    return mix
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay mixed conductor, manager and owner traffic against the sacco endpoints "
+        "and report throughput and latency percentiles."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help="Requests in total (default 1000).")
+        parser.add_argument('--clients', type=int, default=8, help="Concurrent clients (default 8).")
+        parser.add_argument(
+            '--mix', type=parse_mix, default=loadtest.DEFAULT_MIX,
+            help="Share of clients per role (default conductor=60,manager=25,owner=15).",
+        )
+        parser.add_argument(
+            '--prefix', default='',
+            help="Only act as users whose username starts with this, e.g. a generated fleet's 'gen-'.",
+        )
+        parser.add_argument('--seed', type=int, default=0, help="Random seed (default 0).")
+        parser.add_argument('--json', action='store_true', dest='as_json', help="Write the report as JSON.")
+
+    def handle(self, *args, requests, clients, mix, prefix, seed, as_json=False, **options):
+        if min(requests, clients) < 1:
+            raise CommandError("--requests and --clients must be positive.")
+        try:
+            report = loadtest.run_mixed(clients, requests, mix=mix, seed=seed, prefix=prefix)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        if as_json:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        columns = ['mode', 'requests', 'errors', 'requests_per_second'] + [
+            f'p{pct}_ms' for pct in loadtest.PERCENTILES
+        ]
+        width = max(len(row['mode']) for row in report['endpoints'] + [report['overall']])
+        self.stdout.write(f"{'endpoint':<{width}}  " + '  '.join(f'{column:>19}' for column in columns[1:]))
+        for row in report['endpoints'] + [report['overall']]:
+            self.stdout.write(
+                f"{row['mode']:<{width}}  " + '  '.join(f'{str(row[column]):>19}' for column in columns[1:])
+            )
+        if report['overall']['errors']:
+            self.stderr.write(f"{report['overall']['errors']} requests failed.")
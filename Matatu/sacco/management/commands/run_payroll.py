@@ -0,0 +1,37 @@
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sacco import payroll
+
+
+def parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f"Invalid date '{value}', expected YYYY-MM-DD.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Pay every driver and conductor for a pay period from their matatu's revenue, "
+        "by the rules in SACCO_PAYROLL_RULES. Re-running a paid period changes nothing."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('start', type=parse_date, help="First day of the pay period (YYYY-MM-DD).")
+        parser.add_argument('end', type=parse_date, help="Last day of the pay period (YYYY-MM-DD).")
+
+    def handle(self, *args, start, end, **options):
+        try:
+            run, created = payroll.run(start, end)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        totals = payroll.summary(run)
+        if not created:
+            self.stdout.write(f"Payroll for {start} to {end} was already run on {run.created_at:%Y-%m-%d %H:%M}.")
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['count']} payments totalling {totals['total'] or 0:.2f} for {start} to {end} "
+            f"(commission {totals[payroll.COMMISSION] or 0:.2f}, daily rate {totals[payroll.DAILY] or 0:.2f})."
+        ))
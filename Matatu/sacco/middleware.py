@@ -0,0 +1,60 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from rest_framework.permissions import SAFE_METHODS
+
+from sacco import routers
+
+PIN_COOKIE = 'sacco_primary'
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Decide per request whether reads may go to a read replica.
+
+    A view opts in by setting ``replica_reads = True`` on its class. Unsafe
+    requests, and any request from a client that wrote within the last
+    ``SACCO_REPLICA_PIN_SECONDS``, read from the primary. The pin is carried
+    in a short-lived cookie set on the response to every successful write;
+    a write that was refused changed nothing worth reading back.
+
+    The middleware runs natively under both WSGI and ASGI, so async views
+    are not pushed through a thread to get past it.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self.begin(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        state, token = self.begin(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            routers.end_request(token)
+        return self.pin(request, response)
+
+    def begin(self, request):
+        state, token = routers.begin_request()
+        state.pinned = request.method not in SAFE_METHODS or PIN_COOKIE in request.COOKIES
+        return state, token
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            response.set_cookie(PIN_COOKIE, '1', max_age=routers.pin_seconds(), httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, args, kwargs):
+        view = getattr(view_func, 'view_class', view_func)
+        routers.current_state().use_replica = getattr(view, 'replica_reads', False)
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sacco', '0003_alter_expense_options_alter_payment_options_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='expense',
+            options={'ordering': ['-date', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='payment',
+            options={'ordering': ['-date', '-id']},
+        ),
+        migrations.AlterModelOptions(
+            name='revenue',
+            options={'ordering': ['-date', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['-date', '-id'], name='expense_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['-date', '-id'], name='payment_date_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='revenue',
+            index=models.Index(fields=['-date', '-id'], name='revenue_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sacco', '0004_revenue_expense_payment_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='conductor',
+            name='licence_expiry_date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='driver',
+            name='licence_expiry_date',
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AlterField(
+            model_name='matatu',
+            name='licence_expiry_date',
+            field=models.DateField(db_index=True),
+        ),
+    ]
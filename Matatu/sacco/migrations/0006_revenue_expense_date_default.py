@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:52
+
+import sacco.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sacco', '0005_licence_expiry_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='expense',
+            name='date',
+            field=models.DateField(db_index=True, default=sacco.models.today),
+        ),
+        migrations.AlterField(
+            model_name='revenue',
+            name='date',
+            field=models.DateField(db_index=True, default=sacco.models.today),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:13
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sacco', '0008_sync_timestamps_and_tombstones'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedExpense',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('expense_type', models.CharField(max_length=50)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('description', models.TextField(blank=True)),
+                ('date', models.DateField()),
+                ('updated_at', models.DateTimeField()),
+                ('logged_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_expense_logs', to=settings.AUTH_USER_MODEL)),
+                ('matatu', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_expenses', to='sacco.matatu')),
+            ],
+            options={
+                'ordering': ['-date', '-id'],
+                'indexes': [models.Index(fields=['-date', '-id'], name='archived_expense_date_id_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedRevenue',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('amount_collected', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('date', models.DateField()),
+                ('updated_at', models.DateTimeField()),
+                ('logged_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_revenue_logs', to=settings.AUTH_USER_MODEL)),
+                ('matatu', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_revenues', to='sacco.matatu')),
+            ],
+            options={
+                'ordering': ['-date', '-id'],
+                'indexes': [models.Index(fields=['-date', '-id'], name='archived_revenue_date_id_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyMatatuSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('revenue_collected', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('expense_total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('expense_count', models.PositiveIntegerField(default=0)),
+                ('matatu', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_summaries', to='sacco.matatu')),
+            ],
+            options={
+                'ordering': ['-date'],
+                'indexes': [models.Index(fields=['date'], name='daily_summary_date_idx')],
+                'unique_together': {('matatu', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sacco', '0009_revenue_expense_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayrollRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField()),
+                ('period_end', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-period_end'],
+                'unique_together': {('period_start', 'period_end')},
+            },
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='payroll_run',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payments', to='sacco.payrollrun'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='payment',
+            unique_together={('payroll_run', 'receiver')},
+        ),
+    ]
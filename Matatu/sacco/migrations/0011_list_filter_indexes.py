@@ -0,0 +1,63 @@
+# Generated by Django 5.2.18 on 2026-10-17 13:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sacco', '0010_payroll_run'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedexpense',
+            name='matatu',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_expenses', to='sacco.matatu'),
+        ),
+        migrations.AlterField(
+            model_name='archivedrevenue',
+            name='matatu',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_revenues', to='sacco.matatu'),
+        ),
+        migrations.AlterField(
+            model_name='expense',
+            name='matatu',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='expenses', to='sacco.matatu'),
+        ),
+        migrations.AlterField(
+            model_name='payment',
+            name='receiver',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='payments_received', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='archivedexpense',
+            index=models.Index(fields=['matatu', '-date', '-id'], name='archived_expense_matatu_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedexpense',
+            index=models.Index(fields=['expense_type', '-date', '-id'], name='archived_expense_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedrevenue',
+            index=models.Index(fields=['matatu', '-date', '-id'], name='archived_revenue_matatu_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['matatu', '-date', '-id'], name='expense_matatu_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['expense_type', '-date', '-id'], name='expense_type_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['receiver', '-date', '-id'], name='payment_receiver_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='payment',
+            index=models.Index(fields=['payment_type', '-date', '-id'], name='payment_type_date_idx'),
+        ),
+    ]
@@ -0,0 +1,35 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sacco', '0011_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpenseCategory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('key', models.CharField(max_length=50, unique=True)),
+            ],
+            options={
+                'verbose_name_plural': 'expense categories',
+                'ordering': ['name'],
+            },
+        ),
+        # Nullable until 0013 has filled it in from expense_type.
+        migrations.AddField(
+            model_name='expense',
+            name='category',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='expenses', to='sacco.expensecategory'),
+        ),
+        migrations.AddField(
+            model_name='archivedexpense',
+            name='category',
+            field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_expenses', to='sacco.expensecategory'),
+        ),
+    ]
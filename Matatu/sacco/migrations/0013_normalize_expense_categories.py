@@ -0,0 +1,54 @@
+"""
+Fill in Expense.category and ArchivedExpense.category from the free-text
+expense_type. Spellings that differ only in case and spacing become one
+category, named after the most common spelling.
+"""
+from collections import Counter
+
+from django.db import migrations
+from django.db.models import Count
+
+
+def normalize(name):
+    # ExpenseCategory.normalize() as of this migration.
+    return ' '.join(name.split()).casefold()
+
+
+def forwards(apps, schema_editor):
+    ExpenseCategory = apps.get_model('sacco', 'ExpenseCategory')
+    models = [apps.get_model('sacco', 'Expense'), apps.get_model('sacco', 'ArchivedExpense')]
+
+    spellings = {}
+    for model in models:
+        for row in model.objects.order_by().values('expense_type').annotate(rows=Count('id')):
+            name = ' '.join(row['expense_type'].split())
+            spellings.setdefault(normalize(name), Counter())[name] += row['rows']
+
+    categories = {}
+    for key, names in spellings.items():
+        # Ties go to the alphabetically first spelling, so reruns agree.
+        name = min(names, key=lambda name: (-names[name], name))
+        categories[key], _ = ExpenseCategory.objects.get_or_create(key=key, defaults={'name': name})
+
+    # One UPDATE per distinct spelling, not per row.
+    for model in models:
+        for expense_type in model.objects.order_by().values_list('expense_type', flat=True).distinct():
+            model.objects.filter(expense_type=expense_type).update(category=categories[normalize(expense_type)])
+
+
+def backwards(apps, schema_editor):
+    ExpenseCategory = apps.get_model('sacco', 'ExpenseCategory')
+    for model in [apps.get_model('sacco', 'Expense'), apps.get_model('sacco', 'ArchivedExpense')]:
+        for category in ExpenseCategory.objects.all():
+            model.objects.filter(category=category).update(expense_type=category.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sacco', '0012_expense_category'),
+    ]
+
+    operations = [
+        migrations.RunPython(forwards, backwards),
+    ]
@@ -0,0 +1,46 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sacco', '0013_normalize_expense_categories'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='expense',
+            name='expense_type_date_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='archivedexpense',
+            name='archived_expense_type_idx',
+        ),
+        migrations.RemoveField(
+            model_name='expense',
+            name='expense_type',
+        ),
+        migrations.RemoveField(
+            model_name='archivedexpense',
+            name='expense_type',
+        ),
+        migrations.AlterField(
+            model_name='expense',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='expenses', to='sacco.expensecategory'),
+        ),
+        migrations.AlterField(
+            model_name='archivedexpense',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.PROTECT, related_name='archived_expenses', to='sacco.expensecategory'),
+        ),
+        migrations.AddIndex(
+            model_name='expense',
+            index=models.Index(fields=['category', '-date', '-id'], name='expense_category_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedexpense',
+            index=models.Index(fields=['category', '-date', '-id'], name='archived_expense_category_idx'),
+        ),
+    ]
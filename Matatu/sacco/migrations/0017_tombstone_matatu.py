@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sacco', '0016_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tombstone',
+            name='matatu_id',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 15:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sacco', '0017_tombstone_matatu'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='manager',
+            name='sacco_wide',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,7 +1,38 @@
-from django.db import models
+import datetime
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models, transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q
 from django.utils.timezone import now
 from django.contrib.auth.models import AbstractUser
 
+
+def today():
+    return now().date()
+
+
+class LicenceQuerySet(models.QuerySet):
+    """
+    SQL counterparts of ``is_licence_expired()`` for models with a
+    ``licence_expiry_date``, so expiry can be filtered and sorted in the database.
+    """
+    def with_licence_status(self):
+        return self.annotate(licence_expired=ExpressionWrapper(
+            Q(licence_expiry_date__lt=now().date()), output_field=BooleanField(),
+        ))
+
+    def licence_expired(self):
+        return self.filter(licence_expiry_date__lt=now().date())
+
+    def licence_expiring_within(self, days, include_expired=False):
+        today = now().date()
+        queryset = self.filter(licence_expiry_date__lte=today + datetime.timedelta(days=days))
+        if not include_expired:
+            queryset = queryset.filter(licence_expiry_date__gte=today)
+        return queryset
+
+
 # Custom User model for role-based authentication
 class User(AbstractUser):
     ROLE_CHOICES = [
@@ -11,6 +42,7 @@ class User(AbstractUser):
         ('conductor', 'Conductor'),
         ('owner', 'Matatu Owner'),
     ]
+    # Display label only; permissions resolve roles from group membership (see sacco.roles).
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
 
     groups = models.ManyToManyField(
@@ -30,6 +62,7 @@ class Route(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -51,8 +84,11 @@ class Matatu(models.Model):
     route = models.ForeignKey(Route, on_delete=models.SET_NULL, null=True, blank=True, related_name='matatus')
     capacity = models.PositiveIntegerField()
     owner = models.ForeignKey(MatatuOwner, on_delete=models.CASCADE, related_name='matatus')
-    licence_expiry_date = models.DateField()
+    licence_expiry_date = models.DateField(db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = LicenceQuerySet.as_manager()
 
     def is_licence_expired(self):
         return self.licence_expiry_date < now().date()
@@ -66,6 +102,8 @@ class Manager(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='manager_profile')
     phone_number = models.CharField(max_length=15)
     assigned_matatus = models.ManyToManyField(Matatu, related_name='managers')
+    # Sees every matatu rather than only the assigned ones (see sacco.fleets).
+    sacco_wide = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -77,8 +115,11 @@ class Driver(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='driver_profile')
     phone_number = models.CharField(max_length=15)
     assigned_matatu = models.OneToOneField(Matatu, on_delete=models.SET_NULL, null=True, blank=True, related_name='driver')
-    licence_expiry_date = models.DateField()
+    licence_expiry_date = models.DateField(db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = LicenceQuerySet.as_manager()
 
     def is_licence_expired(self):
         return self.licence_expiry_date < now().date()
@@ -92,8 +133,11 @@ class Conductor(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='conductor_profile')
     phone_number = models.CharField(max_length=15)
     assigned_driver = models.OneToOneField(Driver, on_delete=models.SET_NULL, null=True, blank=True, related_name='conductor')
-    licence_expiry_date = models.DateField()
+    licence_expiry_date = models.DateField(db_index=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    objects = LicenceQuerySet.as_manager()
 
     def is_licence_expired(self):
         return self.licence_expiry_date < now().date()
@@ -106,42 +150,129 @@ class Conductor(models.Model):
 class Revenue(models.Model):
     matatu = models.ForeignKey(Matatu, on_delete=models.CASCADE, related_name='revenues')
     amount_collected = models.DecimalField(max_digits=10, decimal_places=2)
-    date = models.DateField(auto_now_add=True, db_index=True)
+    date = models.DateField(default=today, db_index=True)
     logged_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='revenue_logs')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         unique_together = ('matatu', 'date')
-        ordering = ['-date']
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='revenue_date_id_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The save signals update the route rollups; keep them in this transaction.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.matatu.registration_number} - {self.amount_collected}"
 
 
+# Expense Category Model
+class ExpenseCategory(models.Model):
+    """
+    What an expense was for. ``key`` is the normalized name (see
+    ``normalize()``), so "Fuel", "fuel " and "FUEL" are one category.
+    """
+    name = models.CharField(max_length=50)
+    key = models.CharField(max_length=50, unique=True)
+
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'expense categories'
+
+    @staticmethod
+    def normalize(name):
+        return ' '.join(name.split()).casefold()
+
+    @classmethod
+    def resolve(cls, name):
+        """
+        Return the category for ``name``, creating it on first use.
+        """
+        category, _ = cls.objects.get_or_create(key=cls.normalize(name), defaults={'name': name})
+        return category
+
+    def clean(self):
+        key = self.normalize(self.name)
+        if ExpenseCategory.objects.filter(key=key).exclude(pk=self.pk).exists():
+            raise ValidationError({'name': "An expense category with this name already exists."})
+
+    def save(self, *args, **kwargs):
+        self.name = ' '.join(self.name.split())
+        self.key = self.normalize(self.name)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.name
+
+
 # Expense Model
 class Expense(models.Model):
-    matatu = models.ForeignKey(Matatu, on_delete=models.CASCADE, related_name='expenses')
-    expense_type = models.CharField(max_length=50)
+    # Indexed by expense_matatu_date_idx, which leads with it.
+    matatu = models.ForeignKey(Matatu, on_delete=models.CASCADE, related_name='expenses', db_index=False)
+    # Indexed by expense_category_date_idx, which leads with it.
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.PROTECT, related_name='expenses',
+                                 db_index=False)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     description = models.TextField(blank=True)
-    date = models.DateField(auto_now_add=True, db_index=True)
+    date = models.DateField(default=today, db_index=True)
     logged_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='expense_logs')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
-        ordering = ['-date']
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='expense_date_id_idx'),
+            # Filtered lists (see sacco.filters), in keyset order.
+            models.Index(fields=['matatu', '-date', '-id'], name='expense_matatu_date_idx'),
+            models.Index(fields=['category', '-date', '-id'], name='expense_category_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.matatu.registration_number} - {self.category}"
+
+
+# Payroll Run Model
+class PayrollRun(models.Model):
+    """
+    One payroll over one pay period (see ``sacco.payroll``). The Payment rows
+    it created point back to it; a period can only be paid once.
+    """
+    period_start = models.DateField()
+    period_end = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('period_start', 'period_end')
+        ordering = ['-period_end']
 
     def __str__(self):
-        return f"{self.matatu.registration_number} - {self.expense_type}"
+        return f"Payroll {self.period_start} to {self.period_end}"
 
 
 # Payment Model
 class Payment(models.Model):
-    receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name="payments_received")
+    # Indexed by payment_receiver_date_idx, which leads with it.
+    receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name="payments_received", db_index=False)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     payment_type = models.CharField(max_length=50)
     date = models.DateField()
+    payroll_run = models.ForeignKey(
+        PayrollRun, on_delete=models.CASCADE, null=True, blank=True, related_name='payments',
+    )
 
     class Meta:
-        ordering = ['-date']
+        unique_together = ('payroll_run', 'receiver')
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='payment_date_id_idx'),
+            # Filtered lists (see sacco.filters), in keyset order.
+            models.Index(fields=['receiver', '-date', '-id'], name='payment_receiver_date_idx'),
+            models.Index(fields=['payment_type', '-date', '-id'], name='payment_type_date_idx'),
+        ]
 
     def __str__(self):
         return f"Payment to {self.receiver.username} - {self.amount}"
@@ -174,3 +305,185 @@ class RouteRevenue(models.Model):
 
     def __str__(self):
         return f"{self.route.name} - {self.total_revenue}"
+
+
+# Table Version Model
+class TableVersion(models.Model):
+    """
+    A counter per table, bumped on every save or delete of its rows, that
+    lets slow-changing endpoints answer conditional GETs without querying
+    the table itself.
+    """
+    table = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=now)
+
+    def __str__(self):
+        return f"{self.table} v{self.version}"
+
+
+# Tombstone Model
+class Tombstone(models.Model):
+    """
+    Record of a deleted row, kept so delta-sync clients can drop it locally.
+    ``matatu_id`` is the matatu the row belonged to, so only clients scoped
+    to that matatu are told; it is null for rows every client syncs.
+    """
+    table = models.CharField(max_length=100)
+    object_id = models.BigIntegerField()
+    # Not a foreign key: the matatu may be the row that was deleted.
+    matatu_id = models.BigIntegerField(null=True, blank=True)
+    deleted_at = models.DateTimeField(default=now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['table', 'deleted_at'], name='tombstone_table_deleted_idx'),
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.table} #{self.object_id}"
+
+
+# Idempotency Key Model
+class IdempotencyKey(models.Model):
+    """
+    A client's ``Idempotency-Key`` and the response its first request got
+    (see ``sacco.idempotency``). ``status_code`` is null while that request
+    is still running.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_keys', db_index=False)
+    key = models.CharField(max_length=255)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(default=now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='idempotency_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id}: {self.key}"
+
+
+# Job Model
+class Job(models.Model):
+    """
+    A background task queued for the worker (see ``sacco.jobs``). ``run_at``
+    is when it may next be claimed; a failed attempt pushes it back.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    task = models.CharField(max_length=50)
+    params = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    run_at = models.DateTimeField(default=now)
+    worker = models.CharField(max_length=100, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    progress = models.PositiveSmallIntegerField(default=0)
+    progress_message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            # Serves the worker's claim: the oldest due job of a status.
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.task} #{self.pk} ({self.status})"
+
+
+# Archived Revenue Model
+class ArchivedRevenue(models.Model):
+    """
+    Revenue row moved out of the hot table by ``sacco.archive``. Keeps the
+    original primary key so links to the row stay valid.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    matatu = models.ForeignKey(Matatu, on_delete=models.CASCADE, related_name='archived_revenues', db_index=False)
+    amount_collected = models.DecimalField(max_digits=10, decimal_places=2)
+    date = models.DateField()
+    logged_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='archived_revenue_logs')
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='archived_revenue_date_id_idx'),
+            models.Index(fields=['matatu', '-date', '-id'], name='archived_revenue_matatu_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.matatu.registration_number} - {self.amount_collected} (archived)"
+
+
+# Archived Expense Model
+class ArchivedExpense(models.Model):
+    """
+    Expense row moved out of the hot table by ``sacco.archive``.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    matatu = models.ForeignKey(Matatu, on_delete=models.CASCADE, related_name='archived_expenses', db_index=False)
+    category = models.ForeignKey(ExpenseCategory, on_delete=models.PROTECT, related_name='archived_expenses',
+                                 db_index=False)
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    description = models.TextField(blank=True)
+    date = models.DateField()
+    logged_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='archived_expense_logs')
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-date', '-id']
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='archived_expense_date_id_idx'),
+            models.Index(fields=['matatu', '-date', '-id'], name='archived_expense_matatu_idx'),
+            models.Index(fields=['category', '-date', '-id'], name='archived_expense_category_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.matatu.registration_number} - {self.category} (archived)"
+
+
+# Daily Matatu Summary Model
+class DailyMatatuSummary(models.Model):
+    """
+    Revenue and expense totals for one matatu and one archived day, so
+    aggregate reports over archived history never touch the archive tables.
+    """
+    matatu = models.ForeignKey(Matatu, on_delete=models.CASCADE, related_name='daily_summaries')
+    date = models.DateField()
+    revenue_collected = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    expense_total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    expense_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('matatu', 'date')
+        ordering = ['-date']
+        indexes = [
+            models.Index(fields=['date'], name='daily_summary_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.matatu.registration_number} - {self.date}"
@@ -0,0 +1,150 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.db.models import Q
+from django.utils.encoding import force_str
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination, newest first.
+
+    The cursor holds the ordering values of the last row served, and the next
+    page is fetched with a ``WHERE (a, b) < (x, y)`` style filter instead of an
+    OFFSET, so every page costs the same index range scan however deep the
+    client pages. Every field in ``ordering`` must be descending and the last
+    one must be unique.
+    """
+    ordering = ('-id',)
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.close_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        return self.close_page([row async for row in self.page_queryset(queryset, request)])
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        Page over several querysets as if they were one, such as the hot and
+        archived rows of a table. Each is seeked to the cursor and cut at one
+        page, so the merged page costs one query per queryset.
+        """
+        rows = [row for queryset in querysets for row in self.page_queryset(queryset, request)]
+        return self.close_page(self.merge(rows))
+
+    async def apaginate_querysets(self, querysets, request, view=None):
+        rows = [row for queryset in querysets async for row in self.page_queryset(queryset, request)]
+        return self.close_page(self.merge(rows))
+
+    def merge(self, rows):
+        # Every ordering field is descending.
+        return sorted(rows, key=lambda row: self.row_position(row, self.fields), reverse=True)
+
+    def page_queryset(self, queryset, request):
+        """
+        Return the sliced queryset for the requested page, one row past its end.
+        """
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request, queryset.model, self.fields)
+        if position is not None:
+            queryset = queryset.filter(self.seek_filter(self.fields, position))
+        return queryset[:self.page_size + 1]
+
+    def close_page(self, rows):
+        self.has_next = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        self.next_position = self.row_position(rows[-1], self.fields) if self.has_next else None
+        return rows
+
+    @staticmethod
+    def row_position(row, fields):
+        # Rows are model instances, or dicts when a view pages a values() queryset.
+        if isinstance(row, dict):
+            return [row[field] for field in fields]
+        return [getattr(row, field) for field in fields]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    @staticmethod
+    def seek_filter(fields, position):
+        """
+        Build ``(f1 < v1) OR (f1 = v1 AND f2 < v2) OR ...`` for a descending key.
+        """
+        condition = Q()
+        for index, field in enumerate(fields):
+            equal = {name: value for name, value in zip(fields[:index], position[:index])}
+            condition |= Q(**equal, **{f'{field}__lt': position[index]})
+        return condition
+
+    def decode_cursor(self, request, model, fields):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if len(values) != len(fields):
+                raise ValueError
+            return [model._meta.get_field(field).to_python(value) for field, value in zip(fields, values)]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, position):
+        data = json.dumps([force_str(value) for value in position]).encode('utf-8')
+        encoded = base64.urlsafe_b64encode(data).decode('ascii')
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return self.encode_cursor(self.next_position)
+
+    def get_first_link(self):
+        return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('first', self.get_first_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class DateKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination over ``(date, id)`` for the Revenue, Expense and Payment
+    tables, backed by their composite ``(-date, -id)`` indexes.
+    """
+    ordering = ('-date', '-id')
@@ -0,0 +1,143 @@
+"""
+Batch payroll for drivers and conductors.
+
+``run(start, end)`` pays every Driver and Conductor for a pay period from
+the revenue of the matatu they are assigned to, by the rule for their role
+in ``SACCO_PAYROLL_RULES``:
+
+* ``commission`` pays ``rate`` percent of the matatu's revenue, and
+* ``daily`` pays ``rate`` shillings for every day the matatu logged revenue.
+
+A run reads three result sets whatever the crew size: revenue per matatu
+(including archived days, from their daily summaries), drivers and
+conductors. It writes its PayrollRun and every Payment with one
+``bulk_create``, all in a single transaction. A period can only be paid
+once: re-running it returns the existing run, and a period overlapping a
+paid one is refused.
+
+Crew are paid by their assignment at the time of the run.
+"""
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q, Sum
+
+from sacco import archive
+from sacco.models import Conductor, Driver, Payment, PayrollRun, Revenue
+
+COMMISSION = 'commission'
+DAILY = 'daily'
+PAYMENT_TYPES = {COMMISSION: 'Commission', DAILY: 'Daily Rate'}
+
+DEFAULT_RULES = {
+    'driver': {'basis': COMMISSION, 'rate': '12.5'},
+    'conductor': {'basis': DAILY, 'rate': '700.00'},
+}
+
+CENTS = Decimal('0.01')
+
+
+def rules():
+    """
+    Return ``{'driver': (basis, rate), 'conductor': (basis, rate)}``.
+    """
+    configured = getattr(settings, 'SACCO_PAYROLL_RULES', DEFAULT_RULES)
+    resolved = {}
+    for role in DEFAULT_RULES:
+        rule = configured.get(role, DEFAULT_RULES[role])
+        if rule['basis'] not in PAYMENT_TYPES:
+            raise ValueError(f"Unknown payroll basis '{rule['basis']}' for {role}s.")
+        resolved[role] = (rule['basis'], Decimal(str(rule['rate'])))
+    return resolved
+
+
+def matatu_revenue(start, end):
+    """
+    Return ``{matatu id: (revenue, days with revenue)}`` over ``[start, end]``.
+    """
+    totals = {
+        row['matatu_id']: (row['total'], row['days'])
+        for row in Revenue.objects.filter(date__range=(start, end)).order_by()
+        .values('matatu_id').annotate(total=Sum('amount_collected'), days=Count('date', distinct=True))
+    }
+    summaries = archive.summaries_for(start, end)
+    if summaries is not None:
+        for row in (
+            summaries.filter(revenue_collected__gt=0).order_by()
+            .values('matatu_id').annotate(total=Sum('revenue_collected'), days=Count('date'))
+        ):
+            total, days = totals.get(row['matatu_id'], (Decimal('0'), 0))
+            totals[row['matatu_id']] = (total + row['total'], days + row['days'])
+    return totals
+
+
+def crew():
+    """
+    Yield ``(user id, role, matatu id)`` for every assigned driver and conductor.
+    """
+    yield from (
+        (user_id, 'driver', matatu_id)
+        for user_id, matatu_id in Driver.objects.filter(assigned_matatu__isnull=False)
+        .values_list('user_id', 'assigned_matatu_id')
+    )
+    yield from (
+        (user_id, 'conductor', matatu_id)
+        for user_id, matatu_id in Conductor.objects.filter(assigned_driver__assigned_matatu__isnull=False)
+        .values_list('user_id', 'assigned_driver__assigned_matatu_id')
+    )
+
+
+def pay(basis, rate, revenue, days):
+    if basis == COMMISSION:
+        return (revenue * rate / 100).quantize(CENTS, rounding=ROUND_HALF_UP)
+    return (rate * days).quantize(CENTS)
+
+
+def run(start, end):
+    """
+    Pay every driver and conductor for ``[start, end]``.
+
+    Returns ``(payroll run, created)``; ``created`` is False when the period
+    had already been paid, in which case nothing is written.
+    """
+    if start > end:
+        raise ValueError("The pay period must not end before it starts.")
+    existing = PayrollRun.objects.filter(period_start=start, period_end=end).first()
+    if existing is not None:
+        return existing, False
+    overlapping = PayrollRun.objects.filter(period_start__lte=end, period_end__gte=start).first()
+    if overlapping is not None:
+        raise ValueError(f"The period overlaps the payroll already run for {overlapping.period_start} "
+                         f"to {overlapping.period_end}.")
+
+    role_rules = rules()
+    try:
+        with transaction.atomic():
+            payroll = PayrollRun.objects.create(period_start=start, period_end=end)
+            revenue = matatu_revenue(start, end)
+            payments = []
+            for user_id, role, matatu_id in crew():
+                if matatu_id not in revenue:
+                    continue
+                basis, rate = role_rules[role]
+                amount = pay(basis, rate, *revenue[matatu_id])
+                if amount > 0:
+                    payments.append(Payment(receiver_id=user_id, amount=amount, payment_type=PAYMENT_TYPES[basis],
+                                            date=end, payroll_run=payroll))
+            Payment.objects.bulk_create(payments)
+    except IntegrityError:
+        # Another run paid the same period first.
+        return PayrollRun.objects.get(period_start=start, period_end=end), False
+    return payroll, True
+
+
+def summary(payroll):
+    """
+    Return the number of payments, their total and the total per payment type.
+    """
+    return payroll.payments.aggregate(
+        count=Count('id'),
+        total=Sum('amount'),
+        **{basis: Sum('amount', filter=Q(payment_type=label)) for basis, label in PAYMENT_TYPES.items()},
+    )
@@ -1,12 +1,22 @@
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
+from sacco.roles import (
+    CONDUCTOR,
+    DRIVER,
+    MANAGER,
+    OWNER,
+    REVENUE_COLLECTOR,
+    ROUTE_MANAGER,
+    has_role,
+)
+
 
 class IsManager(BasePermission):
     """
     Custom permission to allow only managers.
     """
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Manager').exists()
+        return has_role(request.user, MANAGER)
 
 
 class IsAdmin(BasePermission):
@@ -22,7 +32,7 @@ class IsDriver(BasePermission):
     Custom permission to allow only drivers.
     """
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Driver').exists()
+        return has_role(request.user, DRIVER)
 
 
 class IsConductor(BasePermission):
@@ -30,7 +40,7 @@ class IsConductor(BasePermission):
     Custom permission to allow only conductors.
     """
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Conductor').exists()
+        return has_role(request.user, CONDUCTOR)
 
 
 class IsDriverOrConductor(BasePermission):
@@ -38,7 +48,7 @@ class IsDriverOrConductor(BasePermission):
     Custom permission to allow only drivers or conductors.
     """
     def has_permission(self, request, view):
-        return request.user.groups.filter(name__in=['Driver', 'Conductor']).exists()
+        return has_role(request.user, DRIVER, CONDUCTOR)
 
 
 class IsRevenueCollector(BasePermission):
@@ -46,7 +56,7 @@ class IsRevenueCollector(BasePermission):
     Custom permission to allow only revenue collectors.
     """
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Revenue Collector').exists()
+        return has_role(request.user, REVENUE_COLLECTOR)
 
 
 class IsRouteManager(BasePermission):
@@ -54,7 +64,15 @@ class IsRouteManager(BasePermission):
     Custom permission to allow only route managers.
     """
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='Route Manager').exists()
+        return has_role(request.user, ROUTE_MANAGER)
+
+
+class IsMatatuOwner(BasePermission):
+    """
+    Custom permission to allow only matatu owners.
+    """
+    def has_permission(self, request, view):
+        return has_role(request.user, OWNER)
 
 
 class IsAuthenticatedAndReadOnly(BasePermission):
@@ -82,7 +100,7 @@ class IsManagerOrReadOnly(BasePermission):
     def has_permission(self, request, view):
         if request.method in SAFE_METHODS:
             return True
-        return request.user.groups.filter(name='Manager').exists()
+        return has_role(request.user, MANAGER)
 
 
 class IsAdminOrManager(BasePermission):
@@ -92,7 +110,7 @@ class IsAdminOrManager(BasePermission):
     def has_permission(self, request, view):
         return (
             request.user.is_superuser or 
-            request.user.groups.filter(name='Manager').exists()
+            has_role(request.user, MANAGER)
         )
 
 
@@ -101,7 +119,7 @@ class IsDriverConductorOrRevenueCollector(BasePermission):
     Custom permission to allow drivers, conductors, or revenue collectors.
     """
     def has_permission(self, request, view):
-        return request.user.groups.filter(name__in=['Driver', 'Conductor', 'Revenue Collector']).exists()
+        return has_role(request.user, DRIVER, CONDUCTOR, REVENUE_COLLECTOR)
 
 
 class IsAuthorizedUserForExpenses(BasePermission):
@@ -109,7 +127,7 @@ class IsAuthorizedUserForExpenses(BasePermission):
     Custom permission to allow managers or revenue collectors to handle expenses.
     """
     def has_permission(self, request, view):
-        return request.user.groups.filter(name__in=['Manager', 'Revenue Collector']).exists()
+        return has_role(request.user, MANAGER, REVENUE_COLLECTOR)
 
 
 class IsManagerOrRouteManager(BasePermission):
@@ -117,4 +135,4 @@ class IsManagerOrRouteManager(BasePermission):
     Custom permission to allow only managers or route managers.
     """
     def has_permission(self, request, view):
-        return request.user.groups.filter(name__in=['Manager', 'Route Manager']).exists()
+        return has_role(request.user, MANAGER, ROUTE_MANAGER)
@@ -0,0 +1,63 @@
+"""
+Response cache for the read-heavy sacco views.
+
+Views that mix in ``CachedResponseMixin`` store the data of their successful
+GET responses in the ``SACCO_RESPONSE_CACHE_ALIAS`` cache. A key is built
+from:
+
+* the version of every table in the view's ``cache_models``
+  (``sacco.versions``),
+* the requesting user's roles and superuser flag, so users who are allowed
+  to see different things never share an entry,
+* the view's scope (for example the owner a report is restricted to), and
+* the full request path including the query string.
+
+The save and delete receivers in ``sacco.signals`` bump a table's version
+with the write or once it has committed, which retires every entry built
+from that table and nothing else. The versions are rows of the TableVersion
+table, so a hit costs one query on it, and an invalidation is seen by every
+process as soon as it commits, whichever cache backend holds the entries.
+
+A response built from replica reads may lag the primary, so it is kept for
+no longer than ``SACCO_REPLICA_PIN_SECONDS``, the bound on replication lag
+that replica routing already relies on.
+
+The local-memory backend is per process, so each worker fills its own
+copy; the file backend (``sacco.cache_backends.LRUFileBasedCache``) lets
+several workers share one.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from sacco import routers, versions
+from sacco.roles import get_user_roles
+
+
+def response_cache():
+    return caches[getattr(settings, 'SACCO_RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def timeout():
+    timeout = getattr(settings, 'SACCO_RESPONSE_CACHE_TIMEOUT', 300)
+    if routers.read_replica():
+        return min(timeout, routers.pin_seconds())
+    return timeout
+
+
+def invalidate(*models):
+    """
+    Retire every cached response built from any of ``models``. Call it in
+    the write's transaction or once it has committed.
+    """
+    versions.bump(*models)
+
+
+def cache_key(request, models, scope=''):
+    user = request.user
+    roles = ','.join(sorted(get_user_roles(user)))
+    audience = f"{'superuser' if user.is_superuser else 'user'}:{roles}:{scope}"
+    params = repr((versions.current(*models), audience, request.get_full_path()))
+    digest = hashlib.md5(params.encode('utf-8')).hexdigest()
+    return f'sacco:responses:{digest}'
@@ -0,0 +1,103 @@
+"""
+Role resolution for the sacco permission classes.
+
+Group membership is the single source of truth for authorization: a user can
+hold several roles at once (e.g. Manager and Route Manager), which the single
+``User.role`` column cannot express. ``User.role`` is kept as a display label.
+
+A user's role set is loaded with one query and memoised on the user instance
+for the rest of the request. Between requests it is kept only in the cache
+named by ``SACCO_AUTH_CACHE_ALIAS``, which must be shared by every process
+serving the site: a per-process cache would let a revoked role keep working
+in the processes that did not handle the change. The receivers in
+``sacco.signals`` clear the cached set whenever a user's groups, a group, or
+the user row itself changes.
+"""
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.db import transaction
+
+MANAGER = 'Manager'
+DRIVER = 'Driver'
+CONDUCTOR = 'Conductor'
+REVENUE_COLLECTOR = 'Revenue Collector'
+ROUTE_MANAGER = 'Route Manager'
+OWNER = 'Matatu Owner'
+
+ROLE_CACHE_TIMEOUT = 60 * 15
+
+_NO_CACHE = DummyCache('', {})
+
+
+def auth_cache():
+    """
+    Return the cache that keeps role sets and fleets between requests; with
+    no SACCO_AUTH_CACHE_ALIAS, one that keeps nothing.
+    """
+    alias = getattr(settings, 'SACCO_AUTH_CACHE_ALIAS', None)
+    return caches[alias] if alias else _NO_CACHE
+
+
+def role_cache_key(user_id):
+    return f'sacco:roles:{user_id}'
+
+
+def get_user_roles(user):
+    """
+    Return the frozenset of group names the user belongs to.
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, '_sacco_role_cache', None)
+    if roles is None:
+        cache, key = auth_cache(), role_cache_key(user.pk)
+        roles = cache.get(key)
+        if roles is None:
+            roles = frozenset(user.groups.values_list('name', flat=True))
+            cache.set(key, roles, ROLE_CACHE_TIMEOUT)
+        user._sacco_role_cache = roles
+    return roles
+
+
+async def aget_user_roles(user):
+    """
+    Async counterpart of ``get_user_roles()`` for async views.
+    """
+    if user is None or not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, '_sacco_role_cache', None)
+    if roles is None:
+        cache, key = auth_cache(), role_cache_key(user.pk)
+        roles = await cache.aget(key)
+        if roles is None:
+            roles = frozenset([name async for name in user.groups.values_list('name', flat=True)])
+            await cache.aset(key, roles, ROLE_CACHE_TIMEOUT)
+        user._sacco_role_cache = roles
+    return roles
+
+
+def has_role(user, *roles):
+    """
+    Return True if the user holds at least one of the given roles.
+    """
+    return not get_user_roles(user).isdisjoint(roles)
+
+
+async def ahas_role(user, *roles):
+    return not (await aget_user_roles(user)).isdisjoint(roles)
+
+
+def invalidate_user_roles(*user_ids):
+    """
+    Drop the cached role sets of the given users.
+    """
+    cache, keys = auth_cache(), [role_cache_key(user_id) for user_id in user_ids]
+    cache.delete_many(keys)
+    # A request that read the groups before the change committed may have
+    # cached them again in the meantime.
+    transaction.on_commit(partial(cache.delete_many, keys))
@@ -0,0 +1,288 @@
+"""
+Incremental maintenance of the RouteRevenue and MatatuRouteRevenue rollups.
+
+Every Revenue write is folded into the rollups with atomic ``F()`` increments
+in the same transaction as the write itself (see the Revenue receivers in
+``sacco.signals``). ``rebuild()`` and ``verify()`` back the
+``rebuild_route_revenue`` management command; they read the days moved out
+by ``sacco.archive`` from DailyMatatuSummary, so archiving never changes what
+the rollups should hold. Both work through the range ``CHUNK_DAYS`` days at a
+time, so memory stays flat however much history there is.
+"""
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+from functools import partial
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Min, Sum
+
+from sacco import response_cache
+from sacco.models import DailyMatatuSummary, MatatuRouteRevenue, Revenue, RouteRevenue
+
+CHUNK_DAYS = 31
+
+
+def _increment(model, amount, amount_field, **key):
+    updated = model.objects.filter(**key).update(**{amount_field: F(amount_field) + amount})
+    if updated or amount < 0:
+        # Never create a row for a negative delta: the contribution being
+        # removed was never rolled up, or its parent is being cascaded away.
+        return
+    try:
+        with transaction.atomic():
+            model.objects.create(**key, **{amount_field: amount})
+    except IntegrityError:
+        # A concurrent writer created the row first.
+        model.objects.filter(**key).update(**{amount_field: F(amount_field) + amount})
+
+
+def apply_revenue_delta(matatu_id, route_id, date, amount):
+    """
+    Add ``amount`` (which may be negative) to both rollups.
+    """
+    if route_id is None or not amount:
+        return
+    with transaction.atomic():
+        _increment(MatatuRouteRevenue, amount, 'revenue_collected',
+                   matatu_id=matatu_id, route_id=route_id, date=date)
+        _increment(RouteRevenue, amount, 'total_revenue', route_id=route_id, date=date)
+
+
+def apply_revenue_deltas(deltas):
+    """
+    Apply many rollup deltas at once, for writes that bypass the save signals.
+
+    ``deltas`` maps ``(matatu_id, route_id, date)`` to an amount. Matatu rollups
+    are written with one upsert; route totals with one increment per route/day.
+    """
+    deltas = {key: amount for key, amount in deltas.items() if key[1] is not None and amount}
+    if not deltas:
+        return
+
+    with transaction.atomic():
+        existing = {
+            (matatu_id, route_id, date): amount
+            for matatu_id, route_id, date, amount in MatatuRouteRevenue.objects.select_for_update()
+            .filter(matatu_id__in={key[0] for key in deltas}, date__in={key[2] for key in deltas})
+            .values_list('matatu_id', 'route_id', 'date', 'revenue_collected')
+        }
+        MatatuRouteRevenue.objects.bulk_create(
+            [
+                MatatuRouteRevenue(matatu_id=matatu_id, route_id=route_id, date=date,
+                                   revenue_collected=existing.get((matatu_id, route_id, date), 0) + amount)
+                for (matatu_id, route_id, date), amount in deltas.items()
+                # Same rule as _increment: negative deltas only adjust existing rows.
+                if amount > 0 or (matatu_id, route_id, date) in existing
+            ],
+            update_conflicts=True,
+            unique_fields=['matatu', 'route', 'date'],
+            update_fields=['revenue_collected'],
+        )
+
+        route_deltas = defaultdict(int)
+        for (matatu_id, route_id, date), amount in deltas.items():
+            route_deltas[(route_id, date)] += amount
+        for (route_id, date), amount in route_deltas.items():
+            if amount:
+                _increment(RouteRevenue, amount, 'total_revenue', route_id=route_id, date=date)
+
+
+def remove_matatu(matatu_id):
+    """
+    Take a matatu that is about to be deleted out of the rollups.
+
+    Its MatatuRouteRevenue rows go with it by cascade, hot and archived days
+    alike, and the cascade may delete them before its Revenue rows, leaving
+    those rows' receivers nothing to subtract. So each row's amount is taken
+    off its route's total here, and the rows are deleted so the Revenue
+    receivers that run later find nothing left to subtract twice.
+    """
+    with transaction.atomic():
+        rows = MatatuRouteRevenue.objects.select_for_update().filter(matatu_id=matatu_id)
+        for route_id, date, amount in rows.values_list('route_id', 'date', 'revenue_collected'):
+            if amount:
+                _increment(RouteRevenue, -amount, 'total_revenue', route_id=route_id, date=date)
+        if rows.delete()[0]:
+            transaction.on_commit(partial(response_cache.invalidate, RouteRevenue))
+
+
+def rolled_up_route(matatu_id, date):
+    """
+    Return the route a matatu's revenue for ``date`` was rolled up under.
+
+    A matatu has at most one Revenue per day, so the MatatuRouteRevenue row for
+    ``(matatu, date)`` records the route its contribution went to, even if the
+    matatu has been moved to another route since.
+    """
+    return (
+        MatatuRouteRevenue.objects
+        .filter(matatu_id=matatu_id, date=date)
+        .values_list('route_id', flat=True)
+        .first()
+    )
+
+
+def _date_range(queryset, start, end, field='date'):
+    if start is not None:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end is not None:
+        queryset = queryset.filter(**{f'{field}__lte': end})
+    return queryset
+
+
+def _revenue_totals(start, end):
+    """
+    Return ``{(matatu_id, route_id, date): total}`` over the hot Revenue rows
+    and the daily summaries of archived days.
+
+    Like the write path (see ``rolled_up_route()``), a day already rolled up
+    stays under the route it was rolled up under, so a matatu moved to
+    another route keeps its history on the old one. Other days go to the
+    matatu's current route (None for a matatu without one).
+    """
+    rolled_up = {
+        (matatu_id, date): route_id
+        for matatu_id, date, route_id in _date_range(MatatuRouteRevenue.objects.all(), start, end)
+        .order_by().values_list('matatu_id', 'date', 'route_id')
+    }
+    totals = defaultdict(Decimal)
+    sources = (
+        (Revenue.objects.all(), 'amount_collected'),
+        (DailyMatatuSummary.objects.exclude(revenue_collected=0), 'revenue_collected'),
+    )
+    for queryset, field in sources:
+        rows = _date_range(queryset, start, end).order_by().values('matatu_id', 'matatu__route_id', 'date')
+        for row in rows.annotate(total=Sum(field)):
+            # A row that arrived late for an archived day is still in Revenue.
+            matatu_id, date = row['matatu_id'], row['date']
+            route_id = rolled_up.get((matatu_id, date), row['matatu__route_id'])
+            totals[(matatu_id, route_id, date)] += row['total']
+    return totals
+
+
+def _chunks(start, end):
+    """
+    Split ``start``..``end`` into consecutive ranges of at most CHUNK_DAYS
+    days. An open end is taken from the oldest or newest revenue or rollup.
+    """
+    if start is None or end is None:
+        bounds = [
+            _date_range(model.objects.all(), start, end).aggregate(first=Min('date'), last=Max('date'))
+            for model in (Revenue, DailyMatatuSummary, MatatuRouteRevenue, RouteRevenue)
+        ]
+        firsts = [bound['first'] for bound in bounds if bound['first'] is not None]
+        if not firsts:
+            return []
+        start = start or min(firsts)
+        end = end or max(bound['last'] for bound in bounds if bound['last'] is not None)
+
+    chunks = []
+    while start <= end:
+        chunk_end = min(start + datetime.timedelta(days=CHUNK_DAYS - 1), end)
+        chunks.append((start, chunk_end))
+        start = chunk_end + datetime.timedelta(days=1)
+    return chunks
+
+
+def rebuild(start=None, end=None, progress=None):
+    """
+    Recompute both rollups for the date range from Revenue and the archived
+    daily summaries.
+
+    Revenue is attributed to the route it was rolled up under, or for days
+    not rolled up yet to each matatu's current route. Each chunk of the
+    range is rebuilt in its own transaction; ``progress``, if given, is
+    called with the number of chunks done and the total after each one.
+    Returns the number of (MatatuRouteRevenue, RouteRevenue) rows written.
+    """
+    chunks = _chunks(start, end)
+    matatu_rows = route_rows = 0
+    for done, (chunk_start, chunk_end) in enumerate(chunks, 1):
+        matatus, routes = _rebuild_chunk(chunk_start, chunk_end)
+        matatu_rows += matatus
+        route_rows += routes
+        if progress is not None:
+            progress(done, len(chunks))
+    return matatu_rows, route_rows
+
+
+def _rebuild_chunk(start, end):
+    with transaction.atomic():
+        totals = _revenue_totals(start, end)
+        _date_range(MatatuRouteRevenue.objects.all(), start, end).delete()
+        _date_range(RouteRevenue.objects.all(), start, end).delete()
+
+        route_totals = defaultdict(Decimal)
+        for (matatu_id, route_id, date), total in totals.items():
+            if route_id is not None:
+                route_totals[(route_id, date)] += total
+        matatu_rows = MatatuRouteRevenue.objects.bulk_create(
+            MatatuRouteRevenue(matatu_id=matatu_id, route_id=route_id, date=date, revenue_collected=total)
+            for (matatu_id, route_id, date), total in totals.items()
+            if route_id is not None
+        )
+        route_rows = RouteRevenue.objects.bulk_create(
+            RouteRevenue(route_id=route_id, date=date, total_revenue=total)
+            for (route_id, date), total in route_totals.items()
+        )
+        transaction.on_commit(partial(response_cache.invalidate, RouteRevenue))
+    return len(matatu_rows), len(route_rows)
+
+
+def verify(start=None, end=None, progress=None):
+    """
+    Check the rollups against Revenue and the archived daily summaries.
+
+    Returns a list of human-readable mismatch descriptions, empty when the
+    rollups agree with the revenue and with each other. ``progress`` is
+    called as for ``rebuild()``.
+    """
+    chunks = _chunks(start, end)
+    mismatches = []
+    for done, (chunk_start, chunk_end) in enumerate(chunks, 1):
+        mismatches += _verify_chunk(chunk_start, chunk_end)
+        if progress is not None:
+            progress(done, len(chunks))
+    return mismatches
+
+
+def _verify_chunk(start, end):
+    mismatches = []
+
+    revenue, route_revenue = {}, defaultdict(Decimal)
+    for (matatu_id, route_id, date), total in _revenue_totals(start, end).items():
+        # Revenue of a matatu without a route is never rolled up.
+        if route_id is not None:
+            revenue[(matatu_id, route_id, date)] = total
+            route_revenue[(route_id, date)] += total
+    matatu_rollup = {
+        (matatu_id, route_id, date): total
+        for matatu_id, route_id, date, total in _date_range(MatatuRouteRevenue.objects.all(), start, end)
+        .values_list('matatu_id', 'route_id', 'date', 'revenue_collected')
+    }
+    for key in sorted(set(revenue) | set(matatu_rollup)):
+        expected, actual = revenue.get(key, 0), matatu_rollup.get(key, 0)
+        if expected != actual:
+            mismatches.append(f'matatu {key[0]} on route {key[1]} on {key[2]}: revenue {expected}, rollup {actual}')
+
+    route_from_matatus = {
+        (row['route_id'], row['date']): row['total']
+        for row in _date_range(MatatuRouteRevenue.objects.all(), start, end).order_by()
+                   .values('route_id', 'date').annotate(total=Sum('revenue_collected'))
+    }
+    route_rollup = {
+        (row['route_id'], row['date']): row['total_revenue']
+        for row in _date_range(RouteRevenue.objects.all(), start, end)
+                   .values('route_id', 'date', 'total_revenue')
+    }
+    for key in sorted(set(route_revenue) | set(route_from_matatus) | set(route_rollup)):
+        actual = route_rollup.get(key, 0)
+        if route_revenue.get(key, 0) != actual:
+            mismatches.append(f'route {key[0]} on {key[1]}: revenue {route_revenue.get(key, 0)}, route rollup {actual}')
+        if route_from_matatus.get(key, 0) != actual:
+            mismatches.append(
+                f'route {key[0]} on {key[1]}: matatu rollups {route_from_matatus.get(key, 0)}, route rollup {actual}'
+            )
+
+    return mismatches
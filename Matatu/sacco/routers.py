@@ -0,0 +1,99 @@
+"""
+Primary / replica database routing.
+
+Writes always go to the primary (``default``). Reads go to one of the
+``SACCO_READ_REPLICAS`` aliases only while a request is being served by a
+view that opted in with ``replica_reads = True`` and only for safe methods;
+everything else, including management commands and signal handlers, reads
+from the primary. Sessions, users, groups and permissions are always read
+from the primary too: who a request is and what it may do is never decided
+from a lagging copy.
+
+A request is pinned to the primary as soon as it writes, and
+``ReplicaRoutingMiddleware`` keeps a client pinned for
+``SACCO_REPLICA_PIN_SECONDS`` after any successful write request, so clients
+read their own writes even while the replicas lag behind.
+"""
+import random
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PRIMARY_ONLY_APPS = {'auth', 'contenttypes', 'sessions'}
+
+
+class RoutingState:
+    def __init__(self):
+        self.use_replica = False
+        self.pinned = False
+        self.read_replica = False
+
+
+_state = ContextVar('sacco_routing_state', default=None)
+
+
+def replica_aliases():
+    return getattr(settings, 'SACCO_READ_REPLICAS', [])
+
+
+def pin_seconds():
+    return getattr(settings, 'SACCO_REPLICA_PIN_SECONDS', 10)
+
+
+def begin_request():
+    """
+    Start routing state for a request. Returns the state and a reset token.
+    """
+    state = RoutingState()
+    return state, _state.set(state)
+
+
+def end_request(token):
+    _state.reset(token)
+
+
+def current_state():
+    return _state.get()
+
+
+def read_replica():
+    """
+    Return whether the current request has read from a replica.
+    """
+    state = _state.get()
+    return state is not None and state.read_replica
+
+
+def primary_only(model):
+    opts = model._meta
+    owner = opts.auto_created._meta if opts.auto_created else opts
+    return opts.app_label in PRIMARY_ONLY_APPS or owner.label == settings.AUTH_USER_MODEL
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        replicas = replica_aliases()
+        if (
+            state is None or not state.use_replica or state.pinned or not replicas
+            or primary_only(model)
+            # Reads inside a transaction must see its own uncommitted writes.
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        state.read_replica = True
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold copies of the primary, so every alias has the same rows.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return True
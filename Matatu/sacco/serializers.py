@@ -10,7 +10,10 @@ from .models import (Matatu,
                      Manager, 
                      RouteRevenue, 
                      MatatuRouteRevenue,
-                     Expense)
+                     Expense,
+                     ExpenseCategory,
+                     Job,
+                     User)
 
 class MatatuSerializer(serializers.ModelSerializer):
     
@@ -35,22 +38,9 @@ class MatatuSerializer(serializers.ModelSerializer):
 
 class RouteSerializer(serializers.ModelSerializer):
 
-    def validate_route_number(self, value):
-        """Ensure the route number is unique."""
-        if Route.objects.filter(route_number=value).exists():
-            raise serializers.ValidationError("This route number already exists.")
-        return value
-
-    def validate(self, data):
-        """Ensure start and end locations are not the same."""
-        if data['start_location'] == data['end_location']:
-            raise serializers.ValidationError("Start and end locations cannot be the same.")
-        return data
-
     class Meta:
         model = Route
-        fields = ['id', 'route_number', 'start_location', 'end_location', 'distance_km']
-
+        fields = ['id', 'name', 'description', 'created_at']
 
 
 
@@ -61,16 +51,10 @@ class DriverSerializer(serializers.ModelSerializer):
         if value <= now().date():
             raise serializers.ValidationError("Driver's license must not be expired.")
         return value
-    
-    def validate(self, data):
-        """Ensure driver is assigned to a valid matatu."""
-        if data.get('assigned_matatu') and not data['assigned_matatu'].is_active:
-            raise serializers.ValidationError("Assigned matatu is not active.")
-        return data
 
     class Meta:
         model = Driver
-        fields = ['id', 'name', 'licence_number', 'licence_expiry_date', 'assigned_matatu']
+        fields = ['id', 'user', 'phone_number', 'licence_expiry_date', 'assigned_matatu']
         
 class RevenueSerializer(serializers.ModelSerializer):
 
@@ -80,38 +64,131 @@ class RevenueSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Amount collected must be greater than 0.")
         return value
 
-    def validate_amount(self, value):
-        """Ensure the amount is positive."""
+    class Meta:
+        model = Revenue
+        fields = ['id', 'matatu', 'amount_collected', 'date', 'logged_by']
+        read_only_fields = ['date']
+        
+
+class RevenueRecordSerializer(serializers.Serializer):
+    """
+    One record of a bulk revenue submission. Matatus are resolved in bulk by
+    the caller, so only the primary key is validated here.
+    """
+    matatu = serializers.IntegerField(min_value=1)
+    amount_collected = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+    def validate_amount_collected(self, value):
+        """Ensure the amount collected is greater than zero."""
         if value <= 0:
-            raise serializers.ValidationError("Amount must be greater than zero.")
+            raise serializers.ValidationError("Amount collected must be greater than 0.")
         return value
 
+
+class RevenueBulkSerializer(serializers.Serializer):
+    records = serializers.ListField(child=serializers.DictField(), allow_empty=False)
+    policy = serializers.ChoiceField(choices=['replace', 'accumulate'], required=False)
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    start = serializers.DateField()
+    end = serializers.DateField()
+    file_format = serializers.ChoiceField(choices=['csv', 'ndjson'], default='csv')
+
     def validate(self, data):
-        """Ensure the matatu and route are valid and active."""
-        matatu = data.get('matatu')
-        route = data.get('route')
-        if matatu and not matatu.is_active:
-            raise serializers.ValidationError("The matatu is not active.")
-        if route and not route.is_active:
-            raise serializers.ValidationError("The route is not active.")
+        """Ensure the date range is not reversed."""
+        if data['start'] > data['end']:
+            raise serializers.ValidationError("Start date must not be after end date.")
         return data
 
-    class Meta:
-        model = MatatuRouteRevenue
-        fields = ['id', 'matatu', 'route', 'amount', 'date']
-    
+
+class ProfitAndLossQuerySerializer(serializers.Serializer):
+    period = serializers.ChoiceField(choices=['day', 'week', 'month'], default='month')
+    start = serializers.DateField()
+    end = serializers.DateField()
+    owner = serializers.IntegerField(required=False)
+    route = serializers.IntegerField(required=False)
+    manager = serializers.IntegerField(required=False)
+
     def validate(self, data):
-        """Ensure the matatu is valid and active."""
-        matatu = data.get('matatu')
-        if matatu and not matatu.is_active:
-            raise serializers.ValidationError("The matatu is not active.")
+        """Ensure the date range is not reversed."""
+        if data['start'] > data['end']:
+            raise serializers.ValidationError("Start date must not be after end date.")
         return data
 
+
+class ListFilterSerializer(serializers.Serializer):
+    matatu = serializers.IntegerField(min_value=1, required=False)
+    route = serializers.IntegerField(min_value=1, required=False)
+    owner = serializers.IntegerField(min_value=1, required=False)
+    receiver = serializers.IntegerField(min_value=1, required=False)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    category = serializers.IntegerField(min_value=1, required=False)
+    payment_type = serializers.CharField(max_length=50, required=False)
+    task = serializers.CharField(max_length=50, required=False)
+    status = serializers.ChoiceField(choices=Job.STATUS_CHOICES, required=False)
+
+    def validate(self, data):
+        """Ensure the date range is not reversed."""
+        if 'start' in data and 'end' in data and data['start'] > data['end']:
+            raise serializers.ValidationError("Start date must not be after end date.")
+        return data
+
+
+class ExpenseBreakdownQuerySerializer(serializers.Serializer):
+    by = serializers.ChoiceField(choices=['matatu', 'owner', 'route'], default='matatu')
+    start = serializers.DateField()
+    end = serializers.DateField()
+    matatu = serializers.IntegerField(required=False)
+    owner = serializers.IntegerField(required=False)
+    route = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        """Ensure the date range is not reversed."""
+        if data['start'] > data['end']:
+            raise serializers.ValidationError("Start date must not be after end date.")
+        return data
+
+
+class LicenceExpiryQuerySerializer(serializers.Serializer):
+    days = serializers.IntegerField(min_value=0, max_value=3650, default=30)
+    include_expired = serializers.BooleanField(default=False)
+
+
+class RollupJobSerializer(serializers.Serializer):
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, data):
+        """Ensure the date range is not reversed."""
+        if 'start' in data and 'end' in data and data['start'] > data['end']:
+            raise serializers.ValidationError("Start date must not be after end date.")
+        return data
+
+
+class StatementJobSerializer(serializers.Serializer):
+    month = serializers.DateField(input_formats=['%Y-%m'])
+    force = serializers.BooleanField(default=False)
+
+
+class ExportJobSerializer(ExportQuerySerializer):
+    resource = serializers.ChoiceField(choices=['revenues', 'expenses', 'payments'])
+
+
+class JobSerializer(serializers.ModelSerializer):
     class Meta:
-        model = Revenue
-        fields = ['id', 'matatu', 'amount_collected', 'date', 'logged_by']
-        
-        
+        model = Job
+        fields = [
+            'id', 'task', 'params', 'status', 'attempts', 'max_attempts', 'run_at', 'progress',
+            'progress_message', 'result', 'error', 'created_by', 'created_at', 'finished_at',
+        ]
+        read_only_fields = [
+            'status', 'attempts', 'max_attempts', 'run_at', 'progress', 'progress_message', 'result', 'error',
+            'created_by', 'created_at', 'finished_at',
+        ]
+
+
 class RouteRevenueSerializer(serializers.ModelSerializer):
 
     def validate_amount(self, value):
@@ -129,7 +206,7 @@ class RouteRevenueSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = RouteRevenue
-        fields = ['id', 'route', 'amount', 'date']
+        fields = ['id', 'route', 'total_revenue', 'date']
 
 
 class MatatuRouteRevenueSerializer(serializers.ModelSerializer):
@@ -177,41 +254,76 @@ class ConductorSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Phone number must be numeric and either 10 or 12 digits long.")
         return value
 
-    def validate(self, data):
-        """Ensure the assigned matatu is active."""
-        matatu = data.get('assigned_matatu')
-        if matatu and not matatu.is_active:
-            raise serializers.ValidationError("Assigned matatu is not active.")
-        return data
-
     class Meta:
         model = Conductor
-        fields = ['id', 'name', 'phone_number', 'assigned_matatu']
+        fields = ['id', 'user', 'phone_number', 'assigned_driver', 'licence_expiry_date']
         
         
+class ManagerUserSerializer(serializers.ModelSerializer):
+    """
+    The public part of a manager's user account; never the password hash,
+    flags or permissions.
+    """
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'first_name', 'last_name']
+
+
 class ManagerSerializer(serializers.ModelSerializer):
-    
+    user = ManagerUserSerializer(read_only=True)
+
     def validate_phone_number(self, value):
         """Ensure the phone number is valid."""
         if not value.isdigit() or len(value) not in [10, 12]:
             raise serializers.ValidationError("Phone number must be numeric and either 10 or 12 digits long.")
         return value
     
-    def validate(self, data):
-        """Ensure the manager is associated with at least one valid matatu."""
-        matatus = data.get('assigned_matatus')  # Updated to match the field in the model
-        if matatus and not all(matatu.is_active for matatu in matatus):
-            raise serializers.ValidationError("All managed matatus must be active.")
-        return data
-
     class Meta:
         model = Manager
-        fields = ['id', 'user', 'phone_number', 'assigned_matatus']  # Removed 'name' and added 'user'
-        depth = 1  # To include nested 'user' data if needed
+        fields = ['id', 'user', 'phone_number', 'assigned_matatus']
 
         
 
+class ExpenseCategorySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ExpenseCategory
+        fields = ['id', 'name']
+
+
 class ExpenseSerializer(serializers.ModelSerializer):
+    # Accepted in place of ``category`` and resolved to one by name.
+    expense_type = serializers.CharField(max_length=50, write_only=True, required=False)
+
+    def validate_expense_type(self, value):
+        """Ensure the name is not blank."""
+        if not ExpenseCategory.normalize(value):
+            raise serializers.ValidationError("Expense type must not be blank.")
+        return value
+
+    def validate(self, data):
+        """
+        Look ``expense_type`` up among the existing categories; one of it and
+        ``category`` is required. A name not seen before stays in
+        ``expense_type``, for the view to create with the expense.
+        """
+        expense_type = data.get('expense_type')
+        if expense_type is not None:
+            category = ExpenseCategory.objects.filter(key=ExpenseCategory.normalize(expense_type)).first()
+            if category is not None:
+                del data['expense_type']
+                data['category'] = category
+        elif 'category' not in data and not self.partial:
+            raise serializers.ValidationError({'category': ["This field is required."]})
+        return data
+
     class Meta:
         model = Expense
-        fields = '__all__'
\ No newline at end of file
+        fields = '__all__'
+        read_only_fields = ['date']
+        extra_kwargs = {'category': {'required': False}}
+
+
+class PaymentSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Payment
+        fields = ['id', 'receiver', 'amount', 'payment_type', 'date', 'payroll_run']
@@ -0,0 +1,182 @@
+from functools import partial
+
+from django.contrib.auth.models import Group
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils.timezone import now
+
+from sacco import response_cache, rollups, sync, versions
+from sacco.fleets import invalidate_fleets
+from sacco.models import Conductor, Driver, Expense, ExpenseCategory, Manager, Matatu, Revenue, Route, User
+from sacco.roles import invalidate_user_roles
+
+
+# Role cache invalidation
+@receiver(m2m_changed, sender=User.groups.through)
+def clear_roles_on_group_membership_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # The cleared users are gone by post_clear, so remember them now.
+        instance._sacco_cleared_user_ids = list(instance.custom_user_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        invalidate_user_roles(instance.pk)
+    elif action == 'post_clear':
+        invalidate_user_roles(*getattr(instance, '_sacco_cleared_user_ids', []))
+    else:
+        invalidate_user_roles(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+def clear_roles_on_group_rename(sender, instance, created, **kwargs):
+    if not created:
+        invalidate_user_roles(*instance.custom_user_set.values_list('pk', flat=True))
+
+
+@receiver(pre_delete, sender=Group)
+def clear_roles_on_group_delete(sender, instance, **kwargs):
+    invalidate_user_roles(*instance.custom_user_set.values_list('pk', flat=True))
+
+
+@receiver([post_save, post_delete], sender=User)
+def clear_roles_on_user_change(sender, instance, **kwargs):
+    invalidate_user_roles(instance.pk)
+
+
+# Manager fleet invalidation
+@receiver(m2m_changed, sender=Manager.assigned_matatus.through)
+def clear_fleet_on_assignment_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # The managers losing this matatu are gone by post_clear, so remember them now.
+        instance._sacco_cleared_manager_users = list(instance.managers.values_list('user_id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        invalidate_fleets(instance.user_id)
+    elif action == 'post_clear':
+        invalidate_fleets(*getattr(instance, '_sacco_cleared_manager_users', []))
+    else:
+        invalidate_fleets(*Manager.objects.filter(pk__in=pk_set).values_list('user_id', flat=True))
+    # What a manager's matatu listing shows has changed.
+    versions.bump(Matatu)
+
+
+@receiver([post_save, post_delete], sender=Manager)
+def clear_fleet_on_manager_change(sender, instance, **kwargs):
+    invalidate_fleets(instance.user_id)
+
+
+# Route revenue rollups
+@receiver(pre_save, sender=Revenue)
+def remember_previous_revenue(sender, instance, raw, **kwargs):
+    instance._rollup_previous = None
+    if instance.pk and not raw:
+        instance._rollup_previous = (
+            Revenue.objects.filter(pk=instance.pk)
+            .values_list('matatu_id', 'date', 'amount_collected')
+            .first()
+        )
+
+
+@receiver(post_save, sender=Revenue)
+def roll_up_saved_revenue(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    if previous is not None:
+        matatu_id, date, amount = previous
+        rollups.apply_revenue_delta(matatu_id, rollups.rolled_up_route(matatu_id, date), date, -amount)
+
+    route_id = Matatu.objects.filter(pk=instance.matatu_id).values_list('route_id', flat=True).first()
+    rollups.apply_revenue_delta(instance.matatu_id, route_id, instance.date, instance.amount_collected)
+
+
+@receiver(post_delete, sender=Revenue)
+def roll_up_deleted_revenue(sender, instance, **kwargs):
+    route_id = rollups.rolled_up_route(instance.matatu_id, instance.date)
+    rollups.apply_revenue_delta(instance.matatu_id, route_id, instance.date, -instance.amount_collected)
+
+
+@receiver(pre_delete, sender=Matatu)
+def roll_up_deleted_matatu(sender, instance, **kwargs):
+    rollups.remove_matatu(instance.pk)
+
+
+# Table versions, for conditional GETs and the response cache
+@receiver([post_save, post_delete], sender=Revenue)
+@receiver([post_save, post_delete], sender=Expense)
+@receiver([post_save, post_delete], sender=ExpenseCategory)
+def invalidate_cached_responses(sender, **kwargs):
+    # Once committed, so writers of these busy tables never queue on the
+    # version row for the rest of their transaction.
+    transaction.on_commit(partial(response_cache.invalidate, sender))
+
+
+@receiver([post_save, post_delete], sender=Matatu)
+def bump_matatu_version(sender, **kwargs):
+    versions.bump(Matatu)
+
+
+@receiver(post_save, sender=Route)
+def bump_route_version(sender, **kwargs):
+    versions.bump(Route)
+
+
+@receiver(post_delete, sender=Route)
+def bump_route_version_on_delete(sender, **kwargs):
+    # Deleting a route nulls Matatu.route with a bulk UPDATE that sends no
+    # Matatu signals, so the matatu listings change too.
+    versions.bump(Route, Matatu)
+
+
+# Delta sync
+@receiver(pre_delete, sender=Route)
+def touch_matatus_of_deleted_route(sender, instance, **kwargs):
+    # SET_NULL clears the foreign key with a bulk UPDATE that leaves
+    # updated_at alone, so synced clients would keep the old route.
+    Matatu.objects.filter(route=instance).update(updated_at=now())
+
+
+@receiver(pre_delete, sender=Matatu)
+def touch_driver_of_deleted_matatu(sender, instance, **kwargs):
+    Driver.objects.filter(assigned_matatu=instance).update(updated_at=now())
+
+
+@receiver(pre_delete, sender=Driver)
+def touch_conductor_of_deleted_driver(sender, instance, **kwargs):
+    Conductor.objects.filter(assigned_driver=instance).update(updated_at=now())
+
+
+@receiver(post_delete, sender=Route)
+def record_route_tombstone(sender, instance, **kwargs):
+    # Every client syncs every route.
+    sync.record_deletion(sender, instance.pk)
+
+
+@receiver(post_delete, sender=Matatu)
+def record_matatu_tombstone(sender, instance, **kwargs):
+    sync.record_deletion(sender, instance.pk, instance.pk)
+
+
+@receiver(post_delete, sender=Driver)
+def record_driver_tombstone(sender, instance, **kwargs):
+    sync.record_deletion(sender, instance.pk, instance.assigned_matatu_id)
+
+
+@receiver(post_delete, sender=Conductor)
+def record_conductor_tombstone(sender, instance, **kwargs):
+    matatu_id = (
+        Driver.objects.filter(pk=instance.assigned_driver_id).values_list('assigned_matatu_id', flat=True).first()
+    )
+    sync.record_deletion(sender, instance.pk, matatu_id)
+
+
+@receiver(post_delete, sender=Revenue)
+@receiver(post_delete, sender=Expense)
+def record_matatu_row_tombstone(sender, instance, **kwargs):
+    sync.record_deletion(sender, instance.pk, instance.matatu_id)
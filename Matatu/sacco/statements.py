@@ -0,0 +1,222 @@
+"""
+Monthly owner statements.
+
+``generate()`` writes a CSV and a printable HTML statement for every
+MatatuOwner, with the revenue, expenses and net of each of their matatus
+for one month. All statements are computed up front from three set-based
+queries whatever the number of owners: the owners, their matatus, and the
+per-matatu revenue and expense totals for the month (the profit-and-loss
+``UNION ALL``, archived days included). Only rendering and writing the
+files is spread over a process pool; the workers never touch the database.
+
+Each statement carries a digest of everything it is rendered from. The
+digests of finished statements are appended to ``manifest.jsonl`` in the
+month's directory as they complete, so a run that is interrupted resumes
+where it stopped, and a later run skips every owner whose digest is
+unchanged and whose files are still there.
+"""
+import csv
+import datetime
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from functools import partial
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.template.loader import render_to_string
+
+from sacco import analytics
+from sacco.models import Matatu, MatatuOwner
+
+# Bump when the rendered output changes, so every statement is redone.
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.jsonl'
+CSV_HEADER = ['registration_number', 'revenue', 'expenses', 'net']
+ZERO = Decimal('0.00')
+
+
+def output_dir():
+    return Path(getattr(settings, 'SACCO_STATEMENTS_DIR', settings.BASE_DIR / 'statements'))
+
+
+def month_range(month):
+    """
+    Return the first and last day of the month that ``month`` (a date) is in.
+    """
+    start = month.replace(day=1)
+    following = (start.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+    return start, following - datetime.timedelta(days=1)
+
+
+def statements(start, end):
+    """
+    Return the statement data for every owner over ``[start, end]``, ordered
+    by owner. Each is a plain dict, so it can be sent to another process.
+    """
+    totals = {}
+    for row in analytics.profit_and_loss_query('month', start, end):
+        entry = totals.setdefault(row['matatu_id'], [ZERO, ZERO])
+        entry[0] += row['revenue'] or ZERO
+        entry[1] += row['expenses'] or ZERO
+
+    vehicles = {}
+    for matatu in Matatu.objects.order_by('registration_number').values('id', 'registration_number', 'owner_id'):
+        revenue, expenses = totals.get(matatu['id'], (ZERO, ZERO))
+        vehicles.setdefault(matatu['owner_id'], []).append({
+            'registration_number': matatu['registration_number'],
+            'revenue': revenue,
+            'expenses': expenses,
+            'net': revenue - expenses,
+        })
+
+    result = []
+    for owner in MatatuOwner.objects.order_by('pk').values(
+        'pk', 'phone_number', 'user__username', 'user__first_name', 'user__last_name',
+    ):
+        rows = vehicles.get(owner['pk'], [])
+        statement = {
+            'owner': owner['pk'],
+            'name': f"{owner['user__first_name']} {owner['user__last_name']}".strip() or owner['user__username'],
+            'phone_number': owner['phone_number'],
+            'start': start,
+            'end': end,
+            'vehicles': rows,
+            'revenue': sum((row['revenue'] for row in rows), ZERO),
+            'expenses': sum((row['expenses'] for row in rows), ZERO),
+        }
+        statement['net'] = statement['revenue'] - statement['expenses']
+        statement['digest'] = digest(statement)
+        result.append(statement)
+    return result
+
+
+def digest(statement):
+    data = json.dumps([FORMAT_VERSION, statement], cls=DjangoJSONEncoder, sort_keys=True)
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+def file_names(owner):
+    return f'owner-{owner}.csv', f'owner-{owner}.html'
+
+
+def read_manifest(directory):
+    """
+    Return ``{owner id: digest}`` of the statements already written to ``directory``.
+    """
+    done = {}
+    try:
+        with open(directory / MANIFEST, encoding='utf-8') as manifest:
+            for line in manifest:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A line cut short by an interrupted run.
+                    continue
+                done[entry['owner']] = entry['digest']
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def write_manifest(directory, done):
+    """
+    Rewrite the manifest with one line per owner.
+    """
+    temporary = directory / f'{MANIFEST}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as manifest:
+        for owner, value in sorted(done.items()):
+            manifest.write(json.dumps({'owner': owner, 'digest': value}) + '\n')
+    os.replace(temporary, directory / MANIFEST)
+
+
+def _write(path, content):
+    # Write then rename, so an interrupted run never leaves half a statement.
+    temporary = path.with_name(path.name + '.tmp')
+    with open(temporary, 'w', encoding='utf-8', newline='') as output:
+        output.write(content)
+    os.replace(temporary, path)
+
+
+def render(statement, directory):
+    """
+    Write the CSV and HTML statement for one owner; returns ``(owner, digest)``.
+    Runs in the pool workers.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    for row in statement['vehicles']:
+        writer.writerow([row[column] for column in CSV_HEADER])
+    writer.writerow(['TOTAL', statement['revenue'], statement['expenses'], statement['net']])
+
+    csv_name, html_name = file_names(statement['owner'])
+    _write(directory / csv_name, buffer.getvalue())
+    _write(directory / html_name, render_to_string('sacco/owner_statement.html', {'statement': statement}))
+    return statement['owner'], statement['digest']
+
+
+def generate(month, directory=None, workers=None, force=False, progress=None):
+    """
+    Write the statements of every owner for the month ``month`` (a date in
+    it) under ``directory`` (default ``SACCO_STATEMENTS_DIR``), in a
+    subdirectory per month. ``workers`` processes render them (default: one
+    per core); ``force`` re-renders owners whose statement is unchanged.
+    ``progress``, if given, is called with the number of statements rendered
+    so far and the number to render.
+
+    Returns the number of owners, statements rendered and statements skipped,
+    and the seconds taken.
+    """
+    started = time.perf_counter()
+    start, end = month_range(month)
+    directory = Path(directory or output_dir()) / f'{start:%Y-%m}'
+    directory.mkdir(parents=True, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+
+    pending = statements(start, end)
+    owners = len(pending)
+    done = read_manifest(directory)
+    if not force:
+        pending = [
+            statement for statement in pending
+            if done.get(statement['owner']) != statement['digest']
+            or not all((directory / name).exists() for name in file_names(statement['owner']))
+        ]
+
+    rendered = 0
+    with open(directory / MANIFEST, 'a', encoding='utf-8') as manifest:
+        def record(owner, value):
+            nonlocal rendered
+            rendered += 1
+            done[owner] = value
+            manifest.write(json.dumps({'owner': owner, 'digest': value}) + '\n')
+            manifest.flush()
+            if progress is not None:
+                progress(rendered, len(pending))
+
+        if workers == 1 or len(pending) <= 1:
+            for statement in pending:
+                record(*render(statement, directory))
+        else:
+            # Spawned workers import the app afresh and need Django set up.
+            with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+                chunksize = max(1, min(100, len(pending) // (workers * 4)))
+                for owner, value in pool.map(partial(render, directory=directory), pending, chunksize=chunksize):
+                    record(owner, value)
+
+    # Drop superseded lines now that the run is complete.
+    write_manifest(directory, done)
+    return {
+        'owners': owners,
+        'rendered': rendered,
+        'skipped': owners - rendered,
+        'directory': str(directory),
+        'seconds': round(time.perf_counter() - started, 3),
+    }
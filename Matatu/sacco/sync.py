@@ -0,0 +1,189 @@
+"""
+Delta sync for the conductor and driver mobile clients.
+
+A sync token is a signed server timestamp and the scope of the client it was
+given to: the matatus whose crew, revenue and expenses it receives. Given a
+token, ``changes_since()`` returns the rows whose indexed ``updated_at`` is
+newer, plus the ids recorded in the Tombstone log for rows of that scope
+deleted since, so the work done and the payload sent both grow with the amount
+of change rather than with table size. A token from another scope, such as
+before a driver was moved to another matatu, gets a full sync with ``reset``:
+the rows of the new scope are older than the token, and those of the old one
+must be dropped.
+
+Timestamps are taken before the queries run and every query reaches back
+``SACCO_SYNC_OVERLAP_SECONDS`` further, so rows committed by transactions that
+were still open at the previous sync are not missed. Clients apply changes
+idempotently, so the overlap only costs a few repeated rows.
+
+A response carries at most ``SACCO_SYNC_PAGE_SIZE`` changed rows. When there
+are more, it has a ``next`` cursor instead of a token: the client asks again
+with the cursor, and gets the token with the last page. The cursor holds the
+time the sync started and the ``(updated_at, id)`` of the last row sent, so
+each page is one keyset read per section and rows changed while the client
+pages come again in the next delta.
+"""
+import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils.timezone import now
+
+from sacco import fleets
+from sacco.models import Conductor, Driver, Expense, Matatu, Revenue, Route, Tombstone
+from sacco.serializers import (
+    ConductorSerializer,
+    DriverSerializer,
+    ExpenseSerializer,
+    MatatuSerializer,
+    RevenueSerializer,
+    RouteSerializer,
+)
+
+TOKEN_SALT = 'sacco.sync'
+CURSOR_SALT = 'sacco.sync.cursor'
+
+# section name -> (model, serializer)
+SECTIONS = {
+    'routes': (Route, RouteSerializer),
+    'matatus': (Matatu, MatatuSerializer),
+    'drivers': (Driver, DriverSerializer),
+    'conductors': (Conductor, ConductorSerializer),
+    'revenues': (Revenue, RevenueSerializer),
+    'expenses': (Expense, ExpenseSerializer),
+}
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def overlap():
+    return datetime.timedelta(seconds=getattr(settings, 'SACCO_SYNC_OVERLAP_SECONDS', 5))
+
+
+def tombstone_retention():
+    return datetime.timedelta(days=getattr(settings, 'SACCO_SYNC_TOMBSTONE_DAYS', 90))
+
+
+def page_size():
+    return getattr(settings, 'SACCO_SYNC_PAGE_SIZE', 500)
+
+
+def make_token(timestamp, scope=''):
+    return signing.dumps({'at': timestamp.isoformat(), 'scope': scope}, salt=TOKEN_SALT)
+
+
+def read_token(token):
+    """
+    Return the ``(timestamp, scope)`` a token was made from.
+    """
+    try:
+        state = signing.loads(token, salt=TOKEN_SALT)
+        return datetime.datetime.fromisoformat(state['at']), state['scope']
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidToken("Invalid sync token.")
+
+
+def make_cursor(synced_at, since, reset, scope, section, after=None):
+    return signing.dumps({
+        'synced_at': synced_at.isoformat(),
+        'since': since.isoformat() if since else None,
+        'reset': reset,
+        'scope': scope,
+        'section': section,
+        'after': after,
+    }, salt=CURSOR_SALT)
+
+
+def read_cursor(cursor):
+    """
+    Return ``(synced_at, since, reset, scope, section, after)`` from a page cursor.
+    """
+    try:
+        state = signing.loads(cursor, salt=CURSOR_SALT)
+        since = state['since'] and datetime.datetime.fromisoformat(state['since'])
+        return (datetime.datetime.fromisoformat(state['synced_at']), since, state['reset'], state['scope'],
+                state['section'], state['after'])
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        raise InvalidToken("Invalid sync cursor.")
+
+
+def changes_since(token=None, querysets=None, cursor=None, matatus=None):
+    """
+    Return the sync payload for a client holding ``token`` (None for a first,
+    full sync), or the next page of a sync for a client holding ``cursor``.
+
+    ``querysets`` may map section names to querysets limited to ``matatus``,
+    the set of matatu ids the client is scoped to (None when unscoped); the
+    deletions reported for those sections are limited the same way.
+
+    When the token predates the tombstone retention window the deletions may
+    be incomplete, and when it was made for another scope the client holds
+    the wrong rows; either way the client is told to ``reset`` and gets a
+    full sync. Deletions are all sent with the first page.
+    """
+    scope = fleets.fleet_scope(matatus)
+    if cursor:
+        synced_at, since, reset, cursor_scope, first, after = read_cursor(cursor)
+        if cursor_scope != scope:
+            # The scope changed while the client paged: start over.
+            return changes_since(querysets=querysets, matatus=matatus)
+    else:
+        synced_at, first, after = now(), next(iter(SECTIONS)), None
+        since, token_scope = read_token(token) if token else (None, None)
+        reset = since is None or token_scope != scope or since < synced_at - tombstone_retention()
+        if reset:
+            since = None
+        else:
+            since -= overlap()
+
+    querysets = querysets or {}
+    changes, deleted = {}, {}
+    remaining, next_cursor = page_size(), None
+    start = list(SECTIONS).index(first)
+    for index, (section, (model, serializer_class)) in enumerate(SECTIONS.items()):
+        changes[section], deleted[section] = [], []
+        if since is not None and not cursor:
+            tombstones = Tombstone.objects.filter(table=model._meta.label_lower, deleted_at__gte=since)
+            if section in querysets:
+                tombstones = fleets.scope(tombstones, matatus)
+            deleted[section] = list(tombstones.values_list('object_id', flat=True))
+        if index < start or next_cursor:
+            continue
+
+        queryset = querysets.get(section, model.objects.all())
+        if since is not None:
+            queryset = queryset.filter(updated_at__gte=since)
+        if index == start and after:
+            updated_at, pk = datetime.datetime.fromisoformat(after[0]), after[1]
+            queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+        # One row more than fits tells whether another page follows.
+        rows = list(queryset.order_by('updated_at', 'id')[:remaining + 1])
+        if len(rows) > remaining:
+            rows = rows[:remaining]
+            last = [rows[-1].updated_at.isoformat(), rows[-1].pk] if rows else None
+            next_cursor = make_cursor(synced_at, since, reset, scope, section, last)
+        remaining -= len(rows)
+        changes[section] = serializer_class(rows, many=True).data
+
+    return {
+        'token': None if next_cursor else make_token(synced_at, scope),
+        'next': next_cursor,
+        'reset': reset,
+        'changes': changes,
+        'deleted': deleted,
+    }
+
+
+def record_deletion(model, object_id, matatu_id=None):
+    Tombstone.objects.create(table=model._meta.label_lower, object_id=object_id, matatu_id=matatu_id)
+
+
+def prune_tombstones():
+    """
+    Delete tombstones older than the retention window. Returns the count.
+    """
+    deleted, _ = Tombstone.objects.filter(deleted_at__lt=now() - tombstone_retention()).delete()
+    return deleted
@@ -0,0 +1,10 @@
+import pytest
+from django.core.cache import caches
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    # Rolled-back test data never fires the invalidating signals, so start
+    # every test with empty caches.
+    for cache in caches.all():
+        cache.clear()
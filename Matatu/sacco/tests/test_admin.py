@@ -0,0 +1,84 @@
+import contextlib
+import datetime
+
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from sacco import admin, fleetgen
+from sacco.models import Revenue, User
+
+END = datetime.date(2024, 3, 31)
+
+
+class EstimatingConnection:
+    """
+    Stands in for a PostgreSQL connection whose planner estimates ``rows``.
+    """
+    vendor = 'postgresql'
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.statements = []
+
+    @contextlib.contextmanager
+    def cursor(self):
+        yield self
+
+    def execute(self, sql, params):
+        self.statements.append((sql, params))
+
+    def fetchone(self):
+        return (self.rows,)
+
+
+@pytest.fixture
+def client(db):
+    fleetgen.generate(owners=2, matatus=10, routes=2, days=30, end=END, prefix='admin')
+    client = Client()
+    client.force_login(User.objects.create_superuser(username='admin', password='x', role='admin'))
+    return client
+
+
+def changelist(client, query=''):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(f'/admin/sacco/revenue/{query}')
+    assert response.status_code == 200
+    return response.content.decode('utf-8'), [query['sql'] for query in queries.captured_queries]
+
+
+def test_large_changelists_show_the_estimate_without_counting(client, monkeypatch):
+    estimating = EstimatingConnection(250000)
+    monkeypatch.setattr(admin, 'connections', {'default': estimating})
+
+    content, queries = changelist(client)
+
+    assert '250000 revenues' in content
+    assert estimating.statements == [
+        ('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', ['sacco_revenue']),
+    ]
+    assert not any('COUNT(' in sql for sql in queries)
+    # Session, user, the date hierarchy and one joined page of rows.
+    assert len(queries) <= 5
+
+
+def test_small_and_filtered_changelists_count_exactly(client, monkeypatch):
+    monkeypatch.setattr(admin, 'connections', {'default': EstimatingConnection(5000)})
+    content, _ = changelist(client)
+    assert f'{Revenue.objects.count()} revenues' in content
+
+    estimating = EstimatingConnection(250000)
+    monkeypatch.setattr(admin, 'connections', {'default': estimating})
+    content, _ = changelist(client, '?date__year=2024&date__month=3&date__day=31')
+    assert '10 revenues' in content and estimating.statements == []
+
+
+def test_changelist_queries_do_not_grow_with_the_page(client):
+    day = '?date__year=2024&date__month=3&date__day=31'
+    _, ten_rows = changelist(client, day)
+    Revenue.objects.filter(date=END).exclude(pk=Revenue.objects.filter(date=END).first().pk).delete()
+    _, one_row = changelist(client, day)
+    # Related matatus are joined, not loaded row by row.
+    assert len(ten_rows) == len(one_row)
+    assert any('JOIN "sacco_matatu"' in sql for sql in ten_rows)
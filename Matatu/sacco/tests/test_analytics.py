@@ -0,0 +1,40 @@
+import datetime
+
+import pytest
+from django.contrib.auth.models import Group
+from rest_framework.test import APIClient
+
+from sacco.models import Expense, ExpenseCategory, Matatu, MatatuOwner, Revenue, User
+
+
+@pytest.mark.django_db
+def test_profit_and_loss_is_scoped_to_the_owner(django_capture_on_commit_callbacks):
+    user = User.objects.create_user(username='owner', password='x', role='owner')
+    user.groups.add(Group.objects.create(name='Matatu Owner'))
+    owner = MatatuOwner.objects.create(user=user, phone_number='0700000000')
+    other = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='other', password='x', role='owner'),
+        phone_number='0700000001',
+    )
+    mine, theirs = (
+        Matatu.objects.create(registration_number=f'KBX{n}', capacity=14, owner=o,
+                              licence_expiry_date=datetime.date(2030, 1, 1))
+        for n, o in enumerate([owner, other])
+    )
+    Revenue.objects.create(matatu=mine, amount_collected=5000)
+    Revenue.objects.create(matatu=theirs, amount_collected=7000)
+    Expense.objects.create(matatu=mine, category=ExpenseCategory.resolve('Fuel'), amount=1200)
+
+    client = APIClient()
+    client.force_authenticate(user)
+    today = datetime.date.today()
+    url = f'/analytics/profit-and-loss/?period=month&start={today}&end={today}'
+
+    [row] = client.get(url).json()['results']
+    assert (row['matatu'], row['revenue'], row['expenses'], row['net']) == (
+        mine.pk, '5000.00', '1200.00', '3800.00')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Expense.objects.create(matatu=mine, category=ExpenseCategory.resolve('Service'), amount=800)
+    [row] = client.get(url).json()['results']
+    assert row['net'] == '3000.00'
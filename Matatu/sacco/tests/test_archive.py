@@ -0,0 +1,115 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import Group
+from rest_framework.test import APIClient
+
+from sacco import archive
+from sacco.models import (
+    ArchivedExpense,
+    ArchivedRevenue,
+    DailyMatatuSummary,
+    Expense,
+    ExpenseCategory,
+    Manager,
+    Matatu,
+    MatatuOwner,
+    Revenue,
+    Route,
+    RouteRevenue,
+    Tombstone,
+    User,
+)
+
+START = datetime.date(2024, 3, 1)
+BEFORE = datetime.date(2024, 3, 3)
+
+
+@pytest.fixture
+def client(db):
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def matatus(db):
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'),
+        phone_number='0700000000',
+    )
+    route = Route.objects.create(name='Thika Road')
+    matatus = [
+        Matatu.objects.create(registration_number=f'KB{n:03d}', route=route, capacity=14, owner=owner,
+                              licence_expiry_date=datetime.date(2030, 1, 1))
+        for n in range(2)
+    ]
+    fuel, parking = ExpenseCategory.resolve('Fuel'), ExpenseCategory.resolve('Parking')
+    for day in range(4):
+        date = START + datetime.timedelta(days=day)
+        for n, matatu in enumerate(matatus):
+            Revenue.objects.create(matatu=matatu, amount_collected=Decimal(3000 + 100 * n + day), date=date)
+            Expense.objects.create(matatu=matatu, category=fuel, amount=Decimal('1000.00'), date=date)
+            Expense.objects.create(matatu=matatu, category=parking, amount=Decimal(50 + n), date=date)
+    return matatus
+
+
+def walk(client, path):
+    rows, url = [], path
+    while url:
+        page = client.get(url).json()
+        rows += page['results']
+        url = page['next']
+    return rows
+
+
+def snapshot(client):
+    return {
+        'revenues': walk(client, '/revenues/?page_size=3'),
+        'expenses': walk(client, '/expenses/?page_size=3'),
+        'pnl': client.get('/analytics/profit-and-loss/?period=week&start=2024-02-01&end=2024-03-31').json(),
+        'export': b''.join(client.get('/exports/expenses/?start=2024-03-01&end=2024-03-31').streaming_content),
+    }
+
+
+def test_archive_moves_old_rows_and_leaves_daily_summaries(matatus):
+    rollups = list(RouteRevenue.objects.values_list('date', 'total_revenue'))
+
+    counts = archive.archive(BEFORE, batch_days=1)
+
+    assert counts == {'revenues': 4, 'expenses': 8, 'summaries': 4}
+    assert not Revenue.objects.filter(date__lt=BEFORE).exists()
+    assert not Expense.objects.filter(date__lt=BEFORE).exists()
+    assert ArchivedRevenue.objects.count() == 4 and ArchivedExpense.objects.count() == 8
+
+    summary = DailyMatatuSummary.objects.get(matatu=matatus[1], date=START)
+    assert summary.revenue_collected == Decimal('3100.00')
+    assert summary.expense_total == Decimal('1051.00')
+    assert summary.expense_count == 2
+
+    # Archiving is not deletion: rollups keep their totals and sync sees no tombstones.
+    assert list(RouteRevenue.objects.values_list('date', 'total_revenue')) == rollups
+    assert not Tombstone.objects.exists()
+
+    assert archive.archive(BEFORE) == {'revenues': 0, 'expenses': 0, 'summaries': 0}
+
+
+def test_reads_combine_hot_and_archived_rows(client, matatus):
+    before = snapshot(client)
+    archive.archive(BEFORE)
+    assert snapshot(client) == before
+
+
+def test_archived_rows_can_be_read_but_not_changed(client, matatus):
+    revenue = Revenue.objects.filter(date=START).first()
+    archive.archive(BEFORE)
+
+    response = client.get(f'/revenues/{revenue.pk}/')
+    assert response.status_code == 200
+    assert response.json()['amount_collected'] == str(revenue.amount_collected)
+    assert client.delete(f'/revenues/{revenue.pk}/').status_code == 404
+    assert ArchivedRevenue.objects.filter(pk=revenue.pk).exists()
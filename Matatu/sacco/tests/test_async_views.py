@@ -0,0 +1,113 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import Group
+from rest_framework.test import APIClient
+
+from sacco import loadtest
+from sacco.models import Expense, ExpenseCategory, Manager, Matatu, MatatuOwner, Revenue, Route, User
+
+
+@pytest.fixture
+def manager(db):
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+    return user
+
+
+@pytest.fixture
+def fleet(db):
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'),
+        phone_number='0700000000',
+    )
+    route = Route.objects.create(name='Thika Road')
+    matatus = [
+        Matatu.objects.create(registration_number=f'KB{n:03d}', route=route, capacity=14, owner=owner,
+                              licence_expiry_date=datetime.date(2025, 1, 1))
+        for n in range(3)
+    ]
+    fuel = ExpenseCategory.resolve('Fuel')
+    for day in range(4):
+        for matatu in matatus:
+            date = datetime.date(2024, 3, 1) + datetime.timedelta(days=day)
+            Revenue.objects.create(matatu=matatu, amount_collected=Decimal('3000.00'), date=date)
+            Expense.objects.create(matatu=matatu, category=fuel, amount=Decimal('1200.00'), date=date)
+    return matatus
+
+
+@pytest.mark.parametrize('resource', ['routes', 'matatus', 'revenues', 'expenses'])
+def test_async_lists_match_the_synchronous_endpoints(resource, manager, fleet):
+    sync_client, async_client = APIClient(), APIClient()
+    sync_client.force_authenticate(manager)
+    async_client.force_login(manager)
+
+    response = async_client.get(f'/async/{resource}/?page_size=2')
+    assert response.status_code == 200
+    assert response.content.replace(b'/async/', b'/') == sync_client.get(f'/{resource}/?page_size=2').content
+
+
+@pytest.mark.parametrize('resource', ['revenues', 'expenses'])
+def test_async_cursor_walks_the_same_keyset(resource, manager, fleet):
+    sync_client, async_client = APIClient(), APIClient()
+    sync_client.force_authenticate(manager)
+    async_client.force_login(manager)
+
+    cursor = async_client.get(f'/async/{resource}/?page_size=5').json()['next'].split('cursor=')[1]
+    assert (
+        async_client.get(f'/async/{resource}/?page_size=5&cursor={cursor}').json()['results']
+        == sync_client.get(f'/{resource}/?page_size=5&cursor={cursor}').json()['results']
+    )
+
+
+def test_async_detail_matches_and_reports_errors(manager, fleet):
+    sync_client, async_client = APIClient(), APIClient()
+    sync_client.force_authenticate(manager)
+    async_client.force_login(manager)
+    revenue = Revenue.objects.first()
+
+    response = async_client.get(f'/async/revenues/{revenue.pk}/')
+    assert response.status_code == 200
+    assert response.json() == sync_client.get(f'/revenues/{revenue.pk}/').json()
+
+    response = async_client.get('/async/revenues/0/')
+    assert response.status_code == 404
+    assert response.json() == {'detail': 'No Revenue matches the given query.'}
+    assert async_client.get('/async/revenues/?cursor=garbage').status_code == 404
+    assert APIClient().get('/async/routes/').status_code == 403
+
+
+def test_async_views_check_roles_and_versions(manager, fleet):
+    client = APIClient()
+    client.force_login(User.objects.create_user(username='driver', password='x', role='driver'))
+    assert client.get('/async/routes/').status_code == 403
+    assert client.get(f'/async/matatus/{fleet[0].pk}/').status_code == 200
+
+    client.force_login(manager)
+    etag = client.get('/async/routes/')['ETag']
+    assert client.get('/async/routes/', HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+    Route.objects.create(name='Mombasa Road')
+    assert client.get('/async/routes/', HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+def test_percentile():
+    assert loadtest.percentile([0.3, 0.1, 0.2, 0.4], 50) == 0.2
+    assert loadtest.percentile([0.3, 0.1, 0.2, 0.4], 99) == 0.4
+    assert loadtest.percentile([], 50) is None
+
+
+@pytest.mark.django_db(transaction=True)
+def test_compare_drives_servers_over_http(live_server):
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+
+    reports = loadtest.compare(
+        user, f'{live_server.url}/revenues/', f'{live_server.url}/async/revenues/', requests=6, concurrency=2,
+    )
+    assert [(report['mode'], report['requests'], report['errors']) for report in reports] == [
+        ('wsgi', 6, 0), ('asgi', 6, 0),
+    ]
@@ -0,0 +1,312 @@
+"""
+Query-count and latency budgets for every route in sacco/urls.py.
+
+A fleet is generated once per module with ``sacco.fleetgen``. Each endpoint
+is called with cold caches and its query count must stay within budget;
+this is what catches N+1 regressions, and it runs with the rest of the
+suite.
+
+Timings depend on the machine and on what else it is doing, so the latency
+budgets and the fast-path throughput comparison only run when
+SACCO_BENCH_TIMINGS=1, and the measurements are written as JSON only when
+SACCO_BENCH_OUTPUT names a file. The default fleet of 200 matatus and 90
+days keeps the suite quick but is far smaller than a real sacco; for numbers
+worth comparing between releases, run with thousands of matatus and years of
+revenue, e.g.
+
+    SACCO_BENCH_TIMINGS=1 SACCO_BENCH_MATATUS=5000 SACCO_BENCH_DAYS=730 \\
+    SACCO_BENCH_OUTPUT=benchmark-results.json pytest sacco/tests/test_benchmarks.py
+
+Median latencies are taken over SACCO_BENCH_RUNS calls.
+"""
+import datetime
+import json
+import os
+import platform
+import statistics
+import time
+
+import django
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+
+from sacco import fastpath, fleetgen, live, sync, urls
+from sacco.serializers import ExpenseSerializer, RevenueSerializer
+from sacco.models import (
+    Conductor,
+    Driver,
+    Expense,
+    Job,
+    Manager,
+    Matatu,
+    Revenue,
+    Route,
+    User,
+)
+
+MATATUS = int(os.environ.get('SACCO_BENCH_MATATUS', 200))
+DAYS = int(os.environ.get('SACCO_BENCH_DAYS', 90))
+RUNS = int(os.environ.get('SACCO_BENCH_RUNS', 5))
+TIMINGS = os.environ.get('SACCO_BENCH_TIMINGS') == '1'
+OUTPUT = os.environ.get('SACCO_BENCH_OUTPUT')
+
+timed = pytest.mark.skipif(not TIMINGS, reason="Set SACCO_BENCH_TIMINGS=1 to measure timings.")
+
+TODAY = datetime.date.today()
+START = TODAY - datetime.timedelta(days=DAYS - 1)
+
+# url name -> (max queries, max median latency in ms)
+BUDGETS = {
+    'manager-list': (2, 300),
+    'manager-detail': (2, 100),
+    'driver-list': (2, 300),
+    'driver-detail': (2, 100),
+    'conductor-list': (2, 300),
+    'conductor-detail': (2, 100),
+    'matatu-list': (4, 300),
+    'matatu-detail': (4, 100),
+    'route-list': (4, 100),
+    'route-detail': (4, 100),
+    'route-revenue-list': (3, 300),
+    # Reads that may include archived rows first check whether any exist.
+    'revenue-list': (4, 300),
+    'revenue-detail': (3, 100),
+    'revenue-bulk': (16, 1000),
+    'expense-list': (4, 300),
+    'expense-detail': (3, 100),
+    'expense-category-list': (3, 100),
+    'payment-list': (2, 300),
+    'export': (2, 3000),
+    'profit-and-loss': (5, 2000),
+    'expense-breakdown': (6, 2000),
+    'licence-expiring': (3, 300),
+    'job-list': (2, 100),
+    'job-detail': (2, 100),
+    'sync': (13, 300),
+    # The async views authenticate from the session: session, user, roles, rows.
+    'async-route-list': (5, 100),
+    'async-route-detail': (5, 100),
+    'async-matatu-list': (5, 300),
+    'async-matatu-detail': (4, 100),
+    'async-revenue-list': (5, 300),
+    'async-revenue-detail': (4, 100),
+    'async-expense-list': (5, 300),
+    'async-expense-detail': (4, 100),
+    # Connecting to the stream: session, user, roles, then today's route
+    # totals for the first subscriber. Later events cost no per-viewer queries.
+    'live-revenues': (4, 100),
+}
+
+
+def _requests(fleet):
+    """
+    url name -> (method, path, body) for one representative call per route.
+    """
+    month = f'start={START}&end={TODAY}'
+    return {
+        'manager-list': ('get', '/managers/', None),
+        'manager-detail': ('get', f"/managers/{fleet['manager']}/", None),
+        'driver-list': ('get', '/drivers/', None),
+        'driver-detail': ('get', f"/drivers/{fleet['driver']}/", None),
+        'conductor-list': ('get', '/conductors/', None),
+        'conductor-detail': ('get', f"/conductors/{fleet['conductor']}/", None),
+        'matatu-list': ('get', '/matatus/', None),
+        'matatu-detail': ('get', f"/matatus/{fleet['matatu']}/", None),
+        'route-list': ('get', '/routes/', None),
+        'route-detail': ('get', f"/routes/{fleet['route']}/", None),
+        'route-revenue-list': ('get', '/routes/revenues/', None),
+        'revenue-list': ('get', '/revenues/', None),
+        'revenue-detail': ('get', f"/revenues/{fleet['revenue']}/", None),
+        'revenue-bulk': ('post', '/revenues/bulk/', {
+            'records': [
+                {'matatu': pk, 'amount_collected': '3500.00'} for pk in fleet['matatus'][:500]
+            ],
+        }),
+        'expense-list': ('get', '/expenses/', None),
+        'expense-detail': ('get', f"/expenses/{fleet['expense']}/", None),
+        'expense-category-list': ('get', '/expenses/categories/', None),
+        'payment-list': ('get', '/payments/', None),
+        'export': ('get', f'/exports/revenues/?{month}&file_format=csv', None),
+        'profit-and-loss': ('get', f'/analytics/profit-and-loss/?period=month&{month}', None),
+        'expense-breakdown': ('get', f'/analytics/expense-breakdown/?by=route&{month}', None),
+        'licence-expiring': ('get', '/licences/expiring/?days=30', None),
+        'job-list': ('get', '/jobs/', None),
+        'job-detail': ('get', f"/jobs/{fleet['job']}/", None),
+        # A client that synced just now: the steady-state poll with nothing new.
+        'sync': ('get', f"/sync/?token={sync.make_token(now() + sync.overlap())}", None),
+        'async-route-list': ('get', '/async/routes/', None),
+        'async-route-detail': ('get', f"/async/routes/{fleet['route']}/", None),
+        'async-matatu-list': ('get', '/async/matatus/', None),
+        'async-matatu-detail': ('get', f"/async/matatus/{fleet['matatu']}/", None),
+        'async-revenue-list': ('get', '/async/revenues/', None),
+        'async-revenue-detail': ('get', f"/async/revenues/{fleet['revenue']}/", None),
+        'async-expense-list': ('get', '/async/expenses/', None),
+        'async-expense-detail': ('get', f"/async/expenses/{fleet['expense']}/", None),
+        'live-revenues': ('get', '/live/revenues/', None),
+    }
+
+
+def seed_fleet():
+    fleetgen.generate(
+        owners=max(MATATUS // 5, 1), matatus=MATATUS, routes=max(MATATUS // 50, 1), days=DAYS, end=TODAY,
+        prefix='bench',
+    )
+    matatus = list(Matatu.objects.order_by('pk').values_list('pk', flat=True))
+
+    admin = User.objects.create_superuser(username='bench-admin', password='x', role='admin')
+    admin.groups.add(Group.objects.get(name='Manager'))
+    manager = Manager.objects.create(user=admin, phone_number='0733000000')
+    manager.assigned_matatus.set(matatus[:50])
+
+    return {
+        'admin': admin,
+        'manager': manager.pk,
+        'driver': Driver.objects.values_list('pk', flat=True).first(),
+        'conductor': Conductor.objects.values_list('pk', flat=True).first(),
+        'matatu': matatus[0],
+        'matatus': matatus,
+        'route': Route.objects.values_list('pk', flat=True).first(),
+        'revenue': Revenue.objects.values_list('pk', flat=True).first(),
+        'expense': Expense.objects.values_list('pk', flat=True).first(),
+        'job': Job.objects.create(task='licence_expiry_digest', created_by=admin).pk,
+    }
+
+
+@pytest.fixture(scope='module')
+def fleet(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        fleet = seed_fleet()
+        yield fleet
+        call_command('flush', interactive=False, verbosity=0)
+
+
+@pytest.fixture(scope='module')
+def results():
+    results = {}
+    yield results
+    if not OUTPUT:
+        return
+    with open(OUTPUT, 'w') as output:
+        json.dump({
+            'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'fleet': {'matatus': MATATUS, 'days': DAYS},
+            'runs': RUNS if TIMINGS else 0,
+            'endpoints': results,
+        }, output, indent=2, sort_keys=True)
+
+
+def _clear_caches():
+    for cache in caches.all():
+        cache.clear()
+
+
+def _call(client, method, path, body):
+    if client.__class__ is AsyncClient:
+        return async_to_sync(_first_event)(client, path)
+    response = getattr(client, method)(path, body, format='json') if body else getattr(client, method)(path)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+async def _first_event(client, path):
+    """
+    Open an event stream, read its first event and disconnect.
+    """
+    response = await client.get(path)
+    events = aiter(response.streaming_content)
+    await anext(events)
+    await events.aclose()
+    live.feed.producer.cancel()
+    return response
+
+
+def test_every_route_has_a_budget():
+    names = {pattern.name for pattern in get_resolver(urls).url_patterns}
+    assert names == set(BUDGETS)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', sorted(BUDGETS))
+def test_endpoint_budget(name, fleet, results):
+    method, path, body = _requests(fleet)[name]
+    max_queries, max_ms = BUDGETS[name]
+    client = AsyncClient() if name.startswith('live-') else APIClient()
+    if name.startswith(('async-', 'live-')):
+        # The async views read the user from the session, not from DRF.
+        client.force_login(fleet['admin'])
+    else:
+        # A fresh instance, so the role lookup is paid as on a real request.
+        client.force_authenticate(User.objects.get(pk=fleet['admin'].pk))
+
+    _clear_caches()
+    with CaptureQueriesContext(connection) as queries:
+        response = _call(client, method, path, body)
+    assert response.status_code == 200, response.content[:500]
+    # Later requests reset the query log, so keep the captured queries now.
+    captured = [query['sql'] for query in queries.captured_queries]
+
+    results[name] = {
+        'path': path,
+        'method': method.upper(),
+        'queries': len(captured),
+        'query_budget': max_queries,
+    }
+    assert len(captured) <= max_queries, captured
+    if not TIMINGS:
+        return
+
+    timings = []
+    for _ in range(RUNS):
+        _clear_caches()
+        started = time.perf_counter()
+        _call(client, method, path, body)
+        timings.append((time.perf_counter() - started) * 1000)
+    results[name].update({
+        'median_ms': round(statistics.median(timings), 2),
+        'max_ms': round(max(timings), 2),
+        'latency_budget_ms': max_ms,
+    })
+    assert statistics.median(timings) <= max_ms
+
+
+@timed
+@pytest.mark.django_db
+@pytest.mark.parametrize('serializer_class', [RevenueSerializer, ExpenseSerializer])
+def test_read_fast_path_throughput(serializer_class, fleet, results):
+    queryset = serializer_class.Meta.model.objects.order_by('-date', '-id')[:5000]
+    representation = fastpath.representation_for(serializer_class)
+
+    def serializer_path():
+        return serializer_class(queryset, many=True).data
+
+    def fast_path():
+        return representation.represent(representation.values(queryset))
+
+    throughput = {}
+    for name, build in (('serializer', serializer_path), ('fast_path', fast_path)):
+        timings = []
+        for _ in range(RUNS):
+            started = time.perf_counter()
+            rows = len(build())
+            timings.append(time.perf_counter() - started)
+        throughput[name] = round(rows / statistics.median(timings))
+
+    results[f'fast-path-{serializer_class.Meta.model._meta.model_name}'] = {
+        'rows': rows,
+        'rows_per_second': throughput,
+        'speedup': round(throughput['fast_path'] / throughput['serializer'], 2),
+    }
+    assert throughput['fast_path'] > throughput['serializer']
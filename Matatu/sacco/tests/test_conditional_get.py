@@ -0,0 +1,29 @@
+import pytest
+from django.contrib.auth.models import Group
+from rest_framework.test import APIClient
+
+from sacco.models import Route, User
+
+
+@pytest.mark.django_db
+def test_unchanged_routes_answer_304_from_the_version_table(
+        django_assert_num_queries, django_capture_on_commit_callbacks):
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    client = APIClient()
+    client.force_authenticate(user)
+    Route.objects.create(name='Thika Road')
+
+    response = client.get('/routes/')
+    etag = response['ETag']
+    assert response.status_code == 200 and 'Last-Modified' in response
+
+    # Roles and the response come from the caches; only the version is read.
+    with django_assert_num_queries(1):
+        response = client.get('/routes/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Route.objects.create(name='Mombasa Road')
+    response = client.get('/routes/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200 and response['ETag'] != etag
@@ -0,0 +1,165 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from sacco import archive
+from sacco.models import ArchivedExpense, Expense, ExpenseCategory, Manager, Matatu, MatatuOwner, Route, User
+
+START = datetime.date(2024, 3, 1)
+BEFORE_CATEGORIES = [('sacco', '0012_expense_category')]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_migration_folds_spellings_into_one_category():
+    executor = MigrationExecutor(connection)
+    executor.migrate(BEFORE_CATEGORIES)
+    apps = executor.loader.project_state(BEFORE_CATEGORIES).apps
+    owner = apps.get_model('sacco', 'MatatuOwner').objects.create(
+        user=apps.get_model('sacco', 'User').objects.create(username='owner'), phone_number='0700000000',
+    )
+    matatu = apps.get_model('sacco', 'Matatu').objects.create(
+        registration_number='KBX001', capacity=14, owner=owner, licence_expiry_date=datetime.date(2030, 1, 1),
+    )
+    for expense_type in ['Fuel', 'fuel ', 'Fuel', ' FUEL', 'Car  wash']:
+        apps.get_model('sacco', 'Expense').objects.create(
+            matatu=matatu, expense_type=expense_type, amount=Decimal('100.00'), date=START,
+        )
+    apps.get_model('sacco', 'ArchivedExpense').objects.create(
+        id=1000, matatu=matatu, expense_type='car wash', amount=Decimal('100.00'), date=START,
+        updated_at=datetime.datetime(2024, 3, 1, tzinfo=datetime.timezone.utc),
+    )
+
+    executor = MigrationExecutor(connection)
+    executor.migrate(executor.loader.graph.leaf_nodes())
+
+    assert list(ExpenseCategory.objects.values_list('name', 'key')) == [('Car wash', 'car wash'), ('Fuel', 'fuel')]
+    fuel = ExpenseCategory.objects.get(key='fuel')
+    assert Expense.objects.filter(category=fuel).count() == 4
+    assert ArchivedExpense.objects.get().category.name == 'Car wash'
+
+
+@pytest.fixture
+def manager(db):
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+    return user
+
+
+@pytest.fixture
+def matatus(db):
+    routes = [Route.objects.create(name='Thika Road'), Route.objects.create(name='Jogoo Road')]
+    owners = [
+        MatatuOwner.objects.create(
+            user=User.objects.create_user(username=f'owner{n}', password='x', role='owner'),
+            phone_number=f'070000000{n}',
+        )
+        for n in range(2)
+    ]
+    return [
+        Matatu.objects.create(registration_number=f'KB{n:03d}', route=routes[n % 2], capacity=14,
+                              owner=owners[n // 2], licence_expiry_date=datetime.date(2030, 1, 1))
+        for n in range(3)
+    ]
+
+
+def test_expenses_can_name_their_category(manager, matatus):
+    client = APIClient()
+    client.force_authenticate(manager)
+    fuel = ExpenseCategory.resolve('Fuel')
+
+    response = client.post('/expenses/', {'matatu': matatus[0].pk, 'expense_type': ' FUEL ', 'amount': '900.00'})
+    assert response.status_code == 201, response.content
+    assert response.json()['category'] == fuel.pk
+    assert 'expense_type' not in response.json()
+
+    response = client.post('/expenses/', {'matatu': matatus[0].pk, 'category': fuel.pk, 'amount': '100.00'})
+    assert response.status_code == 201
+    assert client.post('/expenses/', {'matatu': matatus[0].pk, 'amount': '100.00'}).status_code == 400
+    assert client.post('/expenses/', {'matatu': matatus[0].pk, 'expense_type': ' ', 'amount': '1'}).status_code == 400
+
+    client.post('/expenses/', {'matatu': matatus[0].pk, 'expense_type': 'Car  wash', 'amount': '200.00'})
+    assert [row['name'] for row in client.get('/expenses/categories/').json()] == ['Car wash', 'Fuel']
+
+
+def test_refused_writes_and_crews_add_no_categories(manager, matatus):
+    fuel = ExpenseCategory.resolve('Fuel')
+    profile = manager.manager_profile
+    profile.sacco_wide = False
+    profile.save()
+    profile.assigned_matatus.set(matatus[:1])
+    client = APIClient()
+    client.force_authenticate(manager)
+
+    # Refused for the fleet only after validation passed.
+    response = client.post('/expenses/', {'matatu': matatus[1].pk, 'expense_type': 'Parking', 'amount': '50.00'})
+    assert response.status_code == 403
+    assert list(ExpenseCategory.objects.values_list('name', flat=True)) == ['Fuel']
+
+    driver = User.objects.create_user(username='driver', password='x', role='driver')
+    driver.groups.add(Group.objects.create(name='Driver'))
+    client.force_authenticate(driver)
+    response = client.post('/expenses/', {'matatu': matatus[0].pk, 'expense_type': 'Fule', 'amount': '50.00'})
+    assert response.status_code == 400 and 'expense_type' in response.json()
+    assert not Expense.objects.exists()
+    response = client.post('/expenses/', {'matatu': matatus[0].pk, 'expense_type': 'fuel', 'amount': '50.00'})
+    assert response.status_code == 201 and response.json()['category'] == fuel.pk
+    assert ExpenseCategory.objects.count() == 1
+
+    # A manager may rename an expense's category to a new one.
+    client.force_authenticate(manager)
+    expense = Expense.objects.get()
+    response = client.patch(f'/expenses/{expense.pk}/', {'expense_type': 'Parking'})
+    assert response.status_code == 200
+    assert Expense.objects.get().category.name == 'Parking'
+
+
+def test_breakdown_groups_hot_and_archived_expenses(manager, matatus):
+    fuel, parking = ExpenseCategory.resolve('Fuel'), ExpenseCategory.resolve('Parking')
+    for day in range(4):
+        date = START + datetime.timedelta(days=day)
+        for matatu in matatus:
+            Expense.objects.create(matatu=matatu, category=fuel, amount=Decimal('1000.00'), date=date)
+        Expense.objects.create(matatu=matatus[0], category=parking, amount=Decimal('50.00'), date=date)
+    archive.archive(START + datetime.timedelta(days=2))
+    client = APIClient()
+    client.force_authenticate(manager)
+    query = 'start=2024-03-01&end=2024-03-31'
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(f'/analytics/expense-breakdown/?by=route&{query}')
+    assert response.status_code == 200
+    # Roles, fleet, table versions, the archive checks, hot and archived
+    # group-bys, category names.
+    assert len(queries) <= 8
+    route = matatus[0].route_id
+    assert [(row['route'], row['name'], row['total'], row['count']) for row in response.json()['results']] == [
+        (route, 'Fuel', '8000.00', 8),
+        (route, 'Parking', '200.00', 4),
+        (matatus[1].route_id, 'Fuel', '4000.00', 4),
+    ]
+
+    rows = client.get(f'/analytics/expense-breakdown/?by=owner&matatu={matatus[2].pk}&{query}').json()['results']
+    assert [(row['owner'], row['category'], row['total']) for row in rows] == [
+        (matatus[2].owner_id, fuel.pk, '4000.00'),
+    ]
+    assert client.get('/analytics/expense-breakdown/?by=colour&start=2024-03-01&end=2024-03-31').status_code == 400
+
+
+def test_owners_only_see_their_own_breakdown(matatus):
+    owner = matatus[2].owner
+    owner.user.groups.add(Group.objects.create(name='Matatu Owner'))
+    fuel = ExpenseCategory.resolve('Fuel')
+    for matatu in matatus:
+        Expense.objects.create(matatu=matatu, category=fuel, amount=Decimal('1000.00'), date=START)
+    client = APIClient()
+    client.force_authenticate(owner.user)
+
+    rows = client.get('/analytics/expense-breakdown/?start=2024-03-01&end=2024-03-01').json()['results']
+    assert [(row['matatu'], row['total']) for row in rows] == [(matatus[2].pk, '1000.00')]
@@ -0,0 +1,120 @@
+import csv
+import datetime
+import io
+import json
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import Group
+from rest_framework.test import APIClient
+
+from sacco import exports
+from sacco.models import Expense, ExpenseCategory, Manager, Matatu, MatatuOwner, Payment, Revenue, Route, User
+
+START = datetime.date(2024, 3, 1)
+RANGE = 'start=2024-03-01&end=2024-03-31'
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def manager(db):
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+    return user
+
+
+@pytest.fixture
+def matatu(db):
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'), phone_number='0700000000',
+    )
+    matatu = Matatu.objects.create(
+        registration_number='KBC123A', route=Route.objects.create(name='Thika Road'), capacity=14,
+        owner=owner, licence_expiry_date=datetime.date(2030, 1, 1),
+    )
+    for day in (2, 0, 1):
+        Revenue.objects.create(matatu=matatu, amount_collected=Decimal(3000 + day),
+                               date=START + datetime.timedelta(days=day))
+    # Outside the range.
+    Revenue.objects.create(matatu=matatu, amount_collected=Decimal('9999.00'), date=datetime.date(2024, 4, 1))
+    return matatu
+
+
+def content(response):
+    return b''.join(response.streaming_content).decode('utf-8')
+
+
+def test_csv_export_streams_the_range_in_date_order(manager, matatu):
+    response = client_for(manager).get(f'/exports/revenues/?{RANGE}')
+
+    assert response.status_code == 200 and response.streaming
+    assert response['Content-Type'] == 'text/csv'
+    assert response['Content-Disposition'] == 'attachment; filename="revenues-2024-03-01-2024-03-31.csv"'
+    rows = list(csv.reader(io.StringIO(content(response))))
+    assert rows[0] == ['id', 'matatu', 'amount_collected', 'date', 'logged_by']
+    assert [(row[2], row[3]) for row in rows[1:]] == [
+        ('3000.00', '2024-03-01'), ('3001.00', '2024-03-02'), ('3002.00', '2024-03-03'),
+    ]
+
+
+def test_ndjson_export_writes_one_object_per_line(manager, matatu):
+    Expense.objects.create(matatu=matatu, category=ExpenseCategory.resolve('Fuel'), amount=Decimal('900.00'),
+                           description='Full tank', date=START)
+
+    response = client_for(manager).get(f'/exports/expenses/?{RANGE}&file_format=ndjson')
+
+    assert response['Content-Type'] == 'application/x-ndjson'
+    lines = content(response).splitlines()
+    assert [json.loads(line) for line in lines] == [{
+        'id': Expense.objects.get().pk, 'matatu': matatu.pk, 'expense_type': 'Fuel', 'amount': '900.00',
+        'description': 'Full tank', 'date': '2024-03-01', 'logged_by': None,
+    }]
+
+
+@pytest.mark.parametrize('query', [
+    'start=2024-03-31&end=2024-03-01',
+    'start=2024-03-01',
+    'start=March&end=2024-03-31',
+    f'{RANGE}&file_format=xlsx',
+])
+def test_invalid_queries_are_refused(manager, query):
+    assert client_for(manager).get(f'/exports/revenues/?{query}').status_code == 400
+
+
+def test_unknown_resources_are_not_found(manager):
+    assert client_for(manager).get(f'/exports/users/?{RANGE}').status_code == 404
+
+
+def test_only_managers_may_export(matatu):
+    owner = matatu.owner.user
+    owner.groups.add(Group.objects.create(name='Matatu Owner'))
+
+    assert client_for(owner).get(f'/exports/revenues/?{RANGE}').status_code == 403
+    assert APIClient().get(f'/exports/revenues/?{RANGE}').status_code in (401, 403)
+
+
+def test_rows_stream_across_chunk_boundaries(manager):
+    receivers = [
+        User.objects.create_user(username=f'driver{n}', password='x', role='driver') for n in range(3)
+    ]
+    count = 2 * exports.CHUNK_SIZE + 1
+    Payment.objects.bulk_create(
+        Payment(receiver=receivers[n % 3], amount=Decimal('100.00'), payment_type='Salary',
+                date=START + datetime.timedelta(days=n % 28))
+        for n in range(count)
+    )
+
+    chunks = list(client_for(manager).get(f'/exports/payments/?{RANGE}').streaming_content)
+
+    # The header and the rows, a chunk at a time, with no line split between chunks.
+    assert len(chunks) == 3
+    assert all(chunk.endswith(b'\r\n') for chunk in chunks)
+    rows = list(csv.reader(io.StringIO(b''.join(chunks).decode('utf-8'))))[1:]
+    expected = Payment.objects.order_by('date', 'id').values_list('id', flat=True)
+    assert [int(row[0]) for row in rows] == list(expected)
@@ -0,0 +1,33 @@
+import datetime
+
+import pytest
+from rest_framework.renderers import JSONRenderer
+
+from sacco.fastpath import representation_for
+from sacco.models import Expense, ExpenseCategory, Matatu, MatatuOwner, Revenue, User
+from sacco.serializers import ExpenseSerializer, RevenueSerializer
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('model, serializer_class', [
+    (Revenue, RevenueSerializer),
+    (Expense, ExpenseSerializer),
+])
+def test_fast_path_renders_the_same_bytes_as_the_serializer(model, serializer_class):
+    user = User.objects.create_user(username='conductor', password='x', role='conductor')
+    owner = MatatuOwner.objects.create(user=user, phone_number='0700000000')
+    matatu = Matatu.objects.create(registration_number='KBX001', capacity=14, owner=owner,
+                                   licence_expiry_date=datetime.date(2030, 1, 1))
+    Revenue.objects.create(matatu=matatu, amount_collected='1500.5', logged_by=user)
+    Revenue.objects.create(matatu=matatu, amount_collected=900, date=datetime.date(2024, 1, 1))
+    Expense.objects.create(matatu=matatu, category=ExpenseCategory.resolve('Fuel'), amount='3000',
+                           description='Full tank')
+    Expense.objects.create(matatu=matatu, category=ExpenseCategory.resolve('Service'), amount='12.34',
+                           logged_by=user)
+
+    queryset = model.objects.order_by('-date', '-id')
+    representation = representation_for(serializer_class)
+    renderer = JSONRenderer()
+
+    assert renderer.render(representation.represent(representation.values(queryset))) == \
+        renderer.render(serializer_class(queryset, many=True).data)
@@ -0,0 +1,177 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import AsyncClient
+from rest_framework.test import APIClient
+
+from sacco import archive, filters
+from sacco.models import (
+    ArchivedExpense,
+    ArchivedRevenue,
+    Expense,
+    ExpenseCategory,
+    Manager,
+    Matatu,
+    MatatuOwner,
+    Payment,
+    Revenue,
+    Route,
+    User,
+)
+
+START = datetime.date(2024, 3, 1)
+
+
+@pytest.fixture
+def manager(db):
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+    return user
+
+
+@pytest.fixture
+def client(manager):
+    client = APIClient()
+    client.force_authenticate(manager)
+    return client
+
+
+@pytest.fixture
+def matatus(db):
+    matatus = []
+    for n in range(3):
+        owner = MatatuOwner.objects.create(
+            user=User.objects.create_user(username=f'owner{n}', password='x', role='owner'),
+            phone_number=f'070000000{n}',
+        )
+        matatus.append(Matatu.objects.create(
+            registration_number=f'KB{n:03d}', route=Route.objects.get_or_create(name=f'Route {n % 2}')[0],
+            capacity=14, owner=owner, licence_expiry_date=datetime.date(2030, 1, 1),
+        ))
+    fuel, parking = ExpenseCategory.resolve('Fuel'), ExpenseCategory.resolve('Parking')
+    for day in range(4):
+        date = START + datetime.timedelta(days=day)
+        for matatu in matatus:
+            Revenue.objects.create(matatu=matatu, amount_collected=Decimal('3000.00'), date=date)
+            Expense.objects.create(matatu=matatu, category=fuel, amount=Decimal('1000.00'), date=date)
+            Expense.objects.create(matatu=matatu, category=parking, amount=Decimal('50.00'), date=date)
+    return matatus
+
+
+def results(client, path):
+    response = client.get(path)
+    assert response.status_code == 200, response.content
+    return response.json()['results']
+
+
+def test_revenue_and_expense_lists_filter_hot_and_archived_rows(client, manager, matatus):
+    first, second, third = matatus
+    # Everything before the second day moves to the archive tables.
+    archive.archive(START + datetime.timedelta(days=1))
+
+    rows = results(client, f'/revenues/?matatu={first.pk}')
+    assert {row['matatu'] for row in rows} == {first.pk} and len(rows) == 4
+
+    rows = results(client, f'/revenues/?route={first.route_id}&start=2024-03-01&end=2024-03-02')
+    assert {row['matatu'] for row in rows} == {first.pk, third.pk} and len(rows) == 4
+
+    parking = ExpenseCategory.objects.get(name='Parking')
+    rows = results(client, f'/expenses/?owner={second.owner_id}&category={parking.pk}')
+    assert [(row['matatu'], row['category']) for row in rows] == [(second.pk, parking.pk)] * 4
+    assert [row['date'] for row in rows] == ['2024-03-04', '2024-03-03', '2024-03-02', '2024-03-01']
+
+    fuel = ExpenseCategory.objects.get(name='Fuel').pk
+
+    async def async_rows():
+        client = AsyncClient()
+        await client.aforce_login(manager)
+        response = await client.get(f'/async/expenses/?matatu={first.pk}&category={fuel}&end=2024-03-02')
+        return response.json()['results']
+
+    rows = async_to_sync(async_rows)()
+    assert [(row['matatu'], row['date']) for row in rows] == [(first.pk, '2024-03-02'), (first.pk, '2024-03-01')]
+
+
+def test_large_matatu_sets_are_read_in_one_query(client, matatus, monkeypatch):
+    first, _, third = matatus
+    path = f'/revenues/?route={first.route_id}&page_size=5'
+    merged = [(row['matatu'], row['date']) for row in results(client, path)]
+
+    monkeypatch.setattr(filters, 'MAX_MERGED_MATATUS', 1)
+    assert [(row['matatu'], row['date']) for row in results(client, path)] == merged
+    assert {matatu for matatu, _ in merged} == {first.pk, third.pk} and len(merged) == 5
+
+
+def test_other_lists_filter(client, matatus):
+    first = matatus[0]
+    driver = User.objects.create_user(username='driver', password='x', role='driver')
+    Payment.objects.create(receiver=driver, amount=Decimal('400.00'), payment_type='Commission', date=START)
+    Payment.objects.create(receiver=driver, amount=Decimal('700.00'), payment_type='Daily Rate', date=START)
+    Payment.objects.create(receiver=first.owner.user, amount=Decimal('700.00'), payment_type='Daily Rate',
+                           date=START)
+
+    assert [row['registration_number'] for row in results(client, f'/matatus/?route={first.route_id}')] \
+        == ['KB002', 'KB000']
+    assert len(results(client, f'/matatus/?owner={first.owner_id}')) == 1
+    assert [row['amount'] for row in results(client, f'/payments/?receiver={driver.pk}&payment_type=Commission')] \
+        == ['400.00']
+    assert len(results(client, '/payments/?payment_type=Daily%20Rate')) == 2
+    assert results(client, '/payments/?start=2024-03-02') == []
+
+
+@pytest.mark.parametrize('query', ['matatu=abc', 'matatu=0', 'start=2024-03-05&end=2024-03-01', 'start=yesterday'])
+def test_invalid_filters_are_rejected(client, manager, matatus, query):
+    assert client.get(f'/revenues/?{query}').status_code == 400
+
+    async def status():
+        client = AsyncClient()
+        await client.aforce_login(manager)
+        return (await client.get(f'/async/revenues/?{query}')).status_code
+
+    assert async_to_sync(status)() == 400
+
+
+@pytest.mark.skipif(connection.vendor != 'sqlite', reason='Reads the SQLite query plan.')
+@pytest.mark.parametrize('model, lookup, index', [
+    (Expense, {'matatu_id': 1}, 'expense_matatu_date_idx'),
+    (Expense, {'category_id': 1}, 'expense_category_date_idx'),
+    (Payment, {'receiver_id': 1}, 'payment_receiver_date_idx'),
+    (Payment, {'payment_type': 'Commission'}, 'payment_type_date_idx'),
+])
+def test_filtered_pages_are_index_scans_in_page_order(db, model, lookup, index):
+    queryset = model.objects.filter(**lookup, date__gte=START).order_by('-date', '-id')[:51]
+    plan = queryset.explain()
+
+    assert index in plan
+    # Rows come out of the index in page order; nothing is sorted.
+    assert 'TEMP B-TREE' not in plan
+
+
+@pytest.mark.skipif(connection.vendor != 'sqlite', reason='Reads the SQLite query plan.')
+@pytest.mark.parametrize('model, filter_fields', [
+    (Revenue, filters.MATATU_FILTERS),
+    (ArchivedRevenue, filters.MATATU_FILTERS),
+    (Expense, filters.EXPENSE_FILTERS),
+    (ArchivedExpense, filters.EXPENSE_FILTERS),
+])
+def test_every_revenue_and_expense_filter_reads_in_page_order(matatus, model, filter_fields):
+    first = matatus[0]
+    values = {
+        'matatu': first.pk, 'route': first.route_id, 'owner': first.owner_id, 'start': '2024-03-02',
+        'end': '2024-03-03', 'category': ExpenseCategory.objects.get(name='Fuel').pk,
+    }
+    for name in filter_fields:
+        params = {name: str(values[name])}
+        querysets = filters.partition(
+            [filters.filter_queryset(model.objects.all(), params, filter_fields)],
+            filters.merged_matatus(params, filter_fields),
+        )
+        assert querysets
+        for queryset in querysets:
+            plan = queryset.order_by('-date', '-id')[:51].explain()
+            assert 'INDEX' in plan and 'TEMP B-TREE' not in plan, (name, plan)
@@ -0,0 +1,56 @@
+import datetime
+
+import pytest
+from django.contrib.auth import authenticate
+
+from sacco import fleetgen, loadtest, roles, rollups
+from sacco.models import Expense, Manager, Matatu, Payment, Revenue, User
+
+END = datetime.date(2024, 3, 31)
+
+
+def generate(**kwargs):
+    return fleetgen.generate(**{'owners': 3, 'matatus': 6, 'days': 10, 'end': END, **kwargs})
+
+
+@pytest.mark.django_db
+def test_generated_fleet_is_complete_and_consistent():
+    counts = generate()
+
+    assert counts['revenues'] == Revenue.objects.count() == 60
+    assert counts['payments'] == Payment.objects.count() == 120
+    assert counts['expenses'] == Expense.objects.count() >= 60
+    assert Revenue.objects.filter(date__range=(END - datetime.timedelta(days=9), END)).count() == 60
+    assert Matatu.objects.filter(driver__conductor__isnull=False).count() == 6
+    assert Manager.objects.get().assigned_matatus.count() == 6
+    # Rows were inserted without signals; the rollups were rebuilt afterwards.
+    assert rollups.verify() == []
+
+    conductor = authenticate(username='gen-conductor0', password=fleetgen.PASSWORD)
+    assert roles.get_user_roles(conductor) == {roles.CONDUCTOR}
+
+
+@pytest.mark.django_db
+def test_same_seed_same_fleet():
+    generate()
+    first = list(Revenue.objects.order_by('date', 'matatu__registration_number').values_list('amount_collected'))
+    generate(prefix='two')
+    second = list(Revenue.objects.filter(matatu__registration_number__startswith='TWO')
+                  .order_by('date', 'matatu__registration_number').values_list('amount_collected'))
+    assert first == second
+
+
+@pytest.mark.django_db(transaction=True)
+def test_mixed_load_reports_every_endpoint(settings):
+    settings.ALLOWED_HOSTS = [loadtest.HOST]
+    generate(end=None)
+
+    report = loadtest.run_mixed(clients=1, requests=60, prefix='gen-')
+
+    assert report['overall']['requests'] == 60
+    assert report['overall']['errors'] == 0
+    assert sum(row['requests'] for row in report['endpoints']) == 60
+    assert {row['mode'] for row in report['endpoints']} <= {
+        f'{method} {name}' for mix in loadtest.TRAFFIC.values() for _, name, method in mix
+    }
+    assert User.objects.filter(username__startswith='gen-').count() == 3 + 6 + 6 + 1
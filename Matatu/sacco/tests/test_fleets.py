@@ -0,0 +1,193 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group
+from django.core.cache import cache
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from sacco import archive, fleets
+from sacco.models import Expense, ExpenseCategory, Manager, Matatu, MatatuOwner, Revenue, Route, User
+
+START = datetime.date(2024, 3, 1)
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def matatus(db):
+    route = Route.objects.create(name='Thika Road')
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'), phone_number='0700000000',
+    )
+    matatus = [
+        Matatu.objects.create(registration_number=f'KB{n:03d}', route=route, capacity=14, owner=owner,
+                              licence_expiry_date=datetime.date(2030, 1, 1))
+        for n in range(4)
+    ]
+    fuel = ExpenseCategory.resolve('Fuel')
+    for matatu in matatus:
+        Revenue.objects.create(matatu=matatu, amount_collected=Decimal('3000.00'), date=START)
+        Expense.objects.create(matatu=matatu, category=fuel, amount=Decimal('1000.00'), date=START)
+    return matatus
+
+
+def make_manager(username, matatus=None, sacco_wide=False):
+    user = User.objects.create_user(username=username, password='x', role='manager')
+    user.groups.add(Group.objects.get_or_create(name='Manager')[0])
+    if matatus is not None or sacco_wide:
+        profile = Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=sacco_wide)
+        profile.assigned_matatus.set(matatus or [])
+    return user
+
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+def test_managers_only_see_their_fleet(matatus):
+    client = client_for(make_manager('manager', matatus[:2]))
+    fleet = {matatus[0].pk, matatus[1].pk}
+
+    assert {row['id'] for row in client.get('/matatus/').json()['results']} == fleet
+    assert {row['matatu'] for row in client.get('/revenues/').json()['results']} == fleet
+    assert {row['matatu'] for row in client.get('/expenses/').json()['results']} == fleet
+
+    outside = Revenue.objects.get(matatu=matatus[3])
+    assert client.get(f'/revenues/{outside.pk}/').status_code == 404
+    response = client.post('/revenues/', {'matatu': matatus[3].pk, 'amount_collected': '100.00'})
+    assert response.status_code == 403
+    response = client.post('/revenues/', {'matatu': matatus[0].pk, 'amount_collected': '100.00'})
+    assert response.status_code == 201
+
+    rows = client.get('/analytics/profit-and-loss/?start=2024-03-01&end=2024-03-01').json()['results']
+    assert {row['matatu'] for row in rows} == fleet
+
+    # Managers marked sacco-wide, and superusers, are not scoped.
+    assert len(client_for(make_manager('staff', sacco_wide=True)).get('/matatus/').json()['results']) == 4
+    assert fleets.get_fleet(User.objects.create_superuser(username='admin', password='x', role='admin')) is None
+
+
+def test_archived_rows_and_async_views_are_scoped(matatus):
+    user = make_manager('manager', matatus[:1])
+    archive.archive(START + datetime.timedelta(days=1))
+    client = client_for(user)
+
+    assert [row['matatu'] for row in client.get('/revenues/').json()['results']] == [matatus[0].pk]
+    outside = archive.archived_queryset(Revenue).get(matatu=matatus[1])
+    assert client.get(f'/revenues/{outside.pk}/').status_code == 404
+
+    async def async_rows():
+        client = AsyncClient()
+        await client.aforce_login(user)
+        response = await client.get('/async/expenses/')
+        outside = await client.get(f'/async/matatus/{matatus[1].pk}/')
+        return response.json()['results'], outside.status_code
+
+    rows, outside_status = async_to_sync(async_rows)()
+    assert [row['matatu'] for row in rows] == [matatus[0].pk]
+    assert outside_status == 404
+
+
+def test_empty_fleet_sees_nothing(matatus):
+    client = client_for(make_manager('manager', []))
+
+    assert client.get('/revenues/').json()['results'] == []
+    assert client.get('/analytics/profit-and-loss/?start=2024-03-01&end=2024-03-01').json()['results'] == []
+
+
+def test_managers_without_a_profile_see_nothing(matatus):
+    user = make_manager('manager')
+
+    assert fleets.get_fleet(user) == frozenset()
+    client = client_for(user)
+    assert client.get('/matatus/').json()['results'] == []
+    assert client.get('/revenues/').json()['results'] == []
+    assert client.get(f'/matatus/{matatus[0].pk}/').status_code == 404
+    response = client.post('/revenues/', {'matatu': matatus[0].pk, 'amount_collected': '100.00'})
+    assert response.status_code == 403
+
+
+def test_fleet_is_cached_until_assignments_change(matatus, settings):
+    settings.SACCO_AUTH_CACHE_ALIAS = 'default'
+    user = make_manager('manager', matatus[:1])
+    profile = user.manager_profile
+
+    with CaptureQueriesContext(connection) as queries:
+        assert fleets.get_fleet(User.objects.get(pk=user.pk)) == {matatus[0].pk}
+        assert fleets.get_fleet(User.objects.get(pk=user.pk)) == {matatus[0].pk}
+    # Two user loads, the roles and the fleet: the second call hits the cache.
+    assert len(queries) == 4
+
+    profile.assigned_matatus.add(matatus[2])
+    assert fleets.get_fleet(User.objects.get(pk=user.pk)) == {matatus[0].pk, matatus[2].pk}
+    matatus[0].managers.remove(profile)
+    assert fleets.get_fleet(User.objects.get(pk=user.pk)) == {matatus[2].pk}
+    profile.sacco_wide = True
+    profile.save()
+    assert fleets.get_fleet(User.objects.get(pk=user.pk)) is None
+    profile.delete()
+    assert fleets.get_fleet(User.objects.get(pk=user.pk)) == frozenset()
+
+    # Without a shared cache, each request loads the fleet afresh.
+    settings.SACCO_AUTH_CACHE_ALIAS = None
+    Manager.objects.create(user=user, phone_number='0711111111').assigned_matatus.set(matatus[:1])
+    with CaptureQueriesContext(connection) as queries:
+        assert fleets.get_fleet(User.objects.get(pk=user.pk)) == {matatus[0].pk}
+        assert fleets.get_fleet(User.objects.get(pk=user.pk)) == {matatus[0].pk}
+    assert len([query for query in queries if 'sacco_manager' in query['sql']]) == 2
+
+
+def test_query_count_does_not_grow_with_the_fleet(matatus):
+    small = client_for(make_manager('small', matatus[:1]))
+    large = client_for(make_manager('large', matatus))
+
+    with CaptureQueriesContext(connection) as small_queries:
+        small.get('/revenues/')
+    with CaptureQueriesContext(connection) as large_queries:
+        large.get('/revenues/')
+
+    assert len(small_queries) == len(large_queries)
+    assert ' IN (' in large_queries[-1]['sql']
+
+
+def test_cached_responses_and_etags_differ_per_fleet(matatus):
+    first = client_for(make_manager('first', matatus[:1]))
+    second = client_for(make_manager('second', matatus[1:3]))
+
+    response = first.get('/matatus/')
+    other = second.get('/matatus/')
+    assert response['ETag'] != other['ETag']
+    assert [row['id'] for row in response.json()['results']] == [matatus[0].pk]
+    assert {row['id'] for row in other.json()['results']} == {matatus[1].pk, matatus[2].pk}
+    assert second.get('/matatus/', HTTP_IF_NONE_MATCH=response['ETag']).status_code == 200
+    assert first.get('/matatus/', HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+
+
+def test_bulk_ingest_matatu_detail_and_licences_are_scoped(matatus):
+    client = client_for(make_manager('manager', matatus[:1]))
+
+    response = client.post('/revenues/bulk/', {'records': [
+        {'matatu': matatus[0].pk, 'amount_collected': '100.00'},
+        {'matatu': matatus[3].pk, 'amount_collected': '100.00'},
+    ]}, format='json')
+    assert (response.json()['created'], response.json()['failed']) == (1, 1)
+    assert response.json()['results'][1]['errors'] == {'matatu': ['This matatu is not in your fleet.']}
+    assert not Revenue.objects.filter(matatu=matatus[3]).exclude(date=START).exists()
+
+    assert client.get(f'/matatus/{matatus[0].pk}/').status_code == 200
+    assert client.get(f'/matatus/{matatus[3].pk}/').status_code == 404
+
+    digest = client.get('/licences/expiring/?days=3650').json()
+    assert [row['id'] for row in digest['matatus']] == [matatus[0].pk]
@@ -0,0 +1,132 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+
+from sacco import idempotency
+from sacco.models import Expense, ExpenseCategory, IdempotencyKey, Manager, Matatu, MatatuOwner, Revenue, Route, User
+
+
+@pytest.fixture
+def manager(db):
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+    return user
+
+
+@pytest.fixture
+def client(manager):
+    client = APIClient()
+    client.force_authenticate(manager)
+    return client
+
+
+@pytest.fixture
+def matatu(db):
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'), phone_number='0700000000',
+    )
+    return Matatu.objects.create(
+        registration_number='KBC123A', route=Route.objects.create(name='Thika Road'), capacity=14,
+        owner=owner, licence_expiry_date=datetime.date(2030, 1, 1),
+    )
+
+
+def test_retries_return_the_first_response(client, matatu):
+    data = {'matatu': matatu.pk, 'amount_collected': '3000.00'}
+    first = client.post('/revenues/', data, HTTP_IDEMPOTENCY_KEY='abc')
+    assert first.status_code == 201
+
+    with CaptureQueriesContext(connection) as queries:
+        retry = client.post('/revenues/', data, HTTP_IDEMPOTENCY_KEY='abc')
+    assert retry.status_code == 201
+    assert retry.json() == first.json()
+    assert retry[idempotency.REPLAYED_HEADER] == 'true'
+    # Roles and the key lookup; nothing is validated or written.
+    assert len(queries) <= 2
+    assert Revenue.objects.count() == 1
+
+    # Without a key, the duplicate is refused as before.
+    assert client.post('/revenues/', data).status_code == 400
+
+
+def test_expense_retries_are_not_duplicated(client, matatu):
+    ExpenseCategory.resolve('Fuel')
+    data = {'matatu': matatu.pk, 'expense_type': 'Fuel', 'amount': '900.00'}
+    for _ in range(3):
+        assert client.post('/expenses/', data, HTTP_IDEMPOTENCY_KEY='fuel-1').status_code == 201
+    assert Expense.objects.count() == 1
+
+    assert client.post('/expenses/', data, HTTP_IDEMPOTENCY_KEY='fuel-2').status_code == 201
+    assert Expense.objects.count() == 2
+
+
+def test_reused_failed_and_running_keys(client, matatu):
+    data = {'matatu': matatu.pk, 'amount_collected': '3000.00'}
+    client.post('/revenues/', data, HTTP_IDEMPOTENCY_KEY='abc')
+    other = {'matatu': matatu.pk, 'amount_collected': '4000.00'}
+    assert client.post('/revenues/', other, HTTP_IDEMPOTENCY_KEY='abc').status_code == 422
+
+    # A failed request releases its key so a corrected one can use it.
+    assert client.post('/revenues/', {'matatu': matatu.pk}, HTTP_IDEMPOTENCY_KEY='def').status_code == 400
+    assert not IdempotencyKey.objects.filter(key='def').exists()
+
+    # The first request with the key has not stored its response yet.
+    IdempotencyKey.objects.filter(key='abc').update(status_code=None, response_body=None)
+    assert client.post('/revenues/', data, HTTP_IDEMPOTENCY_KEY='abc').status_code == 409
+
+    assert client.post('/revenues/', other, HTTP_IDEMPOTENCY_KEY='x' * 256).status_code == 400
+
+
+def test_abandoned_reservations_are_taken_over(client, manager, matatu, settings):
+    settings.SACCO_IDEMPOTENCY_LEASE_SECONDS = 60
+    data = {'matatu': matatu.pk, 'amount_collected': '3000.00'}
+    # A request reserved the key, then its process died before it committed.
+    client.post('/revenues/', data, HTTP_IDEMPOTENCY_KEY='abc')
+    Revenue.objects.all().delete()
+    IdempotencyKey.objects.update(status_code=None, response_body=None)
+    assert client.post('/revenues/', data, HTTP_IDEMPOTENCY_KEY='abc').status_code == 409
+
+    IdempotencyKey.objects.update(created_at=now() - datetime.timedelta(seconds=61))
+    response = client.post('/revenues/', data, HTTP_IDEMPOTENCY_KEY='abc')
+    assert response.status_code == 201 and idempotency.REPLAYED_HEADER not in response
+    assert client.post('/revenues/', data, HTTP_IDEMPOTENCY_KEY='abc')[idempotency.REPLAYED_HEADER] == 'true'
+    assert Revenue.objects.count() == 1
+
+    # Taking a reservation over renews its lease.
+    IdempotencyKey.objects.create(
+        user=manager, key='def', request_hash='0' * 64, created_at=now() - datetime.timedelta(seconds=61),
+    )
+    assert idempotency.begin(manager, 'def', 'a' * 64) is None
+    with pytest.raises(idempotency.KeyInUse):
+        idempotency.begin(manager, 'def', 'a' * 64)
+
+
+def test_keys_are_per_user_and_expire(client, matatu):
+    data = {'matatu': matatu.pk, 'amount_collected': '3000.00'}
+    client.post('/revenues/', data, HTTP_IDEMPOTENCY_KEY='abc')
+
+    other = User.objects.create_user(username='other', password='x', role='manager')
+    other.groups.add(Group.objects.get(name='Manager'))
+    other_client = APIClient()
+    other_client.force_authenticate(other)
+    response = other_client.post('/revenues/', data, HTTP_IDEMPOTENCY_KEY='abc')
+    assert response.status_code == 400
+    assert idempotency.REPLAYED_HEADER not in response
+
+    IdempotencyKey.objects.update(created_at=now() - datetime.timedelta(hours=25))
+    Revenue.objects.all().delete()
+    response = client.post('/revenues/', data, HTTP_IDEMPOTENCY_KEY='abc')
+    assert response.status_code == 201 and idempotency.REPLAYED_HEADER not in response
+
+    IdempotencyKey.objects.update(created_at=now() - datetime.timedelta(hours=25))
+    call_command('prune_idempotency_keys')
+    assert not IdempotencyKey.objects.exists()
+    assert Revenue.objects.get().amount_collected == Decimal('3000.00')
@@ -0,0 +1,51 @@
+import datetime
+
+import pytest
+from django.contrib.auth.models import Group
+from rest_framework.test import APIClient
+
+from sacco import rollups
+from sacco.models import Manager, Matatu, MatatuOwner, Revenue, Route, User
+
+
+@pytest.fixture
+def client():
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def matatus():
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'),
+        phone_number='0700000000',
+    )
+    route = Route.objects.create(name='Thika Road')
+    return [
+        Matatu.objects.create(registration_number=f'KBX{n}', route=route, capacity=14,
+                              owner=owner, licence_expiry_date=datetime.date(2030, 1, 1))
+        for n in range(3)
+    ]
+
+
+@pytest.mark.django_db
+def test_bulk_ingest_upserts_and_reports_each_row(client, matatus, django_assert_max_num_queries):
+    records = [{'matatu': m.pk, 'amount_collected': '1000'} for m in matatus]
+    records.append({'matatu': 999, 'amount_collected': '10'})
+    records.append({'matatu': matatus[0].pk, 'amount_collected': '-5'})
+
+    body = client.post('/revenues/bulk/', {'records': records}, format='json').json()
+    assert (body['created'], body['updated'], body['failed']) == (3, 0, 2)
+    assert [row['status'] for row in body['results']] == ['created'] * 3 + ['error'] * 2
+
+    resubmit = [{'matatu': m.pk, 'amount_collected': '250'} for m in matatus]
+    with django_assert_max_num_queries(20):
+        body = client.post('/revenues/bulk/', {'records': resubmit, 'policy': 'accumulate'},
+                           format='json').json()
+    assert body['updated'] == 3
+    assert set(Revenue.objects.values_list('amount_collected', flat=True)) == {1250}
+    assert rollups.verify() == []
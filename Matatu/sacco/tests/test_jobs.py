@@ -0,0 +1,173 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+
+from sacco import jobs
+from sacco.models import Job, Manager, Matatu, MatatuOwner, Revenue, Route, User
+
+
+@pytest.fixture
+def manager(db):
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+    return user
+
+
+@pytest.fixture
+def matatu(db):
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'), phone_number='0700000000',
+    )
+    return Matatu.objects.create(
+        registration_number='KBC123A', route=Route.objects.create(name='Thika Road'), capacity=14,
+        owner=owner, licence_expiry_date=datetime.date(2030, 1, 1),
+    )
+
+
+def test_web_requests_only_enqueue(manager, matatu, settings, tmp_path):
+    settings.SACCO_JOB_OUTPUT_DIR = tmp_path
+    Revenue.objects.create(matatu=matatu, amount_collected=Decimal('3000.00'), date=datetime.date(2024, 3, 1))
+    client = APIClient()
+    client.force_authenticate(manager)
+
+    response = client.post('/jobs/', {
+        'task': 'export', 'params': {'resource': 'revenues', 'start': '2024-03-01', 'end': '2024-03-31'},
+    }, format='json')
+    assert response.status_code == 202, response.content
+    assert response.json()['status'] == Job.QUEUED
+    job_id = response.json()['id']
+
+    assert jobs.work(once=True) == 1
+    job = client.get(f'/jobs/{job_id}/').json()
+    assert (job['status'], job['progress'], job['attempts']) == (Job.SUCCEEDED, 100, 1)
+    assert str(tmp_path) not in str(job['result'])
+    with open(jobs.output_path(Job.objects.get(pk=job_id)), encoding='utf-8') as output:
+        assert ',3000.00,2024-03-01' in output.read().splitlines()[1]
+
+    assert client.post('/jobs/', {'task': 'reboot'}, format='json').status_code == 400
+    response = client.post('/jobs/', {'task': 'export', 'params': {'resource': 'revenues', 'start': 'March'}},
+                           format='json')
+    assert 'start' in response.json()['params']
+
+    # Tasks that act on the whole sacco are for superusers only.
+    response = client.post('/jobs/', {'task': 'rebuild_rollups'}, format='json')
+    assert response.status_code == 403
+    response = client.post('/jobs/', {'task': 'owner_statements', 'params': {'month': '2024-03'}}, format='json')
+    assert response.status_code == 403
+
+    # Managers only see the jobs they queued.
+    other = User.objects.create_user(username='other', password='x', role='manager')
+    other.groups.add(Group.objects.get(name='Manager'))
+    client.force_authenticate(other)
+    assert client.get('/jobs/').json()['results'] == []
+    assert client.get(f'/jobs/{job_id}/').status_code == 404
+
+
+def test_failing_jobs_retry_with_backoff(db, monkeypatch, settings):
+    settings.SACCO_JOB_RETRY_SECONDS = 30
+    calls = []
+
+    def flaky(job, days=30, include_expired=False):
+        calls.append(job.attempts)
+        if len(calls) < 3:
+            raise RuntimeError("Database went away.")
+        jobs.report_progress(job, 1, 2, "Halfway.")
+        return {'days': days}
+
+    monkeypatch.setitem(jobs.TASKS, 'licence_expiry_digest', (flaky, jobs.TASKS['licence_expiry_digest'][1]))
+    job = jobs.enqueue('licence_expiry_digest', {'days': 7})
+
+    assert jobs.work(once=True) == 1
+    job.refresh_from_db()
+    assert job.status == Job.QUEUED and 'Database went away.' in job.error
+    assert 25 <= (job.run_at - now()).total_seconds() <= 30
+    # Not due yet.
+    assert jobs.work(once=True) == 0
+
+    Job.objects.update(run_at=now())
+    jobs.work(once=True)
+    job.refresh_from_db()
+    assert 55 <= (job.run_at - now()).total_seconds() <= 60
+
+    Job.objects.update(run_at=now())
+    jobs.work(once=True)
+    job.refresh_from_db()
+    assert (job.status, job.result, job.attempts, job.error) == (Job.SUCCEEDED, {'days': 7}, 3, '')
+    assert calls == [1, 2, 3]
+
+
+def test_jobs_fail_after_their_last_attempt(db, monkeypatch):
+    def broken(job, **params):
+        raise RuntimeError("Still broken.")
+
+    monkeypatch.setitem(jobs.TASKS, 'rebuild_rollups', (broken, jobs.TASKS['rebuild_rollups'][1]))
+    job = jobs.enqueue('rebuild_rollups')
+    for _ in range(job.max_attempts):
+        Job.objects.update(run_at=now())
+        jobs.work(once=True)
+
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == (Job.FAILED, 3)
+    assert job.finished_at is not None
+    # The message only; the traceback is logged.
+    assert job.error == 'RuntimeError: Still broken.'
+
+
+def test_each_job_is_claimed_once(db):
+    first, second = jobs.enqueue('rebuild_rollups'), jobs.enqueue('licence_expiry_digest')
+
+    with CaptureQueriesContext(connection) as queries:
+        claimed = jobs.claim('worker-1')
+    assert claimed.pk == first.pk and claimed.worker == 'worker-1'
+    # One indexed read of the oldest due job and the update that takes it.
+    assert len([query for query in queries if 'sacco_job' in query['sql']]) == 2
+    if connection.features.has_select_for_update_skip_locked:
+        assert any('SKIP LOCKED' in query['sql'] for query in queries)
+
+    assert jobs.claim('worker-2').pk == second.pk
+    assert jobs.claim('worker-3') is None
+    # A worker that read the job just before another took it gets nothing.
+    assert Job.objects.filter(pk=first.pk, status=Job.QUEUED).update(status=Job.RUNNING) == 0
+
+
+def test_jobs_of_dead_workers_are_requeued(db):
+    job = jobs.enqueue('licence_expiry_digest')
+    jobs.claim('gone')
+    Job.objects.update(heartbeat_at=now() - datetime.timedelta(hours=1))
+
+    assert jobs.requeue_stale() == 1
+    assert Job.objects.get().status == Job.QUEUED
+
+    call_command('run_jobs', '--once')
+    job.refresh_from_db()
+    assert (job.status, job.attempts) == (Job.SUCCEEDED, 2)
+    assert set(job.result) >= {'as_of', 'matatus'}
+
+
+def test_rollup_rebuild_reports_progress_per_date_range(matatu, monkeypatch):
+    for month in (1, 2, 3):
+        Revenue.objects.create(matatu=matatu, amount_collected=Decimal('3000.00'), date=datetime.date(2024, month, 1))
+    reports = []
+    report_progress = jobs.report_progress
+
+    def record(job, done, total=100, message=''):
+        reports.append((done, total))
+        report_progress(job, done, total, message)
+
+    monkeypatch.setattr(jobs, 'report_progress', record)
+
+    job = jobs.enqueue('rebuild_rollups')
+    jobs.work(once=True)
+    job.refresh_from_db()
+
+    assert (job.status, job.result['mismatches']) == (Job.SUCCEEDED, [])
+    # 2024-01-01 to 2024-03-01 is two 31-day ranges: two rebuilt, two checked.
+    assert reports[1:] == [(1, 4), (2, 4), (3, 4), (4, 4)]
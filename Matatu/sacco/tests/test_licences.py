@@ -0,0 +1,102 @@
+import datetime
+import io
+import json
+
+import pytest
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+
+from sacco import licences
+from sacco.models import Conductor, Driver, Manager, Matatu, MatatuOwner, Route, User
+
+
+def days_from_today(days):
+    return now().date() + datetime.timedelta(days=days)
+
+
+@pytest.fixture
+def manager(db):
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+    return user
+
+
+@pytest.fixture
+def matatus(db):
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'), phone_number='0700000000',
+    )
+    route = Route.objects.create(name='Thika Road')
+    # Expired yesterday, expires today, on the last day of the window, the day after.
+    return {
+        days: Matatu.objects.create(registration_number=f'KB{days + 1:03d}', route=route, capacity=14,
+                                    owner=owner, licence_expiry_date=days_from_today(days))
+        for days in (-1, 0, 7, 8)
+    }
+
+
+def registrations(digest):
+    return [row['registration_number'] for row in digest['matatus']]
+
+
+def test_the_window_includes_today_and_its_last_day(matatus, django_assert_num_queries):
+    with django_assert_num_queries(3):
+        digest = licences.expiry_digest(7)
+
+    assert registrations(digest) == ['KB001', 'KB008']
+    assert (digest['as_of'], digest['days']) == (now().date(), 7)
+    assert registrations(licences.expiry_digest(0)) == ['KB001']
+
+
+def test_include_expired_adds_lapsed_licences(matatus):
+    assert registrations(licences.expiry_digest(7, include_expired=True)) == ['KB000', 'KB001', 'KB008']
+
+
+def test_drivers_and_conductors_are_listed_with_their_usernames(matatus):
+    driver = Driver.objects.create(
+        user=User.objects.create_user(username='driver', password='x', role='driver'), phone_number='0711111111',
+        assigned_matatu=matatus[8], licence_expiry_date=days_from_today(3),
+    )
+    Conductor.objects.create(
+        user=User.objects.create_user(username='conductor', password='x', role='conductor'),
+        phone_number='0722222222', assigned_driver=driver, licence_expiry_date=days_from_today(30),
+    )
+
+    digest = licences.expiry_digest(7)
+    assert [row['username'] for row in digest['drivers']] == ['driver']
+    assert digest['conductors'] == []
+    assert [row['username'] for row in licences.expiry_digest(30)['conductors']] == ['conductor']
+
+
+def test_command_prints_the_digest(matatus):
+    output = io.StringIO()
+    call_command('licence_expiry_digest', '--days', '7', stdout=output)
+    lines = output.getvalue().splitlines()
+    assert lines[0] == f"Licences expiring within 7 days of {now().date()}:"
+    assert f"  {days_from_today(0)}  KB001" in lines
+    assert f"  {days_from_today(7)}  KB008" in lines
+    assert "Matatus (2)" in lines and "Drivers (0)" in lines
+
+    output = io.StringIO()
+    call_command('licence_expiry_digest', '--days', '7', '--include-expired', '--json', stdout=output)
+    digest = json.loads(output.getvalue())
+    assert [row['registration_number'] for row in digest['matatus']] == ['KB000', 'KB001', 'KB008']
+
+
+def test_endpoint_is_for_managers_only(manager, matatus):
+    client = APIClient()
+    client.force_authenticate(manager)
+    response = client.get('/licences/expiring/?days=7&include_expired=true')
+    assert response.status_code == 200
+    assert registrations(response.json()) == ['KB000', 'KB001', 'KB008']
+    assert client.get('/licences/expiring/?days=3651').status_code == 400
+    assert client.get('/licences/expiring/?days=-1').status_code == 400
+
+    owner = User.objects.get(username='owner')
+    owner.groups.add(Group.objects.create(name='Matatu Owner'))
+    client.force_authenticate(owner)
+    assert client.get('/licences/expiring/').status_code == 403
+    assert APIClient().get('/licences/expiring/').status_code in (401, 403)
@@ -0,0 +1,123 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import Group
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.utils.timezone import now
+
+from sacco import live
+from sacco.models import Expense, ExpenseCategory, Matatu, MatatuOwner, Revenue, Route, User, today
+
+
+@pytest.fixture
+def matatu(db, settings):
+    # Keep the producer asleep; the tests drive polls themselves.
+    settings.SACCO_LIVE_POLL_SECONDS = 60
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'),
+        phone_number='0700000000',
+    )
+    return Matatu.objects.create(
+        registration_number='KBC123A', route=Route.objects.create(name='Thika Road'), capacity=14,
+        owner=owner, licence_expiry_date=datetime.date(2030, 1, 1),
+    )
+
+
+def drain(queue):
+    messages = []
+    while not queue.empty():
+        messages.append(queue.get_nowait())
+    return messages
+
+
+def test_changed_rows_skip_what_the_last_poll_saw(matatu):
+    since = now()
+    revenue = Revenue.objects.create(matatu=matatu, amount_collected=Decimal('3000.00'))
+
+    events, seen = live.changed_rows(since, {})
+    assert [(event, row['id']) for event, row in events] == [('revenue', revenue.pk)]
+
+    # The overlap returns the same row on the next poll; it is not repeated.
+    assert live.changed_rows(since, seen)[0] == []
+
+    revenue.amount_collected = Decimal('3500.00')
+    revenue.save()
+    events, _ = live.changed_rows(since, seen)
+    assert [row['amount_collected'] for _, row in events] == ['3500.00']
+
+
+def test_one_poll_fans_out_to_every_subscriber(matatu):
+    feed = live.Feed()
+
+    async def subscribe():
+        queues = [await feed.subscribe() for _ in range(3)]
+        feed.producer.cancel()
+        return queues
+
+    queues = async_to_sync(subscribe)()
+    snapshots = [drain(queue) for queue in queues]
+    since = now()
+    Revenue.objects.create(matatu=matatu, amount_collected=Decimal('3000.00'))
+    Expense.objects.create(matatu=matatu, category=ExpenseCategory.resolve('Fuel'), amount=Decimal('900.00'))
+
+    with CaptureQueriesContext(connection) as queries:
+        async_to_sync(feed.poll)(since, {})
+    received = [drain(queue) for queue in queues]
+
+    # Revenue, expense and today's route totals: the same for any number of viewers.
+    assert len(queries) == 3
+    assert all(len(messages) == 1 and b'event: route-totals' in messages[0] for messages in snapshots)
+    assert received[0] == received[1] == received[2]
+    events = [message.split(b'\n')[1] for message in received[0]]
+    assert events == [b'event: revenue', b'event: expense', b'event: route-total']
+    assert f'"route": {matatu.route_id}, "date": "{today()}", "total_revenue": "3000.00"'.encode() in received[0][2]
+
+
+def test_slow_subscribers_are_dropped(matatu, monkeypatch):
+    monkeypatch.setattr(live, 'BUFFER', 2)
+    feed = live.Feed()
+
+    async def scenario():
+        slow = await feed.subscribe()
+        for n in range(2):
+            feed.publish(live.message('revenue', {'id': n}))
+        feed.producer.cancel()
+        return slow, drain(slow)
+
+    slow, messages = async_to_sync(scenario)()
+
+    assert messages == [None]
+    assert slow not in feed.subscribers
+
+
+def test_stream_is_for_managers(matatu):
+    manager = User.objects.create_user(username='manager', password='x', role='manager')
+    manager.groups.add(Group.objects.create(name='Manager'))
+    driver = User.objects.create_user(username='driver', password='x', role='driver')
+    Revenue.objects.create(matatu=matatu, amount_collected=Decimal('3000.00'))
+
+    async def first_event(user):
+        client = AsyncClient()
+        await client.aforce_login(user)
+        response = await client.get('/live/revenues/')
+        if not response.streaming:
+            return response, None
+        events = aiter(response.streaming_content)
+        first = await anext(events)
+        await events.aclose()
+        live.feed.producer.cancel()
+        return response, first
+
+    response, _ = async_to_sync(first_event)(driver)
+    assert response.status_code == 403
+
+    response, first = async_to_sync(first_event)(manager)
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'text/event-stream'
+    assert first.startswith(b'event: route-totals\n')
+    assert b'"total_revenue": "3000.00"' in first
+    assert live.feed.subscribers == {}
@@ -0,0 +1,45 @@
+import datetime
+
+import pytest
+from django.contrib.auth.models import Group
+from rest_framework.test import APIClient
+
+from sacco.models import Manager, Matatu, MatatuOwner, Revenue, User
+
+
+@pytest.fixture
+def manager_client():
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.mark.django_db
+def test_revenue_pages_follow_date_then_id(manager_client):
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'),
+        phone_number='0700000000',
+    )
+    today = datetime.date(2024, 6, 30)
+    for day in range(3):
+        for number in range(3):
+            matatu, _ = Matatu.objects.get_or_create(
+                registration_number=f'KBX{number}',
+                defaults={'capacity': 14, 'owner': owner, 'licence_expiry_date': today},
+            )
+            Revenue.objects.create(matatu=matatu, amount_collected=1000,
+                                   date=today - datetime.timedelta(days=day))
+
+    expected = list(Revenue.objects.order_by('-date', '-id').values_list('id', flat=True))
+    seen = []
+    url = '/revenues/?page_size=4'
+    while url:
+        body = manager_client.get(url).json()
+        assert len(body['results']) <= 4
+        seen.extend(row['id'] for row in body['results'])
+        url = body['next']
+
+    assert seen == expected
@@ -0,0 +1,121 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from sacco import archive, payroll
+from sacco.models import (
+    Conductor,
+    Driver,
+    Matatu,
+    MatatuOwner,
+    Payment,
+    PayrollRun,
+    Revenue,
+    Route,
+    User,
+)
+
+START = datetime.date(2024, 3, 1)
+END = datetime.date(2024, 3, 31)
+
+
+def crew_for(matatu, n):
+    driver = Driver.objects.create(
+        user=User.objects.create_user(username=f'driver{n}', password='x', role='driver'),
+        phone_number='0711000000', assigned_matatu=matatu, licence_expiry_date=datetime.date(2030, 1, 1),
+    )
+    conductor = Conductor.objects.create(
+        user=User.objects.create_user(username=f'conductor{n}', password='x', role='conductor'),
+        phone_number='0722000000', assigned_driver=driver, licence_expiry_date=datetime.date(2030, 1, 1),
+    )
+    return driver.user, conductor.user
+
+
+@pytest.fixture
+def matatus(db, settings):
+    settings.SACCO_PAYROLL_RULES = {
+        'driver': {'basis': 'commission', 'rate': '10'},
+        'conductor': {'basis': 'daily', 'rate': '500.00'},
+    }
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'),
+        phone_number='0700000000',
+    )
+    route = Route.objects.create(name='Thika Road')
+    return [
+        Matatu.objects.create(registration_number=f'KB{n:03d}', route=route, capacity=14, owner=owner,
+                              licence_expiry_date=datetime.date(2030, 1, 1))
+        for n in range(3)
+    ]
+
+
+def test_crew_are_paid_from_their_matatus_revenue(matatus):
+    driver, conductor = crew_for(matatus[0], 0)
+    idle_driver, idle_conductor = crew_for(matatus[1], 1)
+    Driver.objects.create(
+        user=User.objects.create_user(username='spare', password='x', role='driver'),
+        phone_number='0711000000', licence_expiry_date=datetime.date(2030, 1, 1),
+    )
+    for day, amount in ((1, '3000.00'), (2, '4000.55'), (15, '2500.00')):
+        Revenue.objects.create(matatu=matatus[0], amount_collected=Decimal(amount), date=START.replace(day=day))
+    # Outside the period.
+    Revenue.objects.create(matatu=matatus[0], amount_collected=Decimal('9999.00'), date=datetime.date(2024, 4, 1))
+
+    run, created = payroll.run(START, END)
+
+    assert created
+    payments = {payment.receiver_id: payment for payment in Payment.objects.filter(payroll_run=run)}
+    assert set(payments) == {driver.pk, conductor.pk}
+    assert payments[driver.pk].amount == Decimal('950.06')
+    assert payments[driver.pk].payment_type == 'Commission'
+    assert payments[conductor.pk].amount == Decimal('1500.00')
+    assert payments[conductor.pk].payment_type == 'Daily Rate'
+    assert payments[conductor.pk].date == END
+
+
+def test_a_period_is_paid_once(matatus, django_assert_num_queries):
+    crew_for(matatus[0], 0)
+    Revenue.objects.create(matatu=matatus[0], amount_collected=Decimal('3000.00'), date=START)
+    first, _ = payroll.run(START, END)
+
+    with django_assert_num_queries(1):
+        again, created = payroll.run(START, END)
+    assert (again, created) == (first, False)
+    assert Payment.objects.count() == 2
+
+    with pytest.raises(ValueError):
+        payroll.run(datetime.date(2024, 3, 15), datetime.date(2024, 4, 14))
+    assert PayrollRun.objects.count() == 1
+
+
+def test_query_count_does_not_grow_with_the_crew(matatus):
+    april = datetime.date(2024, 4, 1), datetime.date(2024, 4, 30)
+    for matatu in matatus:
+        Revenue.objects.create(matatu=matatu, amount_collected=Decimal('3000.00'), date=START)
+        Revenue.objects.create(matatu=matatu, amount_collected=Decimal('3000.00'), date=april[0])
+
+    crew_for(matatus[0], 0)
+    with CaptureQueriesContext(connection) as one_crew:
+        payroll.run(START, END)
+    for n, matatu in enumerate(matatus[1:], start=1):
+        crew_for(matatu, n)
+    with CaptureQueriesContext(connection) as three_crews:
+        payroll.run(*april)
+
+    assert len(three_crews) == len(one_crew)
+    assert Payment.objects.filter(date=april[1]).count() == 6
+
+
+def test_archived_days_are_paid_from_their_summaries(matatus):
+    driver, conductor = crew_for(matatus[0], 0)
+    Revenue.objects.create(matatu=matatus[0], amount_collected=Decimal('3000.00'), date=START)
+    Revenue.objects.create(matatu=matatus[0], amount_collected=Decimal('2000.00'), date=END)
+    archive.archive(datetime.date(2024, 3, 15))
+
+    payroll.run(START, END)
+
+    assert Payment.objects.get(receiver=driver).amount == Decimal('500.00')
+    assert Payment.objects.get(receiver=conductor).amount == Decimal('1000.00')
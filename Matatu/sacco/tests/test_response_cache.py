@@ -0,0 +1,129 @@
+import datetime
+import os
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth.models import Group
+from rest_framework.test import APIClient
+
+from sacco import versions
+from sacco.cache_backends import LRUFileBasedCache
+from sacco.models import Expense, ExpenseCategory, Manager, Matatu, MatatuOwner, Revenue, Route, User
+
+
+def client_for(user):
+    client = APIClient()
+    # A fresh instance, so nothing is memoised on the user between requests.
+    client.force_authenticate(User.objects.get(pk=user.pk))
+    return client
+
+
+@pytest.fixture
+def manager(db):
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+    return user
+
+
+@pytest.fixture
+def matatu(db):
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'),
+        phone_number='0700000000',
+    )
+    return Matatu.objects.create(
+        registration_number='KBC123A', route=Route.objects.create(name='Thika Road'), capacity=14,
+        owner=owner, licence_expiry_date=datetime.date(2030, 1, 1),
+    )
+
+
+@pytest.mark.django_db
+def test_cache_hits_only_read_the_table_versions(manager, matatu, settings, django_assert_num_queries):
+    settings.SACCO_AUTH_CACHE_ALIAS = 'default'
+    client_for(manager).get('/routes/')
+
+    client = client_for(manager)
+    with django_assert_num_queries(1):
+        response = client.get('/routes/')
+    assert response.status_code == 200
+    assert [route['name'] for route in response.data['results']] == ['Thika Road']
+
+    # The cached ETag still answers conditional requests.
+    with django_assert_num_queries(1):
+        assert client.get('/routes/', HTTP_IF_NONE_MATCH=response['ETag']).status_code == 304
+
+
+@pytest.mark.django_db
+def test_writes_retire_only_the_responses_built_from_their_table(
+        manager, matatu, settings, django_assert_num_queries, django_capture_on_commit_callbacks):
+    settings.SACCO_AUTH_CACHE_ALIAS = 'default'
+    client = client_for(manager)
+    client.get('/routes/')
+    client.get('/revenues/')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Revenue.objects.create(matatu=matatu, amount_collected=Decimal('3000.00'))
+
+    client = client_for(manager)
+    with django_assert_num_queries(1):
+        client.get('/routes/')
+    assert len(client.get('/revenues/').data['results']) == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Expense.objects.create(matatu=matatu, category=ExpenseCategory.resolve('Fuel'), amount=Decimal('500.00'))
+    client = client_for(manager)
+    with django_assert_num_queries(1):
+        assert len(client.get('/revenues/').data['results']) == 1
+
+
+@pytest.mark.django_db
+def test_writes_from_other_processes_retire_cached_responses(manager, matatu):
+    assert len(client_for(manager).get('/revenues/').data['results']) == 0
+
+    # Another process shares the database but not this process's cache: it
+    # bumps the table version and nothing else.
+    Revenue.objects.bulk_create([Revenue(matatu=matatu, amount_collected=Decimal('3000.00'))])
+    versions.bump(Revenue)
+    assert len(client_for(manager).get('/revenues/').data['results']) == 1
+
+
+@pytest.mark.django_db
+def test_deleting_a_route_retires_cached_matatus(manager, matatu, django_capture_on_commit_callbacks):
+    assert client_for(manager).get('/matatus/').data['results'][0]['route'] == matatu.route_id
+
+    with django_capture_on_commit_callbacks(execute=True):
+        matatu.route.delete()
+    assert client_for(manager).get('/matatus/').data['results'][0]['route'] is None
+
+
+@pytest.mark.django_db
+def test_keys_vary_by_role_and_scope(manager, matatu):
+    Revenue.objects.create(matatu=matatu, amount_collected=Decimal('3000.00'), date=datetime.date(2024, 3, 1))
+    other = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='other', password='x', role='owner'),
+        phone_number='0711111111',
+    )
+    owners = Group.objects.create(name='Matatu Owner')
+    matatu.owner.user.groups.add(owners)
+    other.user.groups.add(owners)
+    path = '/analytics/profit-and-loss/?period=month&start=2024-03-01&end=2024-03-31'
+
+    assert len(client_for(manager).get(path).data['results']) == 1
+    assert len(client_for(matatu.owner.user).get(path).data['results']) == 1
+    assert client_for(other.user).get(path).data['results'] == []
+
+    # A user whose roles do not allow the list is never served a cached copy.
+    client_for(manager).get('/routes/')
+    assert client_for(other.user).get('/routes/').status_code == 403
+
+
+def test_file_cache_evicts_least_recently_used(tmp_path):
+    cache = LRUFileBasedCache(str(tmp_path), {'OPTIONS': {'MAX_ENTRIES': 3, 'CULL_FREQUENCY': 3}})
+    for age, key in enumerate(['a', 'b', 'c']):
+        cache.set(key, key)
+        os.utime(cache._key_to_file(key), (1_000_000 + age, 1_000_000 + age))
+
+    assert cache.get('a') == 'a'
+    cache.set('d', 'd')
+    assert [cache.get(key) for key in 'abcd'] == ['a', None, 'c', 'd']
@@ -0,0 +1,46 @@
+import pytest
+from django.contrib.auth.models import Group
+
+from sacco.models import User
+from sacco.permissions import IsDriverOrConductor, IsManager
+from sacco.roles import get_user_roles
+
+
+class _Request:
+    def __init__(self, user):
+        self.user = user
+
+
+@pytest.mark.django_db
+def test_roles_are_loaded_once_and_shared_across_permissions(django_assert_num_queries, settings):
+    user = User.objects.create_user(username='mary', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    request = _Request(User.objects.get(pk=user.pk))
+
+    with django_assert_num_queries(1):
+        assert not IsDriverOrConductor().has_permission(request, None)
+        assert IsManager().has_permission(request, None)
+
+    # Without a shared cache, the next request loads them again.
+    with django_assert_num_queries(1):
+        assert IsManager().has_permission(_Request(User(pk=user.pk)), None)
+
+    # With one, a fresh instance of the same user is served from it.
+    settings.SACCO_AUTH_CACHE_ALIAS = 'default'
+    IsManager().has_permission(_Request(User(pk=user.pk)), None)
+    with django_assert_num_queries(0):
+        assert IsManager().has_permission(_Request(User(pk=user.pk)), None)
+
+
+@pytest.mark.django_db
+def test_group_changes_clear_cached_roles(settings):
+    settings.SACCO_AUTH_CACHE_ALIAS = 'default'
+    user = User.objects.create_user(username='john', password='x', role='driver')
+    driver = Group.objects.create(name='Driver')
+    assert get_user_roles(User.objects.get(pk=user.pk)) == frozenset()
+
+    user.groups.add(driver)
+    assert get_user_roles(User.objects.get(pk=user.pk)) == {'Driver'}
+
+    driver.custom_user_set.clear()
+    assert get_user_roles(User.objects.get(pk=user.pk)) == frozenset()
@@ -0,0 +1,107 @@
+import datetime
+
+import pytest
+from django.core.management import call_command
+
+from sacco import archive, rollups
+from sacco.models import Matatu, MatatuOwner, MatatuRouteRevenue, Revenue, Route, RouteRevenue, User
+
+
+@pytest.fixture
+def matatu():
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'),
+        phone_number='0700000000',
+    )
+    return Matatu.objects.create(
+        registration_number='KBX001', route=Route.objects.create(name='Thika Road'),
+        capacity=14, owner=owner, licence_expiry_date=datetime.date(2030, 1, 1),
+    )
+
+
+def route_total(route):
+    return RouteRevenue.objects.get(route=route).total_revenue
+
+
+@pytest.mark.django_db
+def test_revenue_writes_are_rolled_up(matatu):
+    revenue = Revenue.objects.create(matatu=matatu, amount_collected=1500)
+    assert route_total(matatu.route) == 1500
+    assert MatatuRouteRevenue.objects.get(matatu=matatu).revenue_collected == 1500
+
+    revenue.amount_collected = 1200
+    revenue.save()
+    assert route_total(matatu.route) == 1200
+
+    revenue.delete()
+    assert route_total(matatu.route) == 0
+    call_command('rebuild_route_revenue', check_only=True)
+
+
+@pytest.mark.django_db
+def test_rebuild_repairs_drift(matatu):
+    Revenue.objects.create(matatu=matatu, amount_collected=900)
+    RouteRevenue.objects.update(total_revenue=1)
+
+    call_command('rebuild_route_revenue')
+    assert route_total(matatu.route) == 900
+
+
+@pytest.mark.django_db
+def test_rebuild_keeps_archived_days(matatu):
+    for day in range(1, 4):
+        Revenue.objects.create(matatu=matatu, amount_collected=1000 * day, date=datetime.date(2024, 3, day))
+    totals = list(RouteRevenue.objects.order_by('date').values_list('date', 'total_revenue'))
+
+    archive.archive(datetime.date(2024, 3, 3))
+    assert rollups.verify() == []
+    assert rollups.rebuild() == (3, 3)
+    assert list(RouteRevenue.objects.order_by('date').values_list('date', 'total_revenue')) == totals
+    call_command('rebuild_route_revenue', start=datetime.date(2024, 3, 1), end=datetime.date(2024, 3, 2))
+
+
+@pytest.mark.django_db
+def test_deleting_a_matatu_takes_it_out_of_its_route_totals(matatu):
+    other = Matatu.objects.create(
+        registration_number='KBX002', route=matatu.route, capacity=14, owner=matatu.owner,
+        licence_expiry_date=datetime.date(2030, 1, 1),
+    )
+    for day in range(1, 4):
+        date = datetime.date(2024, 3, day)
+        Revenue.objects.create(matatu=matatu, amount_collected=1000 * day, date=date)
+        Revenue.objects.create(matatu=other, amount_collected=500, date=date)
+    # Archived days are in the rollups too, with no Revenue rows left to delete.
+    archive.archive(datetime.date(2024, 3, 2))
+
+    matatu.delete()
+
+    assert list(RouteRevenue.objects.order_by('date').values_list('total_revenue', flat=True)) == [500, 500, 500]
+    assert not MatatuRouteRevenue.objects.filter(matatu__registration_number='KBX001').exists()
+    assert rollups.verify() == []
+
+
+@pytest.mark.django_db
+def test_rebuild_keeps_the_days_of_a_moved_matatu_on_its_old_route(matatu):
+    old_route = matatu.route
+    Revenue.objects.create(matatu=matatu, amount_collected=1000, date=datetime.date(2024, 3, 1))
+    matatu.route = Route.objects.create(name='Mombasa Road')
+    matatu.save()
+    Revenue.objects.create(matatu=matatu, amount_collected=700, date=datetime.date(2024, 3, 2))
+    rolled_up = list(RouteRevenue.objects.order_by('date').values_list('route_id', 'date', 'total_revenue'))
+    assert rolled_up == [
+        (old_route.pk, datetime.date(2024, 3, 1), 1000), (matatu.route_id, datetime.date(2024, 3, 2), 700),
+    ]
+    assert rollups.verify() == []
+
+    rollups.rebuild()
+    assert list(RouteRevenue.objects.order_by('date').values_list('route_id', 'date', 'total_revenue')) == rolled_up
+
+    # A route total that drifted from the revenue is reported, even when the
+    # matatu rollups beneath it drifted the same way.
+    MatatuRouteRevenue.objects.filter(date=datetime.date(2024, 3, 1)).update(revenue_collected=1)
+    RouteRevenue.objects.filter(date=datetime.date(2024, 3, 1)).update(total_revenue=1)
+    mismatches = rollups.verify()
+    assert [mismatch.split(':')[0] for mismatch in mismatches] == [
+        f'matatu {matatu.pk} on route {old_route.pk} on 2024-03-01', f'route {old_route.pk} on 2024-03-01',
+    ]
+    assert all('revenue 1000' in mismatch for mismatch in mismatches)
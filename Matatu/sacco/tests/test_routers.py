@@ -0,0 +1,109 @@
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction, sync_to_async
+from django.db import router
+from django.http import HttpResponse, HttpResponseBadRequest
+from django.test import RequestFactory
+from django.views import View
+
+from sacco.middleware import PIN_COOKIE, ReplicaRoutingMiddleware
+from sacco.models import Revenue, User
+
+
+class ReportView(View):
+    replica_reads = True
+
+    def get(self, request):
+        return HttpResponse(router.db_for_read(Revenue))
+
+    def post(self, request):
+        return HttpResponse(router.db_for_read(Revenue))
+
+
+class AuthReportView(ReportView):
+    def get(self, request):
+        return HttpResponse(' '.join(router.db_for_read(model) for model in (User, User.groups.through)))
+
+
+class WritingReportView(ReportView):
+    def get(self, request):
+        router.db_for_write(Revenue)
+        return HttpResponse(router.db_for_read(Revenue))
+
+
+class PrimaryView(ReportView):
+    replica_reads = False
+
+
+class RefusingView(ReportView):
+    def post(self, request):
+        return HttpResponseBadRequest()
+
+
+def serve(request, view_class):
+    view = view_class.as_view()
+
+    def get_response(request):
+        middleware.process_view(request, view, (), {})
+        return view(request)
+
+    middleware = ReplicaRoutingMiddleware(get_response)
+    return middleware(request)
+
+
+@pytest.fixture(autouse=True)
+def replica(settings):
+    settings.SACCO_READ_REPLICAS = ['replica']
+
+
+def test_opted_in_views_read_from_the_replica():
+    assert serve(RequestFactory().get('/'), ReportView).content == b'replica'
+    assert serve(RequestFactory().get('/'), PrimaryView).content == b'default'
+
+
+def test_users_and_groups_are_always_read_from_the_primary():
+    assert serve(RequestFactory().get('/'), AuthReportView).content == b'default default'
+
+
+def test_reads_outside_a_request_use_the_primary():
+    assert router.db_for_read(Revenue) == 'default'
+    assert router.db_for_write(Revenue) == 'default'
+
+
+def test_writes_pin_the_request_and_the_client_to_the_primary():
+    response = serve(RequestFactory().post('/'), ReportView)
+    assert response.content == b'default'
+    assert response.cookies[PIN_COOKIE]['max-age'] == 10
+
+    request = RequestFactory().get('/')
+    request.COOKIES[PIN_COOKIE] = '1'
+    assert serve(request, ReportView).content == b'default'
+
+
+def test_refused_writes_do_not_pin_the_client():
+    response = serve(RequestFactory().post('/'), RefusingView)
+    assert response.status_code == 400
+    assert PIN_COOKIE not in response.cookies
+
+
+def test_async_requests_are_routed_without_a_thread_hop():
+    view = ReportView.as_view()
+
+    async def get_response(request):
+        middleware.process_view(request, view, (), {})
+        return await sync_to_async(view)(request)
+
+    middleware = ReplicaRoutingMiddleware(get_response)
+    assert iscoroutinefunction(middleware)
+    assert async_to_sync(middleware)(RequestFactory().get('/')).content == b'replica'
+    response = async_to_sync(middleware)(RequestFactory().post('/'))
+    assert response.content == b'default' and PIN_COOKIE in response.cookies
+    assert not iscoroutinefunction(ReplicaRoutingMiddleware(lambda request: None))
+
+
+def test_a_write_mid_request_pins_the_rest_of_it():
+    assert serve(RequestFactory().get('/'), WritingReportView).content == b'default'
+
+
+def test_no_replicas_configured_reads_from_the_primary(settings):
+    settings.SACCO_READ_REPLICAS = []
+    assert serve(RequestFactory().get('/'), ReportView).content == b'default'
@@ -1,4 +1,6 @@
 from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from sacco.models import Manager, User
 from sacco.serializers import MatatuSerializer
 
 def test_registration_number_validation():
@@ -9,3 +11,14 @@ def test_registration_number_validation():
     except ValidationError as e:
         # Assert that the correct validation error message is raised
         assert "Registration number must be alphanumeric" in str(e)
+
+
+def test_managers_never_expose_the_password_hash(admin_user):
+    user = User.objects.create_user(username='manager', password='x', role='manager', first_name='Amina')
+    Manager.objects.create(user=user, phone_number='0711111111')
+    client = APIClient()
+    client.force_authenticate(admin_user)
+
+    rows = client.get('/managers/').json()['results']
+    assert rows[0]['user'] == {'id': user.pk, 'username': 'manager', 'first_name': 'Amina', 'last_name': ''}
+    assert 'password' not in client.get(f"/managers/{rows[0]['id']}/").json()['user']
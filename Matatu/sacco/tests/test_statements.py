@@ -0,0 +1,103 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from sacco import statements
+from sacco.models import Expense, ExpenseCategory, Matatu, MatatuOwner, Revenue, User
+
+MONTH = datetime.date(2024, 3, 1)
+
+
+def create_owner(n, matatus):
+    owner = MatatuOwner.objects.create(
+        user=User.objects.create_user(username=f'owner{n}', password='x', role='owner', first_name=f'Owner {n}'),
+        phone_number=f'07000000{n:02d}',
+    )
+    return [
+        Matatu.objects.create(registration_number=f'KB{n:02d}{m}', capacity=14, owner=owner,
+                              licence_expiry_date=datetime.date(2030, 1, 1))
+        for m in range(matatus)
+    ]
+
+
+@pytest.fixture
+def fleet(db):
+    fuel = ExpenseCategory.resolve('Fuel')
+    matatus = [matatu for n in range(3) for matatu in create_owner(n, 2)]
+    for day in (1, 15, 31):
+        for matatu in matatus:
+            Revenue.objects.create(matatu=matatu, amount_collected=Decimal('3000.00'), date=MONTH.replace(day=day))
+            Expense.objects.create(matatu=matatu, category=fuel, amount=Decimal('1000.50'), date=MONTH.replace(day=day))
+    # Outside the month.
+    Revenue.objects.create(matatu=matatus[0], amount_collected=Decimal('999.00'), date=datetime.date(2024, 4, 1))
+    return matatus
+
+
+def test_statements_come_from_a_fixed_number_of_queries(fleet):
+    with CaptureQueriesContext(connection) as few:
+        statements.statements(*statements.month_range(MONTH))
+    create_owner(3, 2)
+    create_owner(4, 0)
+    with CaptureQueriesContext(connection) as more:
+        result = statements.statements(*statements.month_range(MONTH))
+
+    # Whether anything is archived (once per archive table), the revenue and
+    # expense totals, matatus, owners.
+    assert len(few) == len(more) == 5
+    assert [statement['owner'] for statement in result] == sorted(MatatuOwner.objects.values_list('pk', flat=True))
+    first = result[0]
+    assert (first['name'], first['start'], first['end']) == ('Owner 0', MONTH, datetime.date(2024, 3, 31))
+    assert [(row['registration_number'], row['revenue'], row['expenses'], row['net']) for row in first['vehicles']] \
+        == [('KB000', Decimal('9000.00'), Decimal('3001.50'), Decimal('5998.50'))] + [
+            ('KB001', Decimal('9000.00'), Decimal('3001.50'), Decimal('5998.50'))]
+    assert first['net'] == Decimal('11997.00')
+    assert result[-1]['vehicles'] == [] and result[-1]['net'] == 0
+
+
+def test_reruns_only_render_changed_owners(fleet, tmp_path):
+    result = statements.generate(MONTH, directory=tmp_path, workers=1)
+    assert (result['owners'], result['rendered'], result['skipped']) == (3, 3, 0)
+
+    directory = tmp_path / '2024-03'
+    owner = fleet[0].owner_id
+    assert (directory / f'owner-{owner}.csv').read_text().splitlines() == [
+        'registration_number,revenue,expenses,net',
+        'KB000,9000.00,3001.50,5998.50',
+        'KB001,9000.00,3001.50,5998.50',
+        'TOTAL,18000.00,6003.00,11997.00',
+    ]
+    html = (directory / f'owner-{owner}.html').read_text()
+    assert 'Owner 0' in html and '11,997.00' in html and '@page' in html
+
+    assert statements.generate(MONTH, directory=tmp_path, workers=1)['rendered'] == 0
+
+    Revenue.objects.filter(matatu=fleet[2], date=MONTH).update(amount_collected=Decimal('3500.00'))
+    (directory / f'owner-{fleet[4].owner_id}.html').unlink()
+    result = statements.generate(MONTH, directory=tmp_path, workers=1)
+    assert (result['rendered'], result['skipped']) == (2, 1)
+    assert statements.generate(MONTH, directory=tmp_path, workers=1, force=True)['rendered'] == 3
+
+
+def test_interrupted_runs_resume(fleet, tmp_path):
+    directory = tmp_path / '2024-03'
+    statements.generate(MONTH, directory=tmp_path, workers=1)
+    # As if the run had stopped while recording its second statement.
+    lines = (directory / statements.MANIFEST).read_text().splitlines()
+    (directory / statements.MANIFEST).write_text(lines[0] + '\n' + lines[1][:20])
+
+    assert statements.generate(MONTH, directory=tmp_path, workers=1)['rendered'] == 2
+    assert len((directory / statements.MANIFEST).read_text().splitlines()) == 3
+
+
+def test_process_pool_writes_the_same_statements(fleet, tmp_path):
+    statements.generate(MONTH, directory=tmp_path / 'serial', workers=1)
+    result = statements.generate(MONTH, directory=tmp_path / 'pool', workers=2)
+
+    assert result['rendered'] == 3
+    serial, pool = tmp_path / 'serial' / '2024-03', tmp_path / 'pool' / '2024-03'
+    assert sorted(path.name for path in pool.iterdir()) == sorted(path.name for path in serial.iterdir())
+    for path in serial.iterdir():
+        assert (pool / path.name).read_bytes() == path.read_bytes()
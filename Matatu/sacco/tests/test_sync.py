@@ -0,0 +1,147 @@
+import datetime
+
+import pytest
+from django.contrib.auth.models import Group
+from rest_framework.test import APIClient
+
+from sacco.models import Driver, Manager, Matatu, MatatuOwner, Revenue, Route, User
+
+
+@pytest.mark.django_db
+def test_sync_returns_only_changes_and_deletions_since_token(settings):
+    settings.SACCO_SYNC_OVERLAP_SECONDS = 0
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+    client = APIClient()
+    client.force_authenticate(user)
+
+    owner = MatatuOwner.objects.create(user=user, phone_number='0700000000')
+    route = Route.objects.create(name='Thika Road')
+    matatu = Matatu.objects.create(registration_number='KBX001', route=route, capacity=14,
+                                   owner=owner, licence_expiry_date=datetime.date(2030, 1, 1))
+
+    first = client.get('/sync/').json()
+    assert first['reset'] and len(first['changes']['matatus']) == 1
+
+    revenue = Revenue.objects.create(matatu=matatu, amount_collected=1500)
+    route_id = route.pk
+    route.delete()
+
+    delta = client.get('/sync/', {'token': first['token']}).json()
+    assert not delta['reset']
+    assert [row['id'] for row in delta['changes']['revenues']] == [revenue.pk]
+    assert delta['changes']['routes'] == []
+    assert delta['deleted']['routes'] == [route_id]
+
+    assert client.get('/sync/', {'token': 'forged'}).status_code == 400
+
+
+@pytest.fixture
+def manager_client(db):
+    user = User.objects.create_user(username='manager', password='x', role='manager')
+    user.groups.add(Group.objects.create(name='Manager'))
+    Manager.objects.create(user=user, phone_number='0711111111', sacco_wide=True)
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+
+@pytest.fixture
+def owner(db):
+    return MatatuOwner.objects.create(
+        user=User.objects.create_user(username='owner', password='x', role='owner'), phone_number='0700000000',
+    )
+
+
+def test_full_sync_comes_in_pages(manager_client, owner, settings, django_assert_max_num_queries):
+    settings.SACCO_SYNC_PAGE_SIZE = 2
+    settings.SACCO_SYNC_OVERLAP_SECONDS = 0
+    routes = [Route.objects.create(name=f'Route {n}') for n in range(3)]
+    matatus = [
+        Matatu.objects.create(registration_number=f'KBX{n:03d}', route=routes[0], capacity=14, owner=owner,
+                              licence_expiry_date=datetime.date(2030, 1, 1))
+        for n in range(2)
+    ]
+
+    pages, params = [], {}
+    while True:
+        with django_assert_max_num_queries(8):
+            page = manager_client.get('/sync/', params).json()
+        pages.append(page)
+        if page['next'] is None:
+            break
+        assert page['token'] is None and page['reset']
+        params = {'cursor': page['next']}
+
+    assert len(pages) == 3
+    synced = {section: [row['id'] for page in pages for row in page['changes'][section]]
+              for section in ('routes', 'matatus')}
+    assert synced == {'routes': [route.pk for route in routes], 'matatus': [matatu.pk for matatu in matatus]}
+
+    # The last page carries the token for the next delta.
+    delta = manager_client.get('/sync/', {'token': pages[-1]['token']}).json()
+    assert not delta['reset'] and delta['next'] is None
+    assert manager_client.get('/sync/', {'cursor': 'forged'}).json() == {'cursor': ['Invalid sync cursor.']}
+
+
+def test_deleting_a_route_or_matatu_resyncs_the_rows_that_pointed_at_it(manager_client, owner, settings):
+    settings.SACCO_SYNC_OVERLAP_SECONDS = 0
+    route = Route.objects.create(name='Thika Road')
+    matatus = [
+        Matatu.objects.create(registration_number=f'KBX{n:03d}', route=route, capacity=14, owner=owner,
+                              licence_expiry_date=datetime.date(2030, 1, 1))
+        for n in range(2)
+    ]
+    driver = Driver.objects.create(
+        user=User.objects.create_user(username='driver', password='x', role='driver'), phone_number='0711111111',
+        assigned_matatu=matatus[1], licence_expiry_date=datetime.date(2030, 1, 1),
+    )
+    token = manager_client.get('/sync/').json()['token']
+
+    deleted = matatus[1].pk
+    route.delete()
+    matatus[1].delete()
+
+    delta = manager_client.get('/sync/', {'token': token}).json()
+    assert [(row['id'], row['route']) for row in delta['changes']['matatus']] == [(matatus[0].pk, None)]
+    assert [(row['id'], row['assigned_matatu']) for row in delta['changes']['drivers']] == [(driver.pk, None)]
+    assert delta['deleted']['matatus'] == [deleted]
+
+
+def test_moving_a_driver_to_another_matatu_resets_its_sync(owner, settings):
+    settings.SACCO_SYNC_OVERLAP_SECONDS = 0
+    route = Route.objects.create(name='Thika Road')
+    first, second = [
+        Matatu.objects.create(registration_number=f'KBX{n:03d}', route=route, capacity=14, owner=owner,
+                              licence_expiry_date=datetime.date(2030, 1, 1))
+        for n in range(2)
+    ]
+    kept = Revenue.objects.create(matatu=first, amount_collected=1000, date=datetime.date(2024, 3, 1))
+    gone = Revenue.objects.create(matatu=first, amount_collected=1100, date=datetime.date(2024, 3, 2))
+    older = Revenue.objects.create(matatu=second, amount_collected=2000, date=datetime.date(2024, 3, 1))
+    other = Revenue.objects.create(matatu=second, amount_collected=2100, date=datetime.date(2024, 3, 2))
+    user = User.objects.create_user(username='driver', password='x', role='driver')
+    user.groups.add(Group.objects.create(name='Driver'))
+    driver = Driver.objects.create(user=user, phone_number='0711111111', assigned_matatu=first,
+                                   licence_expiry_date=datetime.date(2030, 1, 1))
+    client = APIClient()
+    client.force_authenticate(user)
+
+    token = client.get('/sync/').json()['token']
+    # Deletions on other matatus are not the driver's business.
+    other_id, gone_id = other.pk, gone.pk
+    other.delete()
+    gone.delete()
+    delta = client.get('/sync/', {'token': token}).json()
+    assert not delta['reset'] and delta['deleted']['revenues'] == [gone_id]
+    assert other_id not in delta['deleted']['revenues']
+
+    driver.assigned_matatu = second
+    driver.save()
+    delta = client.get('/sync/', {'token': delta['token']}).json()
+    # The new matatu's revenue is older than the token, so only a full
+    # sync brings it; the client drops the old matatu's rows.
+    assert delta['reset']
+    assert [row['id'] for row in delta['changes']['revenues']] == [older.pk]
+    assert kept.pk not in [row['id'] for row in delta['changes']['revenues']]
@@ -1,5 +1,5 @@
 from django.urls import path
-from sacco import views
+from sacco import async_views, views
 
 urlpatterns = [
     # Manager URLs
@@ -21,12 +21,48 @@ urlpatterns = [
     # Route URLs
     path('routes/', views.RouteListView.as_view(), name='route-list'),
     path('routes/<int:pk>/', views.RouteDetailView.as_view(), name='route-detail'),
+    path('routes/revenues/', views.RouteRevenueListView.as_view(), name='route-revenue-list'),
 
     # Revenue URLs
     path('revenues/', views.RevenueListView.as_view(), name='revenue-list'),
     path('revenues/<int:pk>/', views.RevenueDetailView.as_view(), name='revenue-detail'),
+    path('revenues/bulk/', views.RevenueBulkView.as_view(), name='revenue-bulk'),
 
     # Expense URLs
     path('expenses/', views.ExpenseListView.as_view(), name='expense-list'),
     path('expenses/<int:pk>/', views.ExpenseDetailView.as_view(), name='expense-detail'),
+    path('expenses/categories/', views.ExpenseCategoryListView.as_view(), name='expense-category-list'),
+
+    # Payment URLs
+    path('payments/', views.PaymentListView.as_view(), name='payment-list'),
+
+    # Export URLs
+    path('exports/<str:resource>/', views.ExportView.as_view(), name='export'),
+
+    # Analytics URLs
+    path('analytics/profit-and-loss/', views.ProfitAndLossView.as_view(), name='profit-and-loss'),
+    path('analytics/expense-breakdown/', views.ExpenseBreakdownView.as_view(), name='expense-breakdown'),
+
+    # Licence URLs
+    path('licences/expiring/', views.LicenceExpiryView.as_view(), name='licence-expiring'),
+
+    # Job URLs
+    path('jobs/', views.JobListView.as_view(), name='job-list'),
+    path('jobs/<int:pk>/', views.JobDetailView.as_view(), name='job-detail'),
+
+    # Sync URLs
+    path('sync/', views.SyncView.as_view(), name='sync'),
+
+    # Async read URLs, for ASGI deployments
+    path('async/routes/', async_views.RouteListView.as_view(), name='async-route-list'),
+    path('async/routes/<int:pk>/', async_views.RouteDetailView.as_view(), name='async-route-detail'),
+    path('async/matatus/', async_views.MatatuListView.as_view(), name='async-matatu-list'),
+    path('async/matatus/<int:pk>/', async_views.MatatuDetailView.as_view(), name='async-matatu-detail'),
+    path('async/revenues/', async_views.RevenueListView.as_view(), name='async-revenue-list'),
+    path('async/revenues/<int:pk>/', async_views.RevenueDetailView.as_view(), name='async-revenue-detail'),
+    path('async/expenses/', async_views.ExpenseListView.as_view(), name='async-expense-list'),
+    path('async/expenses/<int:pk>/', async_views.ExpenseDetailView.as_view(), name='async-expense-detail'),
+
+    # Live dashboard stream, for ASGI deployments
+    path('live/revenues/', async_views.LiveRevenueView.as_view(), name='live-revenues'),
 ]
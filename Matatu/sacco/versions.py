@@ -0,0 +1,76 @@
+"""
+Per-table version counters for conditional GETs and the response cache.
+
+``bump()`` is called from the save/delete receivers in ``sacco.signals``,
+in the same transaction as the write or just after it commits, so a version
+never runs ahead of the data it describes. Views read the counters of the
+tables they render to build an ETag and Last-Modified pair, and the response
+cache to build its keys, each with a single query on the small TableVersion
+table. The counters live in the database, so every process sees a bump as
+soon as it commits.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from sacco.models import TableVersion
+
+
+def table_label(model):
+    return model._meta.label_lower
+
+
+def bump(*models):
+    for model in models:
+        label = table_label(model)
+        updated = TableVersion.objects.filter(table=label).update(version=F('version') + 1, updated_at=now())
+        if updated:
+            continue
+        try:
+            with transaction.atomic():
+                TableVersion.objects.create(table=label, version=1)
+        except IntegrityError:
+            TableVersion.objects.filter(table=label).update(version=F('version') + 1, updated_at=now())
+
+
+def current(*models):
+    """
+    Return the version of each of ``models``; 0 for a table never bumped.
+    """
+    labels = [table_label(model) for model in models]
+    rows = dict(TableVersion.objects.filter(table__in=labels).values_list('table', 'version'))
+    return [rows.get(label, 0) for label in labels]
+
+
+def _version_rows(labels):
+    return TableVersion.objects.filter(table__in=labels).values_list('table', 'version', 'updated_at')
+
+
+def _validators(labels, rows):
+    rows = {table: (version, updated_at) for table, version, updated_at in rows}
+    etag = '"%s"' % '.'.join(f'{label}:{rows.get(label, (0, None))[0]}' for label in labels)
+    timestamps = [updated_at for _, updated_at in rows.values()]
+    return etag, max(timestamps) if timestamps else None
+
+
+def validators(*models):
+    """
+    Return ``(etag, last_modified)`` for a response built from ``models``.
+    """
+    labels = [table_label(model) for model in models]
+    return _validators(labels, _version_rows(labels))
+
+
+async def avalidators(*models):
+    labels = [table_label(model) for model in models]
+    return _validators(labels, [row async for row in _version_rows(labels)])
+
+
+def scoped_etag(etag, scope):
+    """
+    Make ``etag`` differ between scopes (such as managers' fleets) whose
+    responses differ while the tables do not.
+    """
+    if not scope:
+        return etag
+    return f'{etag[:-1]}.{scope}"'
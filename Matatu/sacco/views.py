@@ -1,9 +1,13 @@
-from rest_framework import generics, permissions
+from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.exceptions import PermissionDenied
-from django.contrib.auth.models import User
-from sacco.models import Matatu, Driver, Conductor, Route, Revenue, Expense
+from rest_framework.exceptions import PermissionDenied, NotFound, ValidationError
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from sacco.models import Manager, Matatu, MatatuOwner, Driver, Conductor, Route, Revenue, Expense, RouteRevenue, Payment, ExpenseCategory, Job
+from sacco.roles import MANAGER, has_role
 from sacco.serializers import (
     ManagerSerializer,
     DriverSerializer,
@@ -12,8 +16,203 @@ from sacco.serializers import (
     RouteSerializer,
     RevenueSerializer,
     ExpenseSerializer,
+    ExpenseCategorySerializer,
+    PaymentSerializer,
+    RouteRevenueSerializer,
+    RevenueBulkSerializer,
+    ExportQuerySerializer,
+    ProfitAndLossQuerySerializer,
+    ExpenseBreakdownQuerySerializer,
+    LicenceExpiryQuerySerializer,
+    JobSerializer,
 )
-from sacco.permissions import IsManager, IsOwnerOrReadOnly, IsDriverOrConductor
+from sacco.permissions import (
+    IsManager,
+    IsOwnerOrReadOnly,
+    IsDriverOrConductor,
+    IsAdminOrManager,
+    IsMatatuOwner,
+)
+from sacco.pagination import DateKeysetPagination
+from sacco import (
+    analytics, archive, exports, fastpath, filters, fleets, idempotency, ingest, jobs, licences, response_cache,
+    sync, versions,
+)
+
+
+class ConditionalGetMixin:
+    """
+    Answer GETs with 304 Not Modified while the tables in ``versioned_models``
+    are unchanged, judged from their TableVersion counters alone.
+    """
+    versioned_models = ()
+
+    def get_validator_scope(self):
+        return ''
+
+    def get(self, request, *args, **kwargs):
+        etag, last_modified = versions.validators(*self.versioned_models)
+        etag = versions.scoped_etag(etag, self.get_validator_scope())
+        last_modified = int(last_modified.timestamp()) if last_modified else None
+
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            return response
+
+        response = super().get(request, *args, **kwargs)
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+
+class CachedResponseMixin:
+    """
+    Serve GETs from the response cache while none of the tables in
+    ``cache_models`` has changed (see ``sacco.response_cache``). DRF has
+    already authenticated the user and checked permissions when ``get()``
+    runs, so a hit never bypasses them.
+    """
+    cache_models = ()
+
+    def get_cache_scope(self):
+        return ''
+
+    def get(self, request, *args, **kwargs):
+        return self.cached_response(request, super().get, *args, **kwargs)
+
+    def cached_response(self, request, handler, *args, **kwargs):
+        cache = response_cache.response_cache()
+        key = response_cache.cache_key(request, self.cache_models, self.get_cache_scope())
+
+        cached = cache.get(key)
+        if cached is not None:
+            data, headers = cached
+            last_modified = parse_http_date_safe(headers.get('Last-Modified'))
+            response = get_conditional_response(request, etag=headers.get('ETag'), last_modified=last_modified)
+            if response is not None:
+                return response
+            return Response(data, headers=headers)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            headers = {name: response[name] for name in ('ETag', 'Last-Modified') if response.has_header(name)}
+            cache.set(key, (response.data, headers), response_cache.timeout())
+        return response
+
+
+class ValuesListMixin:
+    """
+    Serve ``list()`` from ``values()`` rows through the precompiled
+    representation of ``serializer_class`` instead of full serializer
+    instances. The output is identical; writes still use the serializer.
+    """
+    def list(self, request, *args, **kwargs):
+        representation = fastpath.representation_for(self.get_serializer_class())
+        querysets = [representation.values(self.filter_queryset(self.get_queryset()))]
+        archived = archive.archived_queryset(querysets[0].model)
+        if archived is not None:
+            # Rows past the archive horizon live in the archive table; page over both.
+            querysets.append(representation.values(self.filter_queryset(archived)))
+
+        if self.paginator is not None:
+            matatu_ids = filters.merged_matatus(request.query_params, getattr(self, 'filter_fields', {}))
+            page = self.paginator.paginate_querysets(filters.partition(querysets, matatu_ids), request, view=self)
+            return self.get_paginated_response(representation.represent(page))
+        return Response(representation.represent(row for queryset in querysets for row in queryset))
+
+
+class FleetScopedMixin:
+    """
+    Restrict a manager to the matatus of their fleet (see ``sacco.fleets``).
+    ``fleet_field`` is the lookup from the view's model to the matatu id;
+    ``FleetFilterBackend`` applies it to every read. Writes naming a
+    ``matatu`` outside the fleet are refused. Cached responses and ETags
+    vary by fleet.
+    """
+    fleet_field = 'matatu_id'
+
+    def get_fleet(self):
+        return fleets.get_fleet(self.request.user)
+
+    def get_cache_scope(self):
+        return fleets.fleet_scope(self.get_fleet())
+
+    def get_validator_scope(self):
+        return fleets.fleet_scope(self.get_fleet())
+
+    def check_fleet(self, data):
+        fleet = self.get_fleet()
+        matatu = data.get('matatu')
+        if fleet is not None and matatu is not None and matatu.pk not in fleet:
+            raise PermissionDenied("This matatu is not in your fleet.")
+
+    def perform_create(self, serializer):
+        self.check_fleet(serializer.validated_data)
+        super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        self.check_fleet(serializer.validated_data)
+        super().perform_update(serializer)
+
+
+class IdempotentPostMixin:
+    """
+    Honour an ``Idempotency-Key`` header on POST (see ``sacco.idempotency``):
+    a retry with the same key and body gets the first response back, marked
+    with ``Idempotent-Replayed: true``, without being processed again.
+    """
+    def post(self, request, *args, **kwargs):
+        key = request.headers.get(idempotency.HEADER)
+        if key is None:
+            return super().post(request, *args, **kwargs)
+        if not key or len(key) > idempotency.MAX_KEY_LENGTH:
+            raise ValidationError({
+                idempotency.HEADER: [f'Must be 1 to {idempotency.MAX_KEY_LENGTH} characters.'],
+            })
+
+        try:
+            record = idempotency.begin(request.user, key, idempotency.fingerprint(request))
+        except idempotency.KeyReused:
+            return Response(
+                {'detail': "This Idempotency-Key was already used for a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        except idempotency.KeyInUse:
+            return Response(
+                {'detail': "A request with this Idempotency-Key is still in progress."},
+                status=status.HTTP_409_CONFLICT,
+            )
+        if record is not None:
+            return Response(record.response_body, status=record.status_code,
+                            headers={idempotency.REPLAYED_HEADER: 'true'})
+
+        try:
+            response = super().post(request, *args, **kwargs)
+        except Exception:
+            idempotency.release(request.user, key)
+            raise
+        idempotency.finish(request.user, key, response)
+        return response
+
+
+class ArchivedObjectMixin:
+    """
+    Let reads of a row that has been archived find it in the archive table.
+    Archived rows are read-only, so writes still answer 404.
+    """
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            archived = archive.archived_queryset(self.get_queryset().model)
+            if archived is None or self.request.method not in permissions.SAFE_METHODS:
+                raise
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        archived = self.filter_queryset(archived)
+        obj = generics.get_object_or_404(archived, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(self.request, obj)
+        return obj
 
 
 # Managers
@@ -21,132 +220,512 @@ class ManagerListView(generics.ListCreateAPIView):
     """
     List all managers or create a new one (Admin only).
     """
-    queryset = User.objects.filter(groups__name='Manager')
+    queryset = Manager.objects.select_related('user').prefetch_related('assigned_matatus')
     serializer_class = ManagerSerializer
     permission_classes = [permissions.IsAdminUser]
+    replica_reads = True
 
 
 class ManagerDetailView(generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a manager (Admin only).
     """
-    queryset = User.objects.filter(groups__name='Manager')
+    queryset = Manager.objects.select_related('user').prefetch_related('assigned_matatus')
     serializer_class = ManagerSerializer
     permission_classes = [permissions.IsAdminUser]
 
 
 # Drivers
-class DriverListView(generics.ListCreateAPIView):
+class DriverListView(FleetScopedMixin, generics.ListCreateAPIView):
     """
     List all drivers or create a new one (Manager only).
+    Filter by ``matatu`` or ``route``.
     """
     queryset = Driver.objects.all()
     serializer_class = DriverSerializer
     permission_classes = [permissions.IsAuthenticated, IsManager]
+    filter_fields = {'matatu': 'assigned_matatu_id', 'route': 'assigned_matatu__route_id'}
+    fleet_field = 'assigned_matatu_id'
+    replica_reads = True
 
 
-class DriverDetailView(generics.RetrieveUpdateDestroyAPIView):
+class DriverDetailView(FleetScopedMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a driver (Manager only).
     """
     queryset = Driver.objects.all()
     serializer_class = DriverSerializer
     permission_classes = [permissions.IsAuthenticated, IsManager]
+    fleet_field = 'assigned_matatu_id'
 
 
 # Conductors
-class ConductorListView(generics.ListCreateAPIView):
+class ConductorListView(FleetScopedMixin, generics.ListCreateAPIView):
     """
     List all conductors or create a new one (Manager only).
+    Filter by ``matatu`` or ``route``.
     """
     queryset = Conductor.objects.all()
     serializer_class = ConductorSerializer
     permission_classes = [permissions.IsAuthenticated, IsManager]
+    filter_fields = {
+        'matatu': 'assigned_driver__assigned_matatu_id',
+        'route': 'assigned_driver__assigned_matatu__route_id',
+    }
+    fleet_field = 'assigned_driver__assigned_matatu_id'
+    replica_reads = True
 
 
-class ConductorDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ConductorDetailView(FleetScopedMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a conductor (Manager only).
     """
     queryset = Conductor.objects.all()
     serializer_class = ConductorSerializer
     permission_classes = [permissions.IsAuthenticated, IsManager]
+    fleet_field = 'assigned_driver__assigned_matatu_id'
 
 
 # Matatus
-class MatatuListView(generics.ListCreateAPIView):
+class MatatuListView(FleetScopedMixin, CachedResponseMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     """
     List all Matatus or create a new one (Manager only).
+    Filter by ``route`` or ``owner``.
     """
     queryset = Matatu.objects.all()
     serializer_class = MatatuSerializer
     permission_classes = [permissions.IsAuthenticated, IsManager]
+    filter_fields = {'route': 'route_id', 'owner': 'owner_id'}
+    fleet_field = 'id'
+    versioned_models = (Matatu,)
+    cache_models = (Matatu,)
+    replica_reads = True
 
     def perform_create(self, serializer):
         serializer.save(owner=self.request.user)
 
 
-class MatatuDetailView(generics.RetrieveUpdateDestroyAPIView):
+class MatatuDetailView(FleetScopedMixin, CachedResponseMixin, ConditionalGetMixin,
+                       generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a Matatu (Owner only).
     """
     queryset = Matatu.objects.all()
     serializer_class = MatatuSerializer
     permission_classes = [permissions.IsAuthenticated, IsOwnerOrReadOnly]
+    fleet_field = 'id'
+    versioned_models = (Matatu,)
+    cache_models = (Matatu,)
 
 
 # Routes
-class RouteListView(generics.ListCreateAPIView):
+class RouteListView(CachedResponseMixin, ConditionalGetMixin, generics.ListCreateAPIView):
     """
     List all routes or create a new one (Manager only).
     """
     queryset = Route.objects.all()
     serializer_class = RouteSerializer
     permission_classes = [permissions.IsAuthenticated, IsManager]
+    versioned_models = (Route,)
+    cache_models = (Route,)
+    replica_reads = True
 
 
-class RouteDetailView(generics.RetrieveUpdateDestroyAPIView):
+class RouteDetailView(CachedResponseMixin, ConditionalGetMixin, generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a route (Manager only).
     """
     queryset = Route.objects.all()
     serializer_class = RouteSerializer
     permission_classes = [permissions.IsAuthenticated, IsManager]
+    versioned_models = (Route,)
+    cache_models = (Route,)
+
+
+class RouteRevenueListView(CachedResponseMixin, generics.ListAPIView):
+    """
+    List the daily revenue rollup per route (Manager only).
+    Filter by ``route`` and a ``start`` / ``end`` date range.
+    """
+    queryset = RouteRevenue.objects.all()
+    serializer_class = RouteRevenueSerializer
+    permission_classes = [permissions.IsAuthenticated, IsManager]
+    pagination_class = DateKeysetPagination
+    filter_fields = {'route': 'route_id', 'start': 'date__gte', 'end': 'date__lte'}
+    cache_models = (Revenue, Route, RouteRevenue)
+    replica_reads = True
 
 
 # Revenue
-class RevenueListView(generics.ListCreateAPIView):
+class RevenueListView(IdempotentPostMixin, FleetScopedMixin, CachedResponseMixin, ValuesListMixin,
+                      generics.ListCreateAPIView):
     """
     List all revenues or create a new one (Driver or Manager only).
+    Filter by ``matatu``, ``route``, ``owner`` and a ``start`` / ``end`` date range.
+    Creates accept an ``Idempotency-Key`` header.
     """
     queryset = Revenue.objects.all()
     serializer_class = RevenueSerializer
     permission_classes = [permissions.IsAuthenticated, IsDriverOrConductor | IsManager]
+    pagination_class = DateKeysetPagination
+    filter_fields = filters.MATATU_FILTERS
+    cache_models = (Revenue,)
+    replica_reads = True
+
+
+class RevenueBulkView(APIView):
+    """
+    Upsert today's revenue for many matatus in one request (Driver or Manager only).
+
+    The ``policy`` field ("replace" or "accumulate") decides what happens to a
+    matatu that already has revenue for today; it defaults to the
+    SACCO_REVENUE_UPSERT_POLICY setting. The response reports every record.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsDriverOrConductor | IsManager]
 
+    def post(self, request):
+        serializer = RevenueBulkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        records = serializer.validated_data['records']
+        if len(records) > ingest.max_records():
+            return Response(
+                {'records': [f'Ensure this field has no more than {ingest.max_records()} elements.']},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-class RevenueDetailView(generics.RetrieveUpdateDestroyAPIView):
+        results = ingest.ingest_revenues(
+            records,
+            policy=serializer.validated_data.get('policy'),
+            logged_by=request.user,
+            fleet=fleets.get_fleet(request.user),
+        )
+        counts = {'created': 0, 'updated': 0, 'error': 0}
+        for result in results:
+            counts[result['status']] += 1
+        return Response({
+            'policy': serializer.validated_data.get('policy') or ingest.default_policy(),
+            'created': counts['created'],
+            'updated': counts['updated'],
+            'failed': counts['error'],
+            'results': results,
+        })
+
+
+class RevenueDetailView(FleetScopedMixin, CachedResponseMixin, ArchivedObjectMixin,
+                        generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete a revenue record (Driver, Manager only).
     """
     queryset = Revenue.objects.all()
     serializer_class = RevenueSerializer
     permission_classes = [permissions.IsAuthenticated, IsDriverOrConductor | IsManager]
+    cache_models = (Revenue,)
 
 
 # Expenses
-class ExpenseListView(generics.ListCreateAPIView):
+class NewExpenseCategoryMixin:
+    """
+    Create the category named by an ``expense_type`` not seen before in the
+    same transaction as the expense, after every other check has passed, so
+    a refused or failed write leaves no category behind. Only managers add
+    categories; drivers and conductors pick from the existing ones.
+    """
+    def save_with_category(self, serializer, save):
+        with transaction.atomic():
+            name = serializer.validated_data.pop('expense_type', None)
+            if name is not None:
+                if not has_role(self.request.user, MANAGER):
+                    raise ValidationError({'expense_type': ["Unknown expense type."]})
+                serializer.validated_data['category'] = ExpenseCategory.resolve(name)
+            save(serializer)
+
+    def perform_create(self, serializer):
+        self.save_with_category(serializer, super().perform_create)
+
+    def perform_update(self, serializer):
+        self.save_with_category(serializer, super().perform_update)
+
+
+class ExpenseListView(IdempotentPostMixin, FleetScopedMixin, NewExpenseCategoryMixin, CachedResponseMixin,
+                      ValuesListMixin, generics.ListCreateAPIView):
     """
     List all expenses or create a new one (Driver or Manager only).
+    Filter by ``matatu``, ``route``, ``owner``, ``category`` and a
+    ``start`` / ``end`` date range. New expenses may name their category
+    as ``expense_type`` instead of giving its id; only managers may name a
+    new one. Creates accept an ``Idempotency-Key`` header.
     """
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated, IsDriverOrConductor | IsManager]
+    pagination_class = DateKeysetPagination
+    filter_fields = filters.EXPENSE_FILTERS
+    cache_models = (Expense,)
+    replica_reads = True
 
 
-class ExpenseDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ExpenseDetailView(FleetScopedMixin, NewExpenseCategoryMixin, CachedResponseMixin, ArchivedObjectMixin,
+                        generics.RetrieveUpdateDestroyAPIView):
     """
     Retrieve, update, or delete an expense record (Driver, Manager only).
     """
     queryset = Expense.objects.all()
     serializer_class = ExpenseSerializer
     permission_classes = [permissions.IsAuthenticated, IsDriverOrConductor | IsManager]
+    cache_models = (Expense,)
+
+
+class ExpenseCategoryListView(CachedResponseMixin, generics.ListAPIView):
+    """
+    List the expense categories (Driver, Conductor or Manager only).
+    """
+    queryset = ExpenseCategory.objects.all()
+    serializer_class = ExpenseCategorySerializer
+    permission_classes = [permissions.IsAuthenticated, IsDriverOrConductor | IsManager]
+    pagination_class = None
+    cache_models = (ExpenseCategory,)
+    replica_reads = True
+
+
+# Payments
+class PaymentListView(FleetScopedMixin, ValuesListMixin, generics.ListAPIView):
+    """
+    List payments, newest first (Admin or Manager only). Filter by
+    ``receiver``, ``payment_type`` and a ``start`` / ``end`` date range.
+    Managers only see payments to the crew of their fleet.
+    """
+    queryset = Payment.objects.all()
+    serializer_class = PaymentSerializer
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrManager]
+    pagination_class = DateKeysetPagination
+    filter_fields = {
+        'receiver': 'receiver_id',
+        'payment_type': 'payment_type',
+        'start': 'date__gte',
+        'end': 'date__lte',
+    }
+    fleet_field = fleets.PAYMENT_FIELDS
+    replica_reads = True
+
+
+# Exports
+class ExportView(APIView):
+    """
+    Stream revenues, expenses or payments for a date range as CSV or NDJSON
+    (Admin or Manager only). Managers only export their own fleet.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrManager]
+    replica_reads = True
+
+    def get(self, request, resource):
+        if resource not in exports.EXPORTS:
+            raise NotFound(f"Unknown export '{resource}'.")
+        query = ExportQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        start, end, file_format = (
+            query.validated_data['start'],
+            query.validated_data['end'],
+            query.validated_data['file_format'],
+        )
+
+        response = StreamingHttpResponse(
+            exports.stream_export(resource, file_format, start, end, fleets.get_fleet(request.user)),
+            content_type=exports.CONTENT_TYPES[file_format],
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{resource}-{start}-{end}.{file_format}"'
+        )
+        return response
+
+
+# Analytics
+class ReportScopeMixin:
+    """
+    Restrict a report to what the user may see: an owner's own matatus, or
+    a manager's fleet. Cached reports vary by that scope.
+    """
+    def get_cache_scope(self):
+        if IsAdminOrManager().has_permission(self.request, self):
+            return fleets.fleet_scope(fleets.get_fleet(self.request.user))
+        return f'owner:{self.request.user.pk}'
+
+    def get_report_scope(self, request):
+        """
+        Return the filters that limit the report to the user's matatus.
+        """
+        if IsAdminOrManager().has_permission(request, self):
+            fleet = fleets.get_fleet(request.user)
+            return {} if fleet is None else {'matatus': tuple(sorted(fleet))}
+        owner = MatatuOwner.objects.filter(user=request.user).values_list('pk', flat=True).first()
+        if owner is None:
+            raise PermissionDenied("No matatu owner profile for this user.")
+        return {'owner': owner}
+
+
+class ProfitAndLossView(ReportScopeMixin, CachedResponseMixin, APIView):
+    """
+    Per-matatu revenue, expenses and net profit by day, week or month
+    (Admin, Manager or Matatu Owner). Owners only ever see their own
+    matatus and managers their own fleet.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrManager | IsMatatuOwner]
+    replica_reads = True
+    cache_models = (Revenue, Expense, Matatu)
+
+    def get(self, request):
+        return self.cached_response(request, self.build_response)
+
+    def build_response(self, request):
+        query = ProfitAndLossQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = {**query.validated_data, **self.get_report_scope(request)}
+
+        return Response({
+            'period': params['period'],
+            'start': params['start'],
+            'end': params['end'],
+            'results': analytics.profit_and_loss(**params),
+        })
+
+
+class ExpenseBreakdownView(ReportScopeMixin, CachedResponseMixin, APIView):
+    """
+    Expense totals per category for each matatu, owner or route (Admin,
+    Manager or Matatu Owner). Owners only ever see their own matatus and
+    managers their own fleet.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrManager | IsMatatuOwner]
+    replica_reads = True
+    cache_models = (Expense, ExpenseCategory, Matatu)
+
+    def get(self, request):
+        return self.cached_response(request, self.build_response)
+
+    def build_response(self, request):
+        query = ExpenseBreakdownQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        params = {**query.validated_data, **self.get_report_scope(request)}
+
+        return Response({
+            'by': params['by'],
+            'start': params['start'],
+            'end': params['end'],
+            'results': analytics.expense_breakdown(**params),
+        })
+
+
+# Licences
+class LicenceExpiryView(APIView):
+    """
+    List matatus, drivers and conductors whose licences expire within
+    ``days`` days (Admin or Manager only). Managers see their fleet only.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrManager]
+    replica_reads = True
+
+    def get(self, request):
+        query = LicenceExpiryQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        return Response(licences.expiry_digest(fleet=fleets.get_fleet(request.user), **query.validated_data))
+
+
+# Jobs
+class JobQuerysetMixin:
+    """
+    Managers see the jobs they queued; superusers see every job.
+    """
+    def get_queryset(self):
+        queryset = Job.objects.all()
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+
+
+class JobListView(JobQuerysetMixin, generics.ListCreateAPIView):
+    """
+    List background jobs, newest first, or queue one (Admin or Manager only).
+    A new job names its ``task`` and ``params``; the response is sent as
+    soon as it is queued, and the job is polled for its progress and result.
+    Only superusers may queue the tasks that act on the whole sacco.
+    """
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrManager]
+    filter_fields = {'task': 'task', 'status': 'status'}
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        if not jobs.may_enqueue(request.user, serializer.validated_data['task']):
+            raise PermissionDenied("Only administrators may run this task.")
+        try:
+            job = jobs.enqueue(
+                serializer.validated_data['task'], serializer.validated_data.get('params'), user=request.user,
+            )
+        except jobs.InvalidJob as exc:
+            raise ValidationError(exc.errors)
+        return Response(self.get_serializer(job).data, status=status.HTTP_202_ACCEPTED)
+
+
+class JobDetailView(JobQuerysetMixin, generics.RetrieveAPIView):
+    """
+    Retrieve a background job with its progress and result (Admin or Manager only).
+    """
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated, IsAdminOrManager]
+
+
+# Sync
+class SyncView(APIView):
+    """
+    Return the rows created, changed or deleted since the client's sync token
+    (Driver, Conductor or Manager). Omit ``token`` for a full sync. Large
+    syncs come in pages: pass the ``next`` cursor back as ``cursor`` until
+    the response carries a token.
+
+    Drivers and conductors only receive the crew, revenue and expenses of
+    the matatu they are assigned to, and managers those of their fleet.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsDriverOrConductor | IsManager]
+
+    def get_crew_matatus(self, user):
+        matatu_id = (
+            Driver.objects.filter(user=user).values_list('assigned_matatu_id', flat=True).first()
+            or Conductor.objects.filter(user=user).values_list('assigned_driver__assigned_matatu_id', flat=True).first()
+        )
+        return frozenset() if matatu_id is None else frozenset({matatu_id})
+
+    def get_crew_querysets(self, matatus):
+        # The crew sees every route and matatu, but only its own matatu's rows.
+        return {
+            'drivers': Driver.objects.filter(assigned_matatu_id__in=matatus),
+            'conductors': Conductor.objects.filter(assigned_driver__assigned_matatu_id__in=matatus),
+            'revenues': Revenue.objects.filter(matatu_id__in=matatus),
+            'expenses': Expense.objects.filter(matatu_id__in=matatus),
+        }
+
+    def get_fleet_querysets(self, fleet):
+        return {
+            'matatus': fleets.scope(Matatu.objects.all(), fleet, 'id'),
+            'drivers': fleets.scope(Driver.objects.all(), fleet, 'assigned_matatu_id'),
+            'conductors': fleets.scope(Conductor.objects.all(), fleet, 'assigned_driver__assigned_matatu_id'),
+            'revenues': fleets.scope(Revenue.objects.all(), fleet),
+            'expenses': fleets.scope(Expense.objects.all(), fleet),
+        }
+
+    def get(self, request):
+        querysets, matatus = None, None
+        if not has_role(request.user, MANAGER):
+            matatus = self.get_crew_matatus(request.user)
+            querysets = self.get_crew_querysets(matatus)
+        else:
+            matatus = fleets.get_fleet(request.user)
+            if matatus is not None:
+                querysets = self.get_fleet_querysets(matatus)
+        try:
+            return Response(sync.changes_since(
+                request.query_params.get('token'), querysets, cursor=request.query_params.get('cursor'),
+                matatus=matatus,
+            ))
+        except sync.InvalidToken as exc:
+            field = 'cursor' if request.query_params.get('cursor') else 'token'
+            raise ValidationError({field: [str(exc)]})